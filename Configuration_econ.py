@@ -94,3 +94,66 @@ class Config:
         # point (bigger than 2), it does not make a diff in results of interest while slowing down sim
         self.excess_candidate_factor = 1  # multiplicative factor of actual mix candidates wrt to k (MUST be >= 1)
 
+        # type_network_evolution: 'NETWORK_REGENERATE' creates all the mix nodes from scratch every month, while with
+        # 'NETWORK_PERSISTENT_CHURN' nodes persist across months (keeping their node_id, pledge and delegations):
+        # each month a fraction of nodes unbond, the delegators of a fraction of nodes move, and new nodes register
+        self.type_network_evolution = 'NETWORK_REGENERATE'  # 'NETWORK_REGENERATE' 'NETWORK_PERSISTENT_CHURN'
+        self.churn_rate_unbond = 0.05  # fraction of registered nodes that unbond each month
+        self.churn_rate_redelegate = 0.05  # fraction of nodes whose delegators withdraw and re-delegate each month
+
+        # type_model: 'MODEL_FULL' creates and rewards every mix node of every month, while 'MODEL_MACRO' only computes
+        # the token supply series (mixmining pool, circulating and unvested token, rewards distributed and unclaimed,
+        # stake saturation), with groups of identical nodes replacing the nodes (mean-field approximation, see
+        # Macro_Model). No per-node results are available in macro mode, and the network is always the one of
+        # 'NETWORK_REGENERATE' with expected work shares
+        self.type_model = 'MODEL_FULL'  # 'MODEL_FULL' 'MODEL_MACRO'
+
+        # simulation engine options: these do not change the modelled scenario, only how results are computed
+        # type_epoch_sampling selects the algorithm used by Network to sample active and reserve nodes in each epoch
+        # 'SAMPLING_LINEAR_SCAN' is the original O(k*n) per epoch version, 'SAMPLING_FENWICK_TREE' picks in O(log n)
+        # and 'SAMPLING_BATCHED_KEYS' draws all the epochs of a month at once with NumPy (random sorting keys)
+        # 'SAMPLING_PARALLEL_KEYS' spreads the batched sampling of the epochs over sampling_num_workers processes
+        self.type_epoch_sampling = 'SAMPLING_FENWICK_TREE'  # 'SAMPLING_LINEAR_SCAN' 'SAMPLING_FENWICK_TREE' 'SAMPLING_BATCHED_KEYS' 'SAMPLING_PARALLEL_KEYS'
+        self.sampling_max_batch_elements = 10**7  # max size (epochs x nodes) of the key matrix in batched sampling
+        self.sampling_num_workers = 4  # nr of worker processes used by 'SAMPLING_PARALLEL_KEYS'
+
+        # seed of the random number generators: None gives a different realisation in each run, while an integer makes
+        # runs reproducible (results of 'SAMPLING_PARALLEL_KEYS' do not depend on the number of workers)
+        self.random_seed = None
+        # type_random_numbers: 'RANDOM_GLOBAL' draws all the random values of Network from the global generators, in
+        # order, while 'RANDOM_COMMON_STREAMS' gives each stochastic stage (pledges, delegation, epoch sampling, churn)
+        # its own generator per month seeded from random_seed (see Random_Streams), so that runs of two configurations
+        # with the same seed use the same random variates (common random numbers) and their differences are not noise
+        self.type_random_numbers = 'RANDOM_GLOBAL'  # 'RANDOM_GLOBAL' 'RANDOM_COMMON_STREAMS'
+        # type_work_share: 'WORK_SHARE_SAMPLED' samples the 720 epochs of each month with type_epoch_sampling, while
+        # 'WORK_SHARE_EXPECTED' sets the expected % of active/reserve epochs per node (deterministic and much faster)
+        self.type_work_share = 'WORK_SHARE_SAMPLED'  # 'WORK_SHARE_SAMPLED' 'WORK_SHARE_EXPECTED'
+        # type_pledge_capping: algorithm capping the random (pareto) pledges below saturation. 'CAPPING_ITERATIVE' is the
+        # original loop (caps and renormalises until no pledge is too big), 'CAPPING_VECTORIZED' does the same rounds
+        # (same results) with NumPy passes, and 'CAPPING_WATER_FILLING' replays the rounds on the sorted pledges with
+        # scalar updates (faster when many rounds are needed, same results up to rounding). The rounds needed per month
+        # are recorded in network.pledge_capping_rounds
+        self.type_pledge_capping = 'CAPPING_VECTORIZED'  # 'CAPPING_ITERATIVE' 'CAPPING_VECTORIZED' 'CAPPING_WATER_FILLING'
+        # type_delegation_allocation: 'DELEGATION_SEQUENTIAL' is the original node-by-node loop allocating the delegated
+        # stake, 'DELEGATION_VECTORIZED' does the same allocation (same semantics) with one NumPy pass per round
+        self.type_delegation_allocation = 'DELEGATION_VECTORIZED'  # 'DELEGATION_SEQUENTIAL' 'DELEGATION_VECTORIZED'
+
+        # type_node_storage: 'NODES_KEEP_ALL' keeps all the nodes of every month in memory, while
+        # 'NODES_STREAM_SUMMARIES' reduces the nodes of each month to summaries (distribution statistics per metric,
+        # median ROS) and keeps only a random sample of stream_reservoir_size nodes per month (for scatter plots)
+        self.type_node_storage = 'NODES_KEEP_ALL'  # 'NODES_KEEP_ALL' 'NODES_STREAM_SUMMARIES'
+        self.stream_reservoir_size = 200  # nr of nodes kept per month in streaming mode
+        self.stream_quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]  # quantiles of each metric stored in streaming mode
+
+        # checkpoint_interval: if bigger than zero, the full state of the run is saved every checkpoint_interval months
+        # in checkpoint_dir (file checkpoint_month_<m>.pkl, with m the number of months computed). A checkpoint can be
+        # resumed, or forked with a modified Config for the remaining months, with Econ_Results.load_checkpoint
+        self.checkpoint_interval = 0  # nr of months between checkpoints (0: no checkpoints)
+        self.checkpoint_dir = 'checkpoints/'  # directory where checkpoint files are written
+
+        # results of complete runs with a random_seed are kept in result_cache_dir by main.py (see Result_Cache), and
+        # loaded instead of computed when the same configuration is run again with the same code. The least recently
+        # used runs are removed when the files exceed result_cache_max_bytes (0 disables the cache)
+        self.result_cache_dir = 'result_cache/'  # directory of the cache of results (can be shared)
+        self.result_cache_max_bytes = 2 * 10**9  # maximum size of the cache on disk
+
@@ -0,0 +1,43 @@
+# class keeps the per-month distributions of node values computed for the results of a run (eg the 'ROS_delegator'
+# values of the nodes of month 5, or the nodes of month 5 in the stake window of a staking amount), so that the many
+# plots that use the same distributions compute each of them only once. Each entry is stored with the version of the
+# Node_Table of its month (see Node_Table.mark_changed) and is recomputed if the nodes of the month change.
+# The counters of hits and misses show how many distributions were reused / computed
+class Distribution_Cache:
+    def __init__(self):
+
+        self.entries = {}  # key -> (version of the Node_Table the value was computed from, value)
+        self.hits = 0  # nr of requests served from the cache
+        self.misses = 0  # nr of requests that had to compute the value
+
+    # returns the value stored for key if it was computed from the table version, otherwise computes it with
+    # compute() and stores it
+    def get(self, key, version, compute):
+
+        value = self.lookup(key, version)
+        if value is None:
+            value = compute()
+            self.store(key, version, value)
+        return value
+
+    # returns the value stored for key if it was computed from the table version, and None otherwise
+    def lookup(self, key, version):
+
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    # stores the value computed for key from the table version
+    def store(self, key, version, value):
+        self.entries[key] = (version, value)
+
+    # removes all the entries (the counters are kept)
+    def clear(self):
+        self.entries = {}
+
+    # returns a dictionary with the counters of the cache
+    def get_stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
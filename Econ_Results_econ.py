@@ -1,18 +1,55 @@
+import copy
+import os
+import pickle
+import random
 import statistics
 import numpy as np
 from Input_Functions_econ import Input_Functions
 from Network_econ import Network
+from Node_Metrics_econ import Node_Metrics
+from Distribution_Cache_econ import Distribution_Cache
+from Macro_Model_econ import Macro_Model
+from Econ_State_econ import Econ_State
+from Node_Table_econ import Node_Table
+from Stage_Graph_econ import Stage_Graph
 
 
 # This class contains the overall model with variables for user demand, node operational costs, pledging, delegation,
 # rewards, vesting, circulating supply, etc.
 # The class sets an initial state based on Config and then updates the variables (state) interval-by-interval,
 # taking into account the previous state and external environment inputs (user demand, node costs, etc.)
+# The run can be stopped at any month (stop_month) and continued with run(), and its full state can be saved every
+# config.checkpoint_interval months with save_checkpoint(), to be resumed or forked later with load_checkpoint()
+# A run can be recomputed with a modified configuration with rerun(), which reuses the results that do not change
 class Econ_Results:
-    def __init__(self, config):
+    def __init__(self, config, stop_month=None, inputs=None):
 
         self.config = config  # contains all configuration (input) variables
+        if self.config.random_seed is not None:  # seed the global generators to make the run reproducible
+            random.seed(self.config.random_seed)
+            np.random.seed(self.config.random_seed)
+        self.node_metrics = Node_Metrics()  # registry of node metrics (parameters), computed per month as arrays
+        self.distribution_cache = Distribution_Cache()  # per-month distributions of node values shared by the plots
+        self.next_month = 0  # first month not computed yet
+
+        self.set_inputs(inputs)
+        self.set_initial_state()
+        self.run(stop_month)
+
+    # sets simulation inputs for user demand, token value, node processing capacity and costs, and creates the Network
+    # inputs (optional) is a dictionary returned by get_inputs for a configuration with the same input fields (see
+    # Stage_Graph 'inputs' and 'network_sizing'): its vectors are used instead of being computed again (they are only
+    # read, so that they can be shared by many runs, eg the workers of a Sweep_Engine)
+    def set_inputs(self, inputs=None):
+
         self.input_functions = Input_Functions(self.config)  # contains library of pre-set functions for some inputs
+        if inputs is not None:
+            for name in Econ_Results.input_series:
+                setattr(self, name, inputs[name])
+            self.network = Network(self.config, self.bw_demand, self.cpus_per_mix, self.cpu_capacity,
+                                   inputs['network_sizing'])
+            self.macro_model = Macro_Model(self.config, self.network)
+            return
 
         ############
         # Set simulation inputs for user demand, token value, node processing capacity, and create Network object
@@ -32,6 +69,8 @@ class Econ_Results:
 
         # create the network object with a number of mix nodes per interval determined by demand and configuration
         self.network = Network(self.config, self.bw_demand, self.cpus_per_mix, self.cpu_capacity)
+        # with config.type_model 'MODEL_MACRO' no nodes are created: groups of identical nodes replace them
+        self.macro_model = Macro_Model(self.config, self.network)
 
         ############
         # set variables for the costs of network operations
@@ -47,6 +86,18 @@ class Econ_Results:
         self.cost_active_mix_bw_month_dollar = np.divide(self.cost_layer_bw_month_dollar, self.network.mixnet_width)
         self.cost_active_mix_bw_month_token = np.multiply(self.cost_active_mix_bw_month_dollar, self.token_per_dollar)
 
+    # returns a dictionary with the input vectors computed by set_inputs (before the run modifies any of them), that can
+    # be passed to Econ_Results to skip their computation in runs with the same input fields
+    def get_inputs(self):
+
+        inputs = {name: np.array(getattr(self, name), dtype=float) for name in Econ_Results.input_series}
+        inputs['network_sizing'] = {'mixnet_width': self.network.mixnet_width[:], 'k': self.network.k[:],
+                                    'num_mixes': self.network.num_mixes[:]}
+        return inputs
+
+    # sets the initial state of the token variables ; then each variable evolves depending on past/present inputs
+    def set_initial_state(self):
+
         ############
         # set initial state for token variables ; then each variable evolves depending on past/present inputs
         ############
@@ -89,12 +140,268 @@ class Econ_Results:
         self.rewards_distributed_mix = [0] * self.config.num_intervals  # rewards distributed to all mix operators
         self.rewards_unclaimed = [0] * self.config.num_intervals  # rewards not distributed that go back to pool
 
-        ############
-        # once initial state is set, update the state on an interval-by-interval basis
-        ############
-
-        for month in range(self.config.num_intervals):
-            self.compute_next_state(month)
+        # all the series above are stored in one preallocated record array (see Econ_State): from here on, each series
+        # attribute (eg self.mixmining_pool) is a view of a field of self.state, and updates write into it
+        self.state = Econ_State(self.config.num_intervals, Econ_Results.state_series)
+        for series in Econ_Results.state_series:
+            setattr(self, series, self.state.set_series(series, getattr(self, series)))
+
+        # with config.type_node_storage 'NODES_STREAM_SUMMARIES' the nodes of each month are reduced to summaries
+        self.node_summaries = {}  # per month: dictionary with the distribution statistics of each node metric
+        self.median_ROS = [None] * self.config.num_intervals  # per month: median ROS of high reputation nodes
+        self.reservoir_rng = np.random.default_rng(self.config.random_seed)  # picks the nodes kept per month
+
+    # once initial state is set, updates the state on an interval-by-interval basis, from self.next_month until
+    # stop_month (excluded, by default until the end). Saves a checkpoint every config.checkpoint_interval months
+    # The worker processes of the epoch sampling (if any) are kept during the run and shut down at its end
+    def run(self, stop_month=None):
+
+        if stop_month is None:
+            stop_month = self.config.num_intervals
+        try:
+            for month in range(self.next_month, stop_month):
+                self.compute_next_state(month)
+                self.next_month = month + 1
+                if self.config.checkpoint_interval > 0 and self.next_month % self.config.checkpoint_interval == 0:
+                    self.save_checkpoint(self.config.checkpoint_dir + 'checkpoint_month_' + str(self.next_month) +
+                                         '.pkl')
+        finally:
+            self.network.close_sampling_pool()
+
+    # replaces the configuration of the run from self.next_month onwards: inputs and the initial values of the state
+    # are recomputed with config, while the results of the months already computed (global series, nodes, registry of
+    # nodes, random generators) are kept. The run then continues with run(). config.num_intervals can be different
+    def apply_config(self, config):
+
+        month = self.next_month
+        if config.num_intervals < month:
+            print("ISSUE: the new configuration has fewer intervals than the months already computed:", month)
+            exit("error: bad num_intervals in apply_config")
+        past_state, past_network, past_groups = self.state, self.network, self.macro_model.groups
+        past_summaries, past_median_ROS, past_reservoir_rng = self.node_summaries, self.median_ROS, self.reservoir_rng
+
+        self.config = config
+        self.set_inputs()
+        self.set_initial_state()
+
+        self.state.data[:month] = past_state.data[:month]
+        for m in range(month):
+            self.network.list_mix[m] = past_network.list_mix[m]
+            self.network.mixnet_width[m] = past_network.mixnet_width[m]
+            self.network.k[m] = past_network.k[m]
+            self.network.num_mixes[m] = past_network.num_mixes[m]
+            self.median_ROS[m] = past_median_ROS[m]
+            if m in past_network.rng_states:
+                self.network.rng_states[m] = past_network.rng_states[m]
+        self.network.registry = past_network.registry
+        self.network.next_node_id = past_network.next_node_id
+        self.network.pledge_capping_rounds = dict(past_network.pledge_capping_rounds)
+        if config.random_seed == past_network.config.random_seed:  # the remaining months continue the same streams
+            self.network.sampling_entropy = past_network.sampling_entropy
+            if self.network.random_streams is not None and past_network.random_streams is not None:
+                self.network.random_streams.entropy = past_network.random_streams.entropy
+        self.macro_model.groups = dict(past_groups)
+        self.node_summaries = past_summaries
+        self.reservoir_rng = past_reservoir_rng
+
+    # returns a new run that continues this one from self.next_month with config (see apply_config), without modifying
+    # this run. The nodes of the months already computed are shared (they are not modified after their month), while
+    # what later months modify (the registry of nodes in 'NETWORK_PERSISTENT_CHURN', the reservoir generator) is copied
+    # the global random generators are not copied: to reproduce a branch, set their state before running it
+    def fork(self, config):
+
+        branch = copy.copy(self)
+        branch.network = copy.copy(self.network)
+        branch.network.registry = copy.deepcopy(self.network.registry)
+        branch.node_metrics = Node_Metrics()
+        branch.node_metrics.functions.update(self.node_metrics.functions)
+        branch.distribution_cache = Distribution_Cache()
+        branch.node_summaries = dict(self.node_summaries)
+        branch.reservoir_rng = copy.deepcopy(self.reservoir_rng)
+        branch.apply_config(config)
+        return branch
+
+    # recomputes the run with config, reusing the results of the months already computed that do not change: in each
+    # month, the stages of the nodes (see Stage_Graph) whose Config fields and input values did not change are not
+    # recomputed (eg with a new node_profit_margin, only the profit split of the nodes is recomputed). The random
+    # generators start from the state of the previous run (if random_seed did not change) and skip the draws of the
+    # reused stages, so the result is the same as a new run with config. Falls back to a full run with churn (the nodes
+    # of a month depend on the registry of all the previous months), in streaming mode and in macro mode.
+    # Returns a dictionary with the number of months where each stage of the nodes was recomputed
+    def rerun(self, config):
+
+        previous = copy.copy(self)
+        changed_stages = Stage_Graph.get_changed_stages(self.config, config)
+        incremental = all(c.type_model == 'MODEL_FULL' and c.type_node_storage == 'NODES_KEEP_ALL' and
+                          c.type_network_evolution == 'NETWORK_REGENERATE' for c in [self.config, config])
+        reuse_months = min(self.next_month, config.num_intervals) if incremental else 0
+
+        self.config = config
+        if reuse_months > 0 and config.random_seed == previous.config.random_seed:
+            Network.set_rng_state(previous.network.rng_states[0]['node_creation'])
+        elif config.random_seed is not None:
+            random.seed(config.random_seed)
+            np.random.seed(config.random_seed)
+        self.next_month = 0
+        self.set_inputs()
+        self.set_initial_state()
+
+        recomputed = {stage: 0 for stage in Stage_Graph.stage_columns}
+        for month in range(reuse_months):
+            for stage in self.compute_next_state_reuse(month, previous, changed_stages):
+                recomputed[stage] += 1
+            self.next_month = month + 1
+        for stage in recomputed:
+            recomputed[stage] += config.num_intervals - reuse_months
+        self.run()
+        return recomputed
+
+    # same as compute_next_state (with 'MODEL_FULL'), for a month computed in the previous run: the stages of the nodes
+    # are only computed if they can not be reused (see Stage_Graph.is_reusable). Returns the list of recomputed stages
+    def compute_next_state_reuse(self, month, previous, changed_stages):
+
+        print("processing month", month, "/", self.config.num_intervals, "(reusing unchanged stages)")
+        self.update_vesting_staking(month)
+
+        old_mixes = previous.network.list_mix[month]
+        old_rng_states = previous.network.rng_states[month]
+        reused = {}
+        for stage in ['node_creation', 'delegation', 'sampling']:
+            reused[stage] = Stage_Graph.is_reusable(stage, month, self, previous, changed_stages, reused)
+        # the random stages are reused only if the generators are in the same state as in the previous run
+        if Network.get_rng_state() != old_rng_states['node_creation']:
+            reused = {stage: False for stage in reused}
+
+        if reused['sampling']:  # all the nodes are the same: the table is shared until a later stage changes it
+            mixes = old_mixes
+            self.network.list_mix[month] = mixes
+            self.network.next_node_id += len(mixes)
+            self.network.rng_states[month] = old_rng_states
+            Network.set_rng_state(old_rng_states['end'])
+        elif reused['node_creation']:
+            mixes = Node_Table(old_mixes.sat_code, old_mixes.pledge, self.config.node_profit_margin,
+                               self.config.node_performance, self.cost_mix_flat_month_token[month],
+                               self.stake_saturation_mix[month], old_mixes.node_id)
+            self.network.list_mix[month] = mixes
+            self.network.next_node_id += len(mixes)
+            self.network.rng_states[month] = {'node_creation': old_rng_states['node_creation'],
+                                              'delegation': old_rng_states['delegation']}
+            Network.set_rng_state(old_rng_states['delegation'])
+            if reused['delegation']:
+                mixes.delegated[:] = old_mixes.delegated
+                Network.set_rng_state(old_rng_states['sampling'])
+            else:
+                self.network.allocate_delegated_stake_mixnet(month, self.stake_saturation_mix[month],
+                                                             self.delegated_stake[month])
+            self.network.set_lambda_sigma_mixnet(month, self.stake_saturation_mix[month] * self.network.k[month])
+            self.network.set_work_share_mixes(month)
+        else:
+            self.update_lists_nodes(month)
+            mixes = self.network.list_mix[month]
+        if month in previous.network.pledge_capping_rounds and reused['node_creation']:
+            self.network.pledge_capping_rounds[month] = previous.network.pledge_capping_rounds[month]
+
+        self.update_mixmining_pool_and_available_rewards(month)
+        for stage in ['costs', 'rewards', 'profit_split']:
+            reused[stage] = Stage_Graph.is_reusable(stage, month, self, previous, changed_stages, reused)
+        if mixes is old_mixes and not all(reused.values()):
+            mixes = old_mixes.copy()  # the nodes of the previous run are not modified
+            self.network.list_mix[month] = mixes
+        if mixes is not old_mixes:  # columns written by the reused stages are copied from the previous run
+            for stage in ['costs', 'rewards', 'profit_split']:
+                for column in Stage_Graph.stage_columns[stage] if reused[stage] else []:
+                    getattr(mixes, column)[:] = getattr(old_mixes, column)
+            mixes.performance[:] = self.config.node_performance
+            mixes.profit_margin[:] = self.config.node_profit_margin
+            mixes.mark_changed()
+
+        if not reused['costs']:
+            self.update_costs(month)
+        if not reused['rewards']:
+            self.assign_rewards(month)
+        else:
+            self.update_rewards_distributed(month, np.sum(mixes.received_rewards))
+        if not reused['profit_split']:
+            self.mix_nodes_rewards_distribute_profits(month)
+        return [stage for stage in Stage_Graph.stage_columns if not reused[stage]]
+
+    # saves the full state of the run after self.next_month months in a binary (pickle) file: configuration, global
+    # series, nodes of each month, registry of nodes, states of the random generators and roots (entropy) of the random
+    # streams, so that a run without random_seed continues the same streams when it is resumed or forked
+    def save_checkpoint(self, file_name):
+
+        checkpoint = {
+            'config': self.config,
+            'next_month': self.next_month,
+            'state': self.state.data,
+            'list_mix': {month: self.network.list_mix[month] for month in range(self.next_month)},
+            'network': {'mixnet_width': self.network.mixnet_width, 'k': self.network.k,
+                        'num_mixes': self.network.num_mixes, 'registry': self.network.registry,
+                        'next_node_id': self.network.next_node_id,
+                        'pledge_capping_rounds': self.network.pledge_capping_rounds,
+                        'rng_states': self.network.rng_states, 'sampling_entropy': self.network.sampling_entropy},
+            'macro_groups': self.macro_model.groups,
+            'node_summaries': self.node_summaries,
+            'median_ROS': self.median_ROS,
+            'rng': {'random': random.getstate(), 'numpy': np.random.get_state(),
+                    'reservoir': self.reservoir_rng.bit_generator.state,
+                    'streams': None if self.network.random_streams is None else self.network.random_streams.entropy},
+        }
+        if os.path.dirname(file_name) != '':
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, 'wb') as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # returns the run saved in a checkpoint file, ready to continue with run(). If config is given, the run is forked:
+    # the remaining months are computed with config instead of the configuration of the checkpoint (see apply_config)
+    # note that the states of the global random generators (random and np.random) are set to those of the checkpoint
+    @staticmethod
+    def load_checkpoint(file_name, config=None):
+
+        with open(file_name, 'rb') as f:
+            checkpoint = pickle.load(f)
+
+        results = Econ_Results.__new__(Econ_Results)
+        results.config = checkpoint['config']
+        results.node_metrics = Node_Metrics()
+        results.distribution_cache = Distribution_Cache()
+        results.next_month = checkpoint['next_month']
+        results.set_inputs()
+        results.set_initial_state()
+
+        results.state.data[...] = checkpoint['state']
+        results.network.list_mix.update(checkpoint['list_mix'])
+        for name, value in checkpoint['network'].items():
+            setattr(results.network, name, value)
+        results.macro_model.groups = checkpoint['macro_groups']
+        results.node_summaries = checkpoint['node_summaries']
+        results.median_ROS = checkpoint['median_ROS']
+        random.setstate(checkpoint['rng']['random'])
+        np.random.set_state(checkpoint['rng']['numpy'])
+        results.reservoir_rng.bit_generator.state = checkpoint['rng']['reservoir']
+        if results.network.random_streams is not None:
+            results.network.random_streams.entropy = checkpoint['rng']['streams']
+
+        if config is not None:
+            results.apply_config(config)
+        return results
+
+    # names of the input series computed by set_inputs (they only depend on the fields of the Stage_Graph stages
+    # 'inputs' and 'network_sizing')
+    input_series = ['bw_demand', 'dollar_per_token', 'token_per_dollar', 'cpus_per_mix', 'cpu_capacity',
+                    'cost_cpu_month_dollar', 'cost_mix_flat_month_dollar', 'cost_mix_flat_month_token',
+                    'cost_packet_bw_dollar', 'cost_layer_bw_month_dollar', 'cost_active_mix_bw_month_dollar',
+                    'cost_active_mix_bw_month_token']
+
+    # names of the series with one value per interval that are stored in self.state
+    state_series = ['bw_demand', 'dollar_per_token', 'token_per_dollar', 'cpus_per_mix', 'cpu_capacity',
+                    'cost_cpu_month_dollar', 'cost_mix_flat_month_dollar', 'cost_mix_flat_month_token',
+                    'cost_packet_bw_dollar', 'cost_layer_bw_month_dollar', 'cost_active_mix_bw_month_dollar',
+                    'cost_active_mix_bw_month_token', 'mixmining_pool', 'circulating_tokens', 'unvested_tokens',
+                    'max_effective_stake', 'stake_saturation_mix', 'pledged_stake', 'delegated_stake', 'pp_dollar',
+                    'pp_token', 'mixmining_emitted', 'bw_income', 'share_income_bw_mix', 'share_income_bw_gw',
+                    'income_global_mix', 'income_global', 'rewards_distributed', 'rewards_distributed_mix',
+                    'rewards_unclaimed']
 
     ################
     # function updates all the global variables for the current month
@@ -106,14 +413,23 @@ class Econ_Results:
         # update functions for token price and cost of bw can be uncommented. Current versions are placeholders.
         # self.update_token_price(month)  # update token price (currently a placeholder)
         # self.update_pp(month)  # update price per packet (affects income from bw fees). Baseline is constant value.
-        self.update_lists_nodes(month)  # updates the list of all nodes with their individual pledge and delegation
-        self.update_costs(month)  # updates the node operational costs in token (must come after update_token_price)
-        self.update_mixmining_pool_and_available_rewards(month)  # updates the mixmining pool, rewards, bw income
-        self.assign_rewards(month)  # updates the potential and actual rewards per node (dep. pledge/stake)
-
-        # for each node distribute the rewards among individual operators and their delegates
-        for mix in self.network.list_mix[month]:
-            self.mix_node_rewards_distribute_profits(mix)
+        if self.config.type_model == 'MODEL_FULL':
+            self.update_lists_nodes(month)  # updates the list of all nodes with their individual pledge and delegation
+            self.update_costs(month)  # updates the node operational costs in token (must come after update_token_price)
+            self.update_mixmining_pool_and_available_rewards(month)  # updates the mixmining pool, rewards, bw income
+            self.assign_rewards(month)  # updates the potential and actual rewards per node (dep. pledge/stake)
+            self.mix_nodes_rewards_distribute_profits(month)  # for each node split rewards among operator and delegates
+            if self.config.type_node_storage == 'NODES_STREAM_SUMMARIES':
+                self.summarize_month_nodes(month)  # reduce the nodes of the month to summaries and drop the rest
+        elif self.config.type_model == 'MODEL_MACRO':
+            # the node costs and profits do not affect the token supply, and are not computed in the macro model
+            self.macro_model.create_node_groups(month, self.stake_saturation_mix[month], self.pledged_stake[month],
+                                                self.delegated_stake[month])
+            self.update_mixmining_pool_and_available_rewards(month)  # updates the mixmining pool, rewards, bw income
+            self.assign_rewards_macro(month)  # updates the aggregate rewards with the groups of nodes
+        else:
+            print("ISSUE: unknown type_model in Config:", self.config.type_model)
+            exit("error: bad type of model")
 
     ####################################
     # updates the unvested and circulating supplies as well as the stake saturation point per mix node
@@ -185,6 +501,10 @@ class Econ_Results:
         # create the lists of mix nodes for the new interval
         self.network.create_list_mixes(month, self.cost_mix_flat_month_token[month], self.stake_saturation_mix[month],
                                        self.pledged_stake[month], self.delegated_stake[month])
+        # with churn the registered nodes keep their pledge, and the new nodes may not be able to take the rest of the
+        # budget without saturating: pledged_stake is then the pledge actually held by the nodes of the month
+        if self.config.type_network_evolution == 'NETWORK_PERSISTENT_CHURN':
+            self.pledged_stake[month] = np.sum(self.network.list_mix[month].pledge)
 
     ####################################
     # updates the cost in token of running a node, considering updated token_per_dollar value
@@ -193,9 +513,11 @@ class Econ_Results:
         # config.cost_mix_dummy is a lower bound on bw costs (to account for dummy loops when low/no traffic)
         bw_cost = max(self.config.cost_mix_dummy, self.cost_active_mix_bw_month_token[month])
 
-        # update cost per mix by adding to the flat cost (initialized) the variable cost (dependent on activity)
-        for mix in self.network.list_mix[month]:
-            mix.node_cost += mix.activity_percent * bw_cost
+        # cost per mix is the flat cost plus the variable cost (dependent on activity). The cost is set (not added to
+        # the cost of the table) so that it can be recomputed for nodes reused by rerun
+        mixes = self.network.list_mix[month]
+        mixes.node_cost[:] = self.cost_mix_flat_month_token[month] + mixes.activity_percent * bw_cost
+        mixes.mark_changed()
 
     ####################################
     # updates values for mixmining pool, emitted mixmining rewards and income from fees
@@ -220,176 +542,298 @@ class Econ_Results:
         self.income_global[month] = self.income_global_mix[month] + self.share_income_bw_gw[month]
 
     ####################################
-    # takes the pot of rewards for mix nodes and computes the R_i (white paper formula) for each individual mix
-    # updates global variables on rewards distributed and unclaimed (that are put back in mixmining pool)
-    def assign_rewards(self, month):
+    # returns the work factors (omega) of active and idle (reserve) nodes in the current month
+    def compute_work_factors(self, month):
 
         active_nodes = self.config.mixnet_layers * self.network.mixnet_width[month]
         idle_nodes = self.network.k[month] - active_nodes
         factor = self.config.factor_work_active  # active node's omega is "factor" times higher than idle node's omega
         work_active = factor / (factor * self.network.k[month] - (factor - 1) * idle_nodes)
         work_idle = 1 / (factor * self.network.k[month] - (factor - 1) * idle_nodes)
+        return work_active, work_idle
+
+    ####################################
+    # takes the pot of rewards for mix nodes and computes the R_i (white paper formula) for each individual mix
+    # updates global variables on rewards distributed and unclaimed (that are put back in mixmining pool)
+    def assign_rewards(self, month):
+
+        work_active, work_idle = self.compute_work_factors(month)
 
         # compute rewards distributed to each of the mixes (depending on their pledge, stake, performance)
-        for mix in self.network.list_mix[month]:
-
-            # HACK to compute rewards when nodes are always active
-            #mix.received_rewards = 1.0 * mix.performance * self.income_global_mix[month] * \
-            #                       mix.sigma_node * self.network.k[month] * (work_active + self.config.alpha *
-            #                                                                 mix.lambda_node) / (1 + self.config.alpha)
-
-            # received rewards (formula rewards paper) for the epochs when the node was active
-            # UNCOMMENT !!!!!!!!!!!!!
-            mix.received_rewards = mix.activity_percent * mix.performance * self.income_global_mix[month] * \
-                                   mix.sigma_node * self.network.k[month] * (work_active + self.config.alpha *
-                                                                             mix.lambda_node) / (1 + self.config.alpha)
-            # received rewards (formula rewards paper) for the epochs when the node was in reserve
-            mix.received_rewards += mix.reserve_percent * mix.performance * self.income_global_mix[month] * \
-                                    mix.sigma_node * self.network.k[month] * (work_idle + self.config.alpha *
-                                                                              mix.lambda_node) / (1 + self.config.alpha)
-            # mix receives nothing for (1 - mix.activity_percent - mix.reserve_percent) where it's not selected
-
-            # set variables for distributed and unclaimed (diff between potential and actual) rewards
-            self.rewards_distributed_mix[month] += mix.received_rewards
+        mixes = self.network.list_mix[month]
+        mixes.received_rewards[:] = self.compute_received_rewards(
+            self.income_global_mix[month], self.network.k[month], self.config.alpha, work_active, work_idle,
+            mixes.performance, mixes.sigma_node, mixes.lambda_node, mixes.activity_percent, mixes.reserve_percent)
+
+        mixes.mark_changed()
+        self.update_rewards_distributed(month, np.sum(mixes.received_rewards))
 
+    # sets the variables for distributed and unclaimed (diff between potential and actual) rewards of the month, given
+    # the sum of the rewards received by the mix nodes
+    def update_rewards_distributed(self, month, rewards_distributed_mix):
+
+        self.rewards_distributed_mix[month] = rewards_distributed_mix
         # aggregate of rewards distributed to nodes and gws. Note these are not profits: costs NOT YET subtracted
         self.rewards_distributed[month] = self.rewards_distributed_mix[month] + self.share_income_bw_gw[month]
         # amount of rewards unclaimed and returned to the mixmining pool
         self.rewards_unclaimed[month] = self.income_global[month] - self.rewards_distributed[month]
 
+    # same as assign_rewards, for the groups of identical nodes of the macro model (see Macro_Model)
+    def assign_rewards_macro(self, month):
+
+        work_active, work_idle = self.compute_work_factors(month)
+        groups = self.macro_model.groups[month]
+        received_rewards = self.compute_received_rewards(
+            self.income_global_mix[month], self.network.k[month], self.config.alpha, work_active, work_idle,
+            self.config.node_performance, groups['sigma_node'], groups['lambda_node'], groups['activity_percent'],
+            groups['reserve_percent'])
+        self.update_rewards_distributed(month, np.sum(groups['count'] * received_rewards))
+
+    # array kernel of the rewards paper formula: returns the rewards received by each node (arrays with one value per
+    # node for performance, sigma, lambda, activity and reserve; scalars for the other inputs)
+    # HACK to compute rewards when nodes are always active: pass activity = 1 and reserve = 0
+    @staticmethod
+    def compute_received_rewards(income_mix, k, alpha, work_active, work_idle, performance, sigma, lambda_node,
+                                 activity, reserve):
+
+        # rewards for the epochs when the node was active plus rewards for the epochs when it was in reserve
+        # mix receives nothing for (1 - activity - reserve) where it's not selected
+        reward_factor = performance * income_mix * sigma * k / (1 + alpha)
+        return reward_factor * (activity * (work_active + alpha * lambda_node) +
+                                reserve * (work_idle + alpha * lambda_node))
+
     ###################################
-    # Given a mix node, this function splits the profit between the operator and the delegates.
+    # For the mix nodes of the month, this function splits the profit between the operator and the delegates.
     # it sets the variables operator_profit and delegate_profit for each of the nodes
-    def mix_node_rewards_distribute_profits(self, mix):
+    def mix_nodes_rewards_distribute_profits(self, month):
+
+        mixes = self.network.list_mix[month]
+        operator_profit, delegate_profit = self.split_profits(mixes.received_rewards, mixes.node_cost, mixes.pledge,
+                                                              mixes.delegated, self.config.node_profit_margin)
+        mixes.operator_profit[:] = operator_profit
+        mixes.delegate_profit[:] = delegate_profit
+        mixes.mark_changed()
+
+    # array kernel of the profit split (white paper formulas), returns the vectors of operator and delegate profits
+    @staticmethod
+    def split_profits(received_rewards, node_cost, pledge, delegated, profit_margin):
 
         # FIRST subtract the operational cost from the rewards awarded to the node (to compute the profit)
-        profit = mix.received_rewards - mix.node_cost  # profit is negative if the costs are higher than the rewards
+        profit = received_rewards - node_cost  # profit is negative if the costs are higher than the rewards
 
         # SECOND distribute profit among operator and delegates (following white paper formulas)
         # If there is a (positive) profit, split it with the formulas
-        if profit > 0:
-            mix.operator_profit = (self.config.node_profit_margin + (1 - self.config.node_profit_margin) * (
-                    mix.pledge / (mix.pledge + mix.delegated))) * profit
-            mix.delegate_profit = (1 - self.config.node_profit_margin) * (mix.delegated / (
-                    mix.pledge + mix.delegated)) * profit
-        else:  # if there is no profit, delegates get nothing and the loss is on the operator profit (who paid costs)
-            mix.operator_profit = profit
-            mix.delegate_profit = 0
+        # if there is no profit, delegates get nothing and the loss is on the operator profit (who paid costs)
+        total_stake = pledge + delegated
+        operator_profit = np.where(profit > 0, (profit_margin + (1 - profit_margin) * (pledge / total_stake)) * profit,
+                                   profit)
+        delegate_profit = np.where(profit > 0, (1 - profit_margin) * (delegated / total_stake) * profit, 0.0)
+        return operator_profit, delegate_profit
+
+    # returns a dictionary with the deviation of the token supply series of this run from those of the run reference
+    # (eg a 'MODEL_MACRO' run compared with a 'MODEL_FULL' run of the same configuration). For each series, the
+    # maximum over the months of the absolute difference, relative to the value of reference
+    def get_model_deviation(self, reference):
+
+        deviation = {}
+        for series in ['mixmining_pool', 'circulating_tokens', 'unvested_tokens', 'rewards_distributed_mix',
+                       'rewards_unclaimed', 'stake_saturation_mix']:
+            values = np.asarray(getattr(self, series), dtype=float)
+            reference_values = np.asarray(getattr(reference, series), dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relative = np.abs(values - reference_values) / np.abs(reference_values)
+            deviation[series] = np.max(np.where(reference_values != 0, relative, 0.0))
+        return deviation
 
     # This function returns a dictionary where dict_distr[month] is a vector with the values for parameter 'par'
-    # for the list of existing nodes (ordered by node index)
+    # for the list of existing nodes (ordered by node index), with NaN for nodes where the parameter is not defined
     # the result can be used for boxplots that show the distribution of a variable's values for a set of nodes
     def get_dictionary_distribution(self, par):
 
         dict_distr = {}
         for month in range(self.config.num_intervals):
-            dict_distr[month] = []
-            for node in self.network.list_mix[month]:
-                next_val = self.get_node_value(node, par)
-                dict_distr[month].append(next_val)
+            dict_distr[month] = self.get_month_values(month, par)
 
         return dict_distr
 
+    # returns the vector with the values of parameter par for the nodes of the month (with NaN where not defined, or
+    # without those nodes if finite is True). Vectors are kept in distribution_cache and must not be modified
+    def get_month_values(self, month, par, finite=False):
+
+        mixes = self.network.list_mix[month]
+        if not finite:
+            return self.distribution_cache.get(('values', par, month), mixes.version,
+                                               lambda: self.get_node_values(mixes, par))
+
+        def compute_finite():
+            values = self.get_month_values(month, par)
+            values = values[~np.isnan(values)]
+            values.flags.writeable = False
+            return values
+        return self.distribution_cache.get(('finite', par, month), mixes.version, compute_finite)
+
+    # returns the median of parameter par over the nodes of the month where it is defined (NaN if there are none). In
+    # streaming mode the median comes from the summaries of the month (the nodes are no longer available)
+    def get_month_median(self, month, par):
+
+        if self.config.type_node_storage == 'NODES_STREAM_SUMMARIES':
+            summary = self.node_summaries[month].get(par)
+            return np.nan if summary is None else summary['med']
+        values = self.get_month_values(month, par, finite=True)
+        return np.median(values) if len(values) > 0 else np.nan
+
+    # returns the median ROS of high reputation nodes of the month, or NaN if the month has none. In streaming mode it is
+    # the value stored when the nodes of the month were summarized (the table of the month only keeps a sample of them)
+    def get_month_median_ROS(self, month):
+
+        if self.config.type_node_storage == 'NODES_STREAM_SUMMARIES':
+            return self.median_ROS[month]
+        try:
+            return self.compute_median_ROS_reputable_node(self.network.list_mix[month])
+        except statistics.StatisticsError:  # no high reputation node in the month
+            return np.nan
+
     def get_median_ROS_reputable_node(self):
 
+        if self.config.type_node_storage == 'NODES_STREAM_SUMMARIES':  # computed before dropping the nodes
+            return self.median_ROS[:]
+
         median_ROS = [0] * self.config.num_intervals
         for month in range(self.config.num_intervals):
-            ROS_set = []  # initialize set of ROS values for high reputation nodes (>0.9 saturation)
-            for node in self.network.list_mix[month]:
-                sat = self.get_node_value(node, 'saturation_percent')
-                if node.delegated > 0 and sat > 0.9:
-                    ROS_set.append(self.get_node_value(node, 'ROS_delegator'))
-            median_ROS[month] = statistics.median(ROS_set)
+            median_ROS[month] = self.compute_median_ROS_reputable_node(self.network.list_mix[month])
 
         return median_ROS
 
-    # returns the parameter value for a node
+    # returns a vector with the values of parameter par for all the nodes of a Node_Table, with NaN for the nodes
+    # where the parameter is not defined. Parameters are the metrics registered in node_metrics (see Node_Metrics)
+    def get_node_values(self, mixes, par):
+        return self.node_metrics.get_values(mixes, par)
+
+    # returns the median ROS of delegators of the nodes of a Node_Table with more than 90% of stake saturation
+    def compute_median_ROS_reputable_node(self, mixes):
+
+        ROS = self.get_node_values(mixes, 'ROS_delegator')
+        sat = self.get_node_values(mixes, 'saturation_percent')
+        return statistics.median(ROS[(mixes.delegated > 0) & (sat > 0.9)].tolist())
+
+    # reduces the nodes of the month to fixed-size summaries, and replaces the table of nodes of the month by a small
+    # random sample of its nodes, so that memory no longer grows with the number of months. Stores:
+    # - node_summaries[month][par]: boxplot statistics (mean, median, quartiles, whiskers) and the quantiles in
+    #   config.stream_quantiles of each metric in summary_metrics (fliers are not kept)
+    # - median_ROS[month]: the median ROS of high reputation nodes (see get_median_ROS_reputable_node)
+    # - network.list_mix[month]: config.stream_reservoir_size nodes sampled uniformly (used for scatter plots)
+    def summarize_month_nodes(self, month):
+
+        mixes = self.network.list_mix[month]
+        self.node_summaries[month] = {}
+        for par in self.summary_metrics:
+            values = self.get_node_values(mixes, par)
+            self.node_summaries[month][par] = self.compute_distribution_summary(values[~np.isnan(values)])
+        try:
+            self.median_ROS[month] = self.compute_median_ROS_reputable_node(mixes)
+        except statistics.StatisticsError:  # no high reputation node in the month
+            self.median_ROS[month] = np.nan
+
+        nr_kept = min(self.config.stream_reservoir_size, len(mixes))
+        kept = np.sort(self.reservoir_rng.choice(len(mixes), size=nr_kept, replace=False))
+        self.network.list_mix[month] = mixes.subset(kept)
+
+    # numeric node metrics summarized per month in streaming mode
+    summary_metrics = ['pledge', 'delegated', 'total_stake', 'node_cost', 'received_rewards', 'operator_profit',
+                       'delegate_profit', 'lambda', 'sigma', 'saturation_percent', 'pledge_saturation_percent',
+                       'activity_percent', 'reserve_percent', 'ROS_operator', 'ROS_delegator', 'APY_delegator']
+
+    # returns a dictionary with the statistics of a vector of values, with the keys used by matplotlib boxplots (bxp)
+    def compute_distribution_summary(self, values):
+
+        if len(values) == 0:
+            return None
+        q1, med, q3 = np.percentile(values, [25, 50, 75])
+        iqr = q3 - q1
+        summary = {'mean': np.mean(values), 'med': med, 'q1': q1, 'q3': q3,
+                   'whislo': np.min(values[values >= q1 - 1.5 * iqr]),
+                   'whishi': np.max(values[values <= q3 + 1.5 * iqr]),
+                   'fliers': [], 'count': len(values),
+                   'quantiles': dict(zip(self.config.stream_quantiles,
+                                         np.quantile(values, self.config.stream_quantiles)))}
+        return summary
+
+    # returns the parameter value for a node (None if the parameter is not defined for the node)
     def get_node_value(self, node, par):
+        return self.node_metrics.get_value(node, par)
 
-        if par == 'serial':
-            res = node.serial
-        elif par == 'sat_level':
-            res = node.sat_level
-        elif par == 'pledge':
-            res = node.pledge
-        elif par == 'delegated':
-            res = node.delegated
-        elif par == 'total_stake':
-            res = node.delegated + node.pledge
-        elif par == 'node_cost':
-            res = node.node_cost
-        elif par == 'received_rewards':
-            res = node.received_rewards
-        elif par == 'operator_profit':
-            res = node.operator_profit
-        elif par == 'delegate_profit':
-            if node.delegated > 0:
-                res = node.delegate_profit
-            else:
-                res = None
-        elif par == 'lambda':
-            res = node.lambda_node
-        elif par == 'sigma':
-            res = node.sigma_node
-        elif par == 'saturation_percent':
-            res = (node.pledge + node.delegated) / node.stake_saturation
-        elif par == 'pledge_saturation_percent':
-            res = node.pledge / node.stake_saturation
-        elif par == 'activity_percent':
-            res = node.activity_percent
-        elif par == 'reserve_percent':
-            res = node.reserve_percent
-        elif par == 'ROS_operator':  # takes operational costs into account
-            res = node.operator_profit / (node.pledge + node.node_cost)
-        elif par == 'ROS_delegator':
-            if node.delegated > 0:
-                res = node.delegate_profit / node.delegated
-            else:
-                res = None
-        elif par == 'APY_delegator':
-            if node.delegated > 0:
-                res = 12 * node.delegate_profit / node.delegated
-            else:
-                res = None
-        else:
-            res = None
-            print("ISSUE: bad parameter type passed to get_node_value in Econ_results")
-            exit("ERROR: bad parameter type !")
-        return res
+    # returns the serials of the nodes of the month sorted by the value of column ('pledge' or 'delegated'), and the
+    # sorted values, so that the nodes with values in a range are found with a binary search (np.searchsorted)
+    def get_month_sorted_index(self, month, column):
+
+        def compute_index():
+            values = getattr(self.network.list_mix[month], column)
+            order = np.argsort(values, kind='stable')
+            return order, values[order]
+        return self.distribution_cache.get(('sorted', column, month), self.network.list_mix[month].version,
+                                           compute_index)
 
     # stake is the amount of token available to the participant
     # function returns a dictionary with 2 scenarios: pledge or delegate to a mix node
     # for each of the two scenarios, sample nodes representing the rewards that the stakeholder would
     # obtain for pledging/delegating the available stake on a node
+    # stake can also be a list of amounts: then the function returns a dictionary with the result of each amount
+    # (computing all of them in one pass over the months). Samples are kept in distribution_cache (do not modify them)
     def sample_quarterly_rewards_no_compound_vs_saturation(self, stake):
 
+        stakes = stake if isinstance(stake, (list, tuple, np.ndarray)) else [stake]
+
         # rewards dictionary contains a dictionary for each of options: pledge/delegate on a mix
-        rewards = {'pledge-mix': {}, 'sat-pledge-mix': {}, 'delegate-mix': {}, 'sat-delegate-mix': {}}
         # the dictionary also records the saturation level of the node (reputation level) for the sampled nodes
+        rewards = {}
+        for amount in stakes:
+            rewards[amount] = {'pledge-mix': {}, 'sat-pledge-mix': {}, 'delegate-mix': {}, 'sat-delegate-mix': {}}
 
         # rewards['delegate-mix'][month] contains a list of sample rewards based on the ROS of mixes in the simulation
         for month in range(self.config.num_intervals):
-            rewards['pledge-mix'][month] = []
-            rewards['sat-pledge-mix'][month] = []
-            rewards['delegate-mix'][month] = []
-            rewards['sat-delegate-mix'][month] = []
-
-            for mix in self.network.list_mix[month]:
-                # select nodes whose pledge value is around staking budget plus/minus 20%
-                if 0.8 * stake <= mix.pledge <= 1.2 * stake:
-                    ros_mix_operator = self.get_node_value(mix, 'ROS_operator')
-                    #rewards['pledge-mix'][month].append(stake * 12 * ros_mix_operator)
-                    rewards['pledge-mix'][month].append(stake * 3 * ros_mix_operator)  # quarterly instead of annual
-                    stake_saturation = self.get_node_value(mix, 'saturation_percent')
-                    rewards['sat-pledge-mix'][month].append(stake_saturation)
-
-                # delegation only requires more delegated stake than investment
-                ros_mix_delegate = self.get_node_value(mix, 'ROS_delegator')
-                if (ros_mix_delegate is not None) and (stake <= mix.delegated):
-                    #rewards['delegate-mix'][month].append(stake * 12 * ros_mix_delegate)
-                    rewards['delegate-mix'][month].append(stake * 3 * ros_mix_delegate)  # quarterly instead of annual
-                    stake_saturation = self.get_node_value(mix, 'saturation_percent')
-                    rewards['sat-delegate-mix'][month].append(stake_saturation)
-
-        return rewards
-
+            version = self.network.list_mix[month].version
+            samples = {amount: self.distribution_cache.lookup(('stake_window', amount, month), version)
+                       for amount in stakes}
+            missing = [amount for amount in stakes if samples[amount] is None]
+            if len(missing) > 0:  # compute the samples of all the amounts not in the cache at once
+                for amount, month_samples in zip(missing, self.sample_month_rewards_vs_saturation(month, missing)):
+                    self.distribution_cache.store(('stake_window', amount, month), version, month_samples)
+                    samples[amount] = month_samples
+            for amount in stakes:
+                for option in rewards[amount]:
+                    rewards[amount][option][month] = samples[amount][option]
+
+        return rewards if stakes is stake else rewards[stake]
+
+    # returns the samples of sample_quarterly_rewards_no_compound_vs_saturation in the month for each amount in stakes
+    # the nodes in the stake window of each amount are found by binary search in the nodes sorted by pledge / delegated
+    # (selected nodes are returned in serial order)
+    def sample_month_rewards_vs_saturation(self, month, stakes):
+
+        ros_operator = self.get_month_values(month, 'ROS_operator')
+        ros_delegator = self.get_month_values(month, 'ROS_delegator')
+        saturation = self.get_month_values(month, 'saturation_percent')
+        pledge_order, sorted_pledges = self.get_month_sorted_index(month, 'pledge')
+        delegated_order, sorted_delegated = self.get_month_sorted_index(month, 'delegated')
+
+        # select nodes whose pledge value is around staking budget plus/minus 20%
+        stakes = np.asarray(stakes, dtype=float)
+        pledge_first = np.searchsorted(sorted_pledges, 0.8 * stakes, side='left')
+        pledge_last = np.searchsorted(sorted_pledges, 1.2 * stakes, side='right')
+        # delegation only requires more delegated stake than investment
+        delegated_first = np.searchsorted(sorted_delegated, stakes, side='left')
+
+        list_samples = []
+        for i, amount in enumerate(stakes):
+            samples = {}
+            selected = np.sort(pledge_order[pledge_first[i]:pledge_last[i]])
+            samples['pledge-mix'] = (amount * 3 * ros_operator[selected]).tolist()  # quarterly instead of annual
+            samples['sat-pledge-mix'] = saturation[selected].tolist()
+
+            selected = np.sort(delegated_order[delegated_first[i]:])
+            selected = selected[~np.isnan(ros_delegator[selected])]
+            samples['delegate-mix'] = (amount * 3 * ros_delegator[selected]).tolist()  # quarterly instead of annual
+            samples['sat-delegate-mix'] = saturation[selected].tolist()
+            list_samples.append(samples)
+
+        return list_samples
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+# class stores the global state of a run (the series with one value per interval, such as mixmining_pool or
+# rewards_unclaimed) in one preallocated structured array, with one record per interval and one field per series
+# Econ_Results keeps a view of each field as its series attribute (eg results.mixmining_pool is
+# results.state.data['mixmining_pool']), so updates write directly into the record array. This allows:
+# - zero-copy access to the series (get_series) or to all of them as a 2D array (get_matrix), eg for plotting
+# - saving the state with np.save and loading it back, also as a read-only memory map (save / load)
+# - cheap snapshots of the whole state (one memory copy) that can be restored in place (snapshot / restore)
+class Econ_State:
+    def __init__(self, num_intervals, series, dtype='float64'):
+
+        self.series = list(series)  # names of the series (fields of the record array)
+        self.data = np.zeros(num_intervals, dtype=[(name, dtype) for name in self.series])  # one record per interval
+
+    # writes values (a vector with one value per interval, or a single value for all intervals) into the series,
+    # and returns the view of the series
+    def set_series(self, name, values):
+
+        self.data[name] = values
+        return self.data[name]
+
+    # returns the view (not a copy) of a series
+    def get_series(self, name):
+        return self.data[name]
+
+    # returns a view of all the series as a 2D array of shape (num_intervals, nr of series), columns in self.series order
+    def get_matrix(self):
+        return self.data.view((self.data.dtype[0], len(self.series)))
+
+    # returns a copy of the state (the record array is copied at once)
+    def snapshot(self):
+
+        state = Econ_State.__new__(Econ_State)
+        state.series = self.series[:]
+        state.data = self.data.copy()
+        return state
+
+    # sets the values of the state to those of a snapshot, in place (so that existing views see the restored values)
+    def restore(self, snapshot):
+        self.data[...] = snapshot.data
+
+    # returns a copy of the state with the given dtype (eg 'float32' to halve the size of saved results)
+    def astype(self, dtype):
+
+        state = Econ_State(len(self.data), self.series, dtype)
+        for name in self.series:
+            state.data[name] = self.data[name]
+        return state
+
+    # saves the record array to a .npy file
+    def save(self, file_name):
+        np.save(file_name, self.data)
+
+    # returns the state saved in a .npy file. With mmap_mode='r' the file is memory-mapped instead of read into memory
+    @staticmethod
+    def load(file_name, mmap_mode=None):
+
+        state = Econ_State.__new__(Econ_State)
+        state.data = np.load(file_name, mmap_mode=mmap_mode)
+        state.series = list(state.data.dtype.names)
+        return state
@@ -0,0 +1,71 @@
+# class implements a binary indexed (Fenwick) tree over a vector of non-negative weights
+# it supports point updates, prefix sums and the search of the index at which a cumulative value is reached, all in
+# O(log n). Used by Network to pick mix nodes proportionally to their stake without rewriting a cumulative list
+class Fenwick_Tree:
+    def __init__(self, weights):
+
+        self.n = len(weights)  # number of elements (mix nodes) in the tree
+        self.weights = [float(w) for w in weights]  # current weight of each element (zero once it has been removed)
+        self.tree = [0.0] * (self.n + 1)  # partial sums, 1-indexed as usual for Fenwick trees
+        self.total_weight = 0.0  # sum of all current weights (upper bound for the values passed to find)
+
+        # build the tree in O(n) by pushing each partial sum to its parent
+        for i in range(1, self.n + 1):
+            self.tree[i] += self.weights[i - 1]
+            parent = i + (i & -i)
+            if parent <= self.n:
+                self.tree[parent] += self.tree[i]
+        self.total_weight = sum(self.weights)
+
+        # highest power of two not bigger than n, used as first step of the binary search in find()
+        self.top_step = 1 << (self.n.bit_length() - 1) if self.n > 0 else 0
+
+    # returns a copy of the tree that can be modified without affecting the original (lists are copied at C speed)
+    def copy(self):
+
+        new_tree = Fenwick_Tree.__new__(Fenwick_Tree)
+        new_tree.n = self.n
+        new_tree.weights = self.weights[:]
+        new_tree.tree = self.tree[:]
+        new_tree.total_weight = self.total_weight
+        new_tree.top_step = self.top_step
+        return new_tree
+
+    # adds delta to the weight of the element in position index (0-indexed)
+    def update(self, index, delta):
+
+        self.weights[index] += delta
+        self.total_weight += delta
+        i = index + 1
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+
+    # sets the weight of the element in position index to value (eg, value=0 removes the element from the sampling)
+    def set_weight(self, index, value):
+
+        self.update(index, value - self.weights[index])
+
+    # returns the sum of the weights of elements 0..index (both included)
+    def prefix_sum(self, index):
+
+        total = 0.0
+        i = index + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    # returns the smallest index such that prefix_sum(index) >= r, which is the element picked by a cumulative value r
+    # returns n if r is bigger than the total weight (can happen due to floating point rounding after many updates)
+    def find(self, r):
+
+        pos = 0
+        remaining = r
+        step = self.top_step
+        while step > 0:
+            if pos + step <= self.n and self.tree[pos + step] < remaining:
+                pos += step
+                remaining -= self.tree[pos]
+            step >>= 1
+        return pos
@@ -0,0 +1,236 @@
+import numpy as np
+from Input_Functions_econ import Input_Functions
+from Network_econ import Network
+
+
+# class runs the macro model (see Macro_Model and config.type_model 'MODEL_MACRO') for a batch of S configurations at
+# once: the scenarios are the first dimension of all the state variables, which are arrays of shape
+# (S, num_intervals), and each month is computed for all the scenarios with a few vector operations. The configurations
+# can differ in any parameter (eg emission_rate, alpha, frac_token_delegated or price_packet_initial_dollar) but must
+# have the same num_intervals. Row s of a state variable is the series of Econ_Results(configs[s]) in macro mode
+# Example: Macro_Batch(configs).rewards_unclaimed[s, month]
+class Macro_Batch:
+    def __init__(self, configs):
+
+        self.configs = configs  # list of S configurations, one per scenario
+        self.num_scenarios = len(configs)
+        self.parameters = {}  # name of a Config parameter -> vector with its value in each scenario
+        self.num_intervals = configs[0].num_intervals
+        if any(config.num_intervals != self.num_intervals for config in configs):
+            print("ISSUE: all the configurations of a Macro_Batch must have the same num_intervals")
+            exit("error: bad configurations for Macro_Batch")
+
+        ############
+        # inputs of each scenario (preset functions and network size), stacked in arrays of shape (S, num_intervals)
+        ############
+
+        # the inputs are computed once for each group of scenarios that only differ in state_parameters
+        inputs = {}  # key of the configuration without state_parameters -> input vectors
+        rows = []
+        for config in configs:
+            key = repr(sorted((name, value) for name, value in vars(config).items()
+                              if name not in Macro_Batch.state_parameters))
+            if key not in inputs:
+                inputs[key] = self.compute_inputs(config)
+            rows.append(inputs[key])
+        self.bw_demand, self.token_per_dollar, self.pp_token, self.k, self.mixnet_width, self.num_mixes = \
+            [np.array([row[i] for row in rows], dtype=float) for i in range(6)]
+
+        ############
+        # initial state, as in Econ_Results (one row per scenario)
+        ############
+
+        shape = (self.num_scenarios, self.num_intervals)
+        self.mixmining_pool = np.full(shape, self.get_parameter('mixmining_pool_initial')[:, None])
+        self.circulating_tokens = np.full(shape, self.get_parameter('liquid_tokens_initial')[:, None])
+        self.unvested_tokens = np.full(shape, self.get_parameter('unvested_tokens_initial')[:, None])
+        self.max_effective_stake = self.get_parameter('beta')[:, None] * self.circulating_tokens
+        self.stake_saturation_mix = self.max_effective_stake / self.k
+        self.pledged_stake = self.get_parameter('frac_token_pledged')[:, None] * self.max_effective_stake
+        self.delegated_stake = self.get_parameter('frac_token_delegated')[:, None] * self.max_effective_stake
+        self.mixmining_emitted = self.mixmining_pool * self.get_parameter('emission_rate')[:, None]
+        self.bw_income = self.pp_token * self.bw_demand
+        self.share_income_bw_mix = self.bw_income * self.get_parameter('bw_to_mix')[:, None]
+        self.share_income_bw_gw = self.bw_income * self.get_parameter('bw_to_gw')[:, None]
+        self.income_global_mix = self.mixmining_emitted + self.share_income_bw_mix
+        self.income_global = self.income_global_mix + self.share_income_bw_gw
+        self.rewards_distributed = np.zeros(shape)
+        self.rewards_distributed_mix = np.zeros(shape)
+        self.rewards_unclaimed = np.zeros(shape)
+
+        ############
+        # update the state of all the scenarios on an interval-by-interval basis
+        ############
+
+        for month in range(self.num_intervals):
+            self.compute_next_state(month)
+
+    # Config parameters used only by the monthly state updates (not by the preset input functions nor by Network)
+    state_parameters = ['mixmining_pool_initial', 'emission_rate', 'liquid_tokens_initial', 'unvested_tokens_initial',
+                        'number_vesting_accounts', 'cap_staking_unvested', 'frac_staking_unvested', 'vesting_period',
+                        'vesting_interval', 'frac_token_pledged', 'frac_token_delegated', 'bw_to_mix', 'bw_to_gw',
+                        'node_profit_margin', 'node_performance', 'minimum_pledge_mix', 'frac_min_pledge_mix',
+                        'frac_whale_mix', 'beta', 'alpha', 'factor_work_active']
+
+    # returns the input vectors of a configuration: bw_demand, token_per_dollar, pp_token, k, mixnet_width, num_mixes
+    @staticmethod
+    def compute_inputs(config):
+
+        input_functions = Input_Functions(config)
+        bw_demand = input_functions.get_function(config.type_bw_growth)
+        token_per_dollar = np.reciprocal(input_functions.get_function(config.type_token_growth), dtype=float)
+        pp_token = np.multiply(input_functions.get_function(config.type_pp_growth), token_per_dollar)
+        network = Network(config, bw_demand, input_functions.get_function(config.type_cpu_growth),
+                          input_functions.get_function(config.type_capacity_growth))
+        return bw_demand, token_per_dollar, pp_token, network.k, network.mixnet_width, network.num_mixes
+
+    # returns a vector with the value of a Config parameter in each scenario (read once from the configurations)
+    def get_parameter(self, name):
+
+        if name not in self.parameters:
+            self.parameters[name] = np.array([getattr(config, name) for config in self.configs], dtype=float)
+        return self.parameters[name]
+
+    # computes the state of all the scenarios for the month (same steps as Econ_Results.compute_next_state in macro mode)
+    def compute_next_state(self, month):
+
+        self.update_vesting_staking(month)
+        self.update_mixmining_pool_and_available_rewards(month)
+        self.assign_rewards(month)
+
+    # same as Econ_Results.update_vesting_staking, for all the scenarios
+    def update_vesting_staking(self, month):
+
+        if month > 0:
+            vesting_interval = self.get_parameter('vesting_interval')
+            vesting = np.where((self.unvested_tokens[:, month - 1] > 0) & (month % vesting_interval == 0),
+                               self.get_parameter('unvested_tokens_initial') * vesting_interval /
+                               self.get_parameter('vesting_period'), 0.0)
+
+            self.unvested_tokens[:, month] = self.unvested_tokens[:, month - 1] - vesting
+            self.circulating_tokens[:, month] = self.circulating_tokens[:, month - 1] + vesting + \
+                self.mixmining_emitted[:, month - 1] - self.rewards_unclaimed[:, month - 1]
+
+            if month < 3:  # no staking by big accounts with locked token in Q1
+                w_stake = self.circulating_tokens[:, month]
+            else:  # caps applied to large locked accounts for staking from Q2
+                capped_staking = self.get_parameter('number_vesting_accounts') * \
+                                 self.get_parameter('cap_staking_unvested')
+                w_stake = self.circulating_tokens[:, month] + capped_staking + \
+                    self.get_parameter('frac_staking_unvested') * (self.unvested_tokens[:, month] - capped_staking)
+
+            self.max_effective_stake[:, month] = self.get_parameter('beta') * w_stake
+            self.stake_saturation_mix[:, month] = self.max_effective_stake[:, month] / self.k[:, month]
+            self.pledged_stake[:, month] = self.get_parameter('frac_token_pledged') * self.max_effective_stake[:, month]
+            self.delegated_stake[:, month] = self.get_parameter('frac_token_delegated') * \
+                                             self.max_effective_stake[:, month]
+
+    # same as Econ_Results.update_mixmining_pool_and_available_rewards, for all the scenarios
+    def update_mixmining_pool_and_available_rewards(self, month):
+
+        if month > 0:
+            self.mixmining_pool[:, month] = self.mixmining_pool[:, month - 1] - self.mixmining_emitted[:, month - 1] + \
+                                            self.rewards_unclaimed[:, month - 1]
+            self.mixmining_emitted[:, month] = self.mixmining_pool[:, month] * self.get_parameter('emission_rate')
+
+        self.income_global_mix[:, month] = self.mixmining_emitted[:, month] + self.share_income_bw_mix[:, month]
+        self.income_global[:, month] = self.income_global_mix[:, month] + self.share_income_bw_gw[:, month]
+
+    # same as Econ_Results.assign_rewards_macro, for all the scenarios (groups of nodes as in Macro_Model)
+    def assign_rewards(self, month):
+
+        k = self.k[:, month]
+        counts, pledges, delegated = self.compute_node_groups(month)
+        total_stake = (self.stake_saturation_mix[:, month] * k)[:, None]
+        lambda_node = np.minimum(pledges / total_stake, 1 / k[:, None])
+        sigma_node = np.minimum((pledges + delegated) / total_stake, 1 / k[:, None])
+
+        mix_active = self.get_parameter('mixnet_layers') * self.mixnet_width[:, month]
+        prob_active = self.compute_inclusion_probabilities(sigma_node, counts, mix_active)
+        prob_reserve = np.maximum(self.compute_inclusion_probabilities(sigma_node, counts, k) - prob_active, 0)
+
+        # work factors of active and idle nodes (see Econ_Results.compute_work_factors)
+        factor = self.get_parameter('factor_work_active')
+        idle_nodes = k - mix_active
+        work_active = (factor / (factor * k - (factor - 1) * idle_nodes))[:, None]
+        work_idle = (1 / (factor * k - (factor - 1) * idle_nodes))[:, None]
+
+        alpha = self.get_parameter('alpha')[:, None]
+        reward_factor = self.get_parameter('node_performance')[:, None] * self.income_global_mix[:, month, None] * \
+            sigma_node * k[:, None] / (1 + alpha)
+        received_rewards = reward_factor * (prob_active * (work_active + alpha * lambda_node) +
+                                            prob_reserve * (work_idle + alpha * lambda_node))
+
+        self.rewards_distributed_mix[:, month] = np.sum(counts * received_rewards, axis=1)
+        self.rewards_distributed[:, month] = self.rewards_distributed_mix[:, month] + self.share_income_bw_gw[:, month]
+        self.rewards_unclaimed[:, month] = self.income_global[:, month] - self.rewards_distributed[:, month]
+
+    # returns the arrays count, pledge and delegated of shape (S, 6) with the groups of nodes of the month: the nodes
+    # with saturated, random and minimum pledge (in this order), each split into the nodes that get delegation in the
+    # last allocation pass and those that do not. Gives the same delegations as Macro_Model.allocate_expected_delegation
+    # in closed form: in each pass the nodes receive half of their free capacity, so after m complete passes a node
+    # with capacity C has received (1 - 2^-m) * C, and the remaining budget covers part of pass m + 1 in serial order
+    def compute_node_groups(self, month):
+
+        stake_saturation = self.stake_saturation_mix[:, month]
+        minimum_pledge = self.get_parameter('minimum_pledge_mix')
+        nr_sat = np.round(self.get_parameter('frac_whale_mix') * self.k[:, month])
+        nr_min = np.round(self.get_parameter('frac_min_pledge_mix') * self.num_mixes[:, month])
+        nr_rand = self.num_mixes[:, month] - nr_sat - nr_min
+
+        budget_pledge_remain = self.pledged_stake[:, month] - nr_sat * stake_saturation - \
+            (nr_min + nr_rand) * minimum_pledge
+        if np.any(budget_pledge_remain < 0):
+            print("ISSUE: Not enough pledge to allocate minimum amount to enough MIX nodes in scenarios",
+                  np.flatnonzero(budget_pledge_remain < 0))
+            exit("error: pledge budget insufficient for minimum coverage of all nodes")
+        mean_rand_pledge = minimum_pledge + np.where(nr_rand > 0, budget_pledge_remain / np.maximum(nr_rand, 1), 0)
+
+        class_counts = np.stack([nr_sat, nr_rand, nr_min], axis=1)
+        class_pledges = np.stack([stake_saturation, mean_rand_pledge, minimum_pledge * np.ones(self.num_scenarios)],
+                                 axis=1)
+        capacity = np.maximum(stake_saturation[:, None] - class_pledges, 0)  # free capacity per node of each class
+        total_capacity = np.sum(class_counts * capacity, axis=1)
+        budget = self.delegated_stake[:, month]
+        if np.any(budget >= total_capacity):
+            print("ISSUE: all mix nodes are saturated and there is still stake left to delegate, in scenarios",
+                  np.flatnonzero(budget >= total_capacity))
+            budget = np.minimum(budget, total_capacity * (1 - 2.0**-50))
+
+        # number of complete allocation passes, and budget left for the last (partial) pass
+        with np.errstate(divide='ignore', invalid='ignore'):
+            passes = np.floor(-np.log2(1 - budget / total_capacity))
+        passes = np.where(total_capacity > 0, passes, 0)
+        budget_left = budget - (1 - 2.0**-passes) * total_capacity
+        delegated = ((1 - 2.0**-passes)[:, None] * capacity)
+        sample = (2.0**-(passes + 1))[:, None] * capacity  # delegation per node in the last pass
+        class_budget = class_counts * sample
+        budget_before = np.cumsum(class_budget, axis=1) - class_budget  # budget used by the previous classes
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.clip((budget_left[:, None] - budget_before) / class_budget, 0, 1)
+        fraction = np.where(class_budget > 0, fraction, 0)
+
+        counts = np.concatenate([class_counts * fraction, class_counts * (1 - fraction)], axis=1)
+        pledges = np.concatenate([class_pledges, class_pledges], axis=1)
+        delegated = np.concatenate([delegated + sample, delegated], axis=1)
+        return counts, pledges, delegated
+
+    # same as Network.compute_inclusion_probabilities with counts, with one row of weights and counts per scenario
+    # (nr_picks is a vector): the Newton iterations are done for all the scenarios at once
+    @staticmethod
+    def compute_inclusion_probabilities(weights, counts, nr_picks, tolerance=10**-12, max_iterations=100):
+
+        positive = (weights > 0) & (counts > 0)
+        all_picked = nr_picks >= np.sum(np.where(positive, counts, 0), axis=1)  # nodes with stake always picked
+        t = np.zeros(len(weights))
+        for iteration in range(max_iterations):
+            exp_terms = np.exp(-weights * t[:, None])
+            excess = np.sum(counts * (1 - exp_terms), axis=1) - nr_picks
+            converged = all_picked | (np.abs(excess) <= tolerance * nr_picks)
+            if np.all(converged):
+                break
+            t = np.where(converged, t, t - excess / np.sum(counts * weights * exp_terms, axis=1))
+
+        probabilities = 1 - np.exp(-weights * t[:, None])
+        probabilities = np.where(all_picked[:, None], positive.astype(float), probabilities)
+        return np.where(nr_picks[:, None] > 0, probabilities, 0.0)
@@ -0,0 +1,95 @@
+import numpy as np
+from Network_econ import Network
+from Node_Table_econ import SAT_LEVELS
+
+
+# class computes the aggregate rewards of the mix nodes of each interval (month) without creating the nodes, for the
+# macro-only mode of Econ_Results (config.type_model 'MODEL_MACRO'). The nodes of an interval are replaced by a few
+# groups of identical nodes: the classes of nodes with saturated, random and minimum pledge (the mean pledge of the
+# class), split where the delegated stake runs out. Each group gets the expected delegation of the allocation done by
+# Network (nodes in serial order receive on average half of their free capacity, until the budget is exhausted) and
+# the expected share of active and reserve epochs (inclusion probabilities, as with 'WORK_SHARE_EXPECTED')
+# The result is a mean-field approximation: differences with the full model come from the spread of the random
+# pledges within their class (Econ_Results.get_model_deviation measures them)
+class Macro_Model:
+    def __init__(self, config, network):
+
+        self.config = config  # contains all the input variables
+        self.network = network  # provides k, mixnet_width and num_mixes per interval (no nodes are created)
+        self.groups = {}  # per interval: dictionary of vectors (one value per group of identical nodes)
+
+    # sets self.groups[month] with the groups of nodes of the interval and their pledge, delegation, lambda, sigma and
+    # share of active and reserve epochs
+    def create_node_groups(self, month, stake_saturation, pledged_stake, delegated_stake):
+
+        k = self.network.k[month]
+        nr_nodes_sat_pledge = int(round(self.config.frac_whale_mix * k))
+        nr_nodes_min_pledge = int(round(self.config.frac_min_pledge_mix * self.network.num_mixes[month]))
+        nr_nodes_rand_pledge = self.network.num_mixes[month] - nr_nodes_sat_pledge - nr_nodes_min_pledge
+
+        budget_pledge_remain = pledged_stake - nr_nodes_sat_pledge * stake_saturation - \
+                               (nr_nodes_min_pledge + nr_nodes_rand_pledge) * self.config.minimum_pledge_mix
+        if budget_pledge_remain < 0:
+            print("ISSUE: Not enough pledge to allocate minimum amount to enough MIX nodes !!!")
+            print("In Config: increase frac_token_pledged; decrease minimum_pledge_mix; or decrease frac_whale_mix.")
+            exit("error: pledge budget insufficient for minimum coverage of all nodes")
+        # the random pledges of the class add up to the remaining budget, so their mean is known exactly
+        mean_rand_pledge = self.config.minimum_pledge_mix
+        if nr_nodes_rand_pledge > 0:
+            mean_rand_pledge += budget_pledge_remain / nr_nodes_rand_pledge
+
+        # groups in the serial order of the nodes in Network: saturated, random and minimum pledge
+        counts = np.array([nr_nodes_sat_pledge, nr_nodes_rand_pledge, nr_nodes_min_pledge], dtype=float)
+        pledges = np.array([stake_saturation, mean_rand_pledge, self.config.minimum_pledge_mix])
+        sat_codes = np.array([SAT_LEVELS.index('SAT'), SAT_LEVELS.index('RND'), SAT_LEVELS.index('MIN')])
+        counts, pledges, delegated, sat_codes = self.allocate_expected_delegation(
+            counts[counts > 0], pledges[counts > 0], sat_codes[counts > 0], stake_saturation, delegated_stake)
+
+        total_stake = stake_saturation * k
+        lambda_node = np.minimum(pledges / total_stake, 1 / k)
+        sigma_node = np.minimum((pledges + delegated) / total_stake, 1 / k)
+
+        mix_active = self.config.mixnet_layers * self.network.mixnet_width[month]
+        prob_active = Network.compute_inclusion_probabilities(sigma_node, mix_active, counts=counts)
+        prob_selected = Network.compute_inclusion_probabilities(sigma_node, k, counts=counts)
+
+        self.groups[month] = {'count': counts, 'sat_code': sat_codes, 'pledge': pledges, 'delegated': delegated,
+                              'lambda_node': lambda_node, 'sigma_node': sigma_node, 'activity_percent': prob_active,
+                              'reserve_percent': np.maximum(prob_selected - prob_active, 0)}
+
+    # replays with expected values the allocation of delegated stake of Network.allocate_delegated_stake_mixnet: in
+    # each pass, the unsaturated nodes in serial order receive half of their free capacity until the budget runs out.
+    # A group where the budget runs out is split into the nodes that received delegation and the nodes that did not
+    # (the counts can be fractional). Returns the vectors count, pledge, delegated and sat_code of the groups
+    @staticmethod
+    def allocate_expected_delegation(counts, pledges, sat_codes, stake_saturation, delegated_stake, max_passes=100):
+
+        counts = list(counts)
+        pledges = list(pledges)
+        delegated = [0.0] * len(counts)
+        sat_codes = list(sat_codes)
+        remain_delegated_stake = delegated_stake
+        for allocation_pass in range(max_passes):
+            group = 0
+            while group < len(counts) and remain_delegated_stake > 0:
+                sample = 0.5 * (stake_saturation - pledges[group] - delegated[group])  # expected sample per node
+                if sample > 0:
+                    if counts[group] * sample <= remain_delegated_stake:
+                        delegated[group] += sample
+                        remain_delegated_stake -= counts[group] * sample
+                    else:  # split the group: the budget is exhausted after nr_delegated nodes
+                        nr_delegated = remain_delegated_stake / sample
+                        counts.insert(group + 1, counts[group] - nr_delegated)
+                        pledges.insert(group + 1, pledges[group])
+                        delegated.insert(group + 1, delegated[group])
+                        sat_codes.insert(group + 1, sat_codes[group])
+                        counts[group] = nr_delegated
+                        delegated[group] += sample
+                        remain_delegated_stake = 0
+                group += 1
+            if remain_delegated_stake <= 10**-9 * delegated_stake:
+                break
+        else:
+            print("ISSUE: all mix nodes are saturated and there is still stake left to delegate")
+
+        return np.array(counts), np.array(pledges), np.array(delegated), np.array(sat_codes)
@@ -1,8 +1,12 @@
 import math
+import pickle
 import random
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from numpy.random import random_sample
-from Node_econ import Node
+from Node_Table_econ import Node_Table, SAT_LEVELS
+from Node_Registry_econ import Node_Registry
+from Fenwick_Tree_econ import Fenwick_Tree
+from Random_Streams_econ import Random_Streams
 
 
 # This class contains the existing mix nodes per interval (main variable: the list_mix dictionary)
@@ -10,7 +14,7 @@ from Node_econ import Node
 # For each mix node of each interval the class computes its staking (pledge + delegation) and samples its activity level
 # The dictionary list_mix also stores the rewards received per interval by each node operator and its delegates
 class Network:
-    def __init__(self, config, bw_demand, cpus_per_mix, cpu_capacity):
+    def __init__(self, config, bw_demand, cpus_per_mix, cpu_capacity, sizing=None):
 
         self.config = config  # contains all the input variables
         self.bw_demand = bw_demand  # vector with the aggregate nr of sphinx packets per month from users
@@ -19,14 +23,34 @@ class Network:
         self.mix_capacity = np.multiply(cpu_capacity, cpus_per_mix)  # max nr of packets per second per mix over time
         self.mix_avg_load = np.divide(self.mix_capacity, self.config.peak_factor)  # average load relative to peak
         self.bw_demand_avg_second = np.divide(self.bw_demand, (3600 * 24 * 30))  # conversion of bw_demand to seconds
-        self.mixnet_width = self.set_mixnet_width()  # compute mixnet width per interval considering bw_demand
-        self.k = self.set_k_mixes()  # compute nr of rewarded mixes per interval considering bw_demand and configuration
-        self.num_mixes = self.set_num_mixes()  # total number of registered mix nodes, assumed to be in excess of k
+        if sizing is None:
+            self.mixnet_width = self.set_mixnet_width()  # compute mixnet width per interval considering bw_demand
+            self.k = self.set_k_mixes()  # compute nr of rewarded mixes per interval considering bw_demand and config
+            self.num_mixes = self.set_num_mixes()  # total number of registered mix nodes, assumed to be in excess of k
+        else:  # sizes already computed for the same configuration (copied, since they can be changed by apply_config)
+            self.mixnet_width = sizing['mixnet_width'][:]
+            self.k = sizing['k'][:]
+            self.num_mixes = sizing['num_mixes'][:]
+        self.pledge_capping_rounds = {}  # per interval: nr of rounds needed to cap the random pledges to saturation
+        self.next_node_id = 0  # identifier given to the next node created (node_id)
+        self.registry = None  # registry of nodes persisting across intervals (with 'NETWORK_PERSISTENT_CHURN')
+        # per interval: states of the global random generators before the random steps of create_list_mixes
+        # ('node_creation', 'delegation', 'sampling') and after them ('end'), used by Econ_Results.rerun
+        self.rng_states = {}
+        self.random_streams = None  # own generator per stochastic stage and month (with 'RANDOM_COMMON_STREAMS')
+        self.sampling_pool = None  # worker processes of 'SAMPLING_PARALLEL_KEYS', kept from month to month of a run
+        # root of the epoch substreams of 'SAMPLING_PARALLEL_KEYS' (random_seed, or fresh entropy if it is None)
+        self.sampling_entropy = np.random.SeedSequence(self.config.random_seed).entropy
+        if self.config.type_random_numbers == 'RANDOM_COMMON_STREAMS':
+            self.random_streams = Random_Streams(self.config.random_seed)
+        elif self.config.type_random_numbers != 'RANDOM_GLOBAL':
+            print("ISSUE: unknown type_random_numbers in Config:", self.config.type_random_numbers)
+            exit("error: bad type of random numbers")
 
         # dictionary containing values for all nodes of all intervals
-        self.list_mix = {}  # dictionary mixes, one entry per interval containing list of mix nodes for the interval
+        self.list_mix = {}  # dictionary mixes, one entry per interval containing the table of mix nodes for the interval
         for month in range(self.config.num_intervals):
-            self.list_mix[month] = []  # per interval, create list of Nodes existing in that interval
+            self.list_mix[month] = []  # per interval, replaced by the Node_Table of the interval when it is created
 
     # Returns a vector with the minimum required mixnet width per interval
     # The result is determined by the average traffic per second and the average throughput of mixes
@@ -66,10 +90,76 @@ class Network:
 
         return n
 
-    # Creates a vector with all the mix nodes and appends them to self.list_mix[month]
+    # Creates a table (Node_Table) with all the mix nodes of the interval and stores it in self.list_mix[month]
     # Sets pledge amounts, delegation amounts and other node variables
+    # with config.type_network_evolution 'NETWORK_REGENERATE' all the nodes are created from scratch every month, while
+    # with 'NETWORK_PERSISTENT_CHURN' the nodes of the previous month are kept in a registry and only updated with churn
     def create_list_mixes(self, month, cost_node_month, stake_saturation, pledged_stake, delegated_stake):
 
+        self.rng_states[month] = {'node_creation': self.get_rng_state()}
+        if self.config.type_network_evolution == 'NETWORK_REGENERATE' or self.registry is None:
+            self.create_new_list_mixes(month, cost_node_month, stake_saturation, pledged_stake)
+            # function randomizes the allocation of delegated stake to unsaturated nodes
+            self.rng_states[month]['delegation'] = self.get_rng_state()
+            self.allocate_delegated_stake_mixnet(month, stake_saturation, delegated_stake)
+            if self.config.type_network_evolution == 'NETWORK_PERSISTENT_CHURN':
+                self.registry = Node_Registry(self.list_mix[month])
+        elif self.config.type_network_evolution == 'NETWORK_PERSISTENT_CHURN':
+            self.update_list_mixes_churn(month, cost_node_month, stake_saturation, pledged_stake, delegated_stake)
+        else:
+            print("ISSUE: unknown type_network_evolution in Config:", self.config.type_network_evolution)
+            exit("error: bad type of network evolution")
+
+        # set the lambda and sigma variables of all mix nodes
+        total_stake = stake_saturation * self.k[month]
+        self.set_lambda_sigma_mixnet(month, total_stake)
+
+        # Finally, update the activity level (share of workload) of the nodes
+        self.set_work_share_mixes(month)
+
+    # sets the activity and reserve values (share of workload) of the nodes of the interval, sampled or expected
+    # depending on config.type_work_share
+    def set_work_share_mixes(self, month):
+
+        self.rng_states[month]['sampling'] = self.get_rng_state()
+        if self.config.type_work_share == 'WORK_SHARE_SAMPLED':
+            activity_vector, reserve_vector = self.sample_work_share_mixes(month)
+        elif self.config.type_work_share == 'WORK_SHARE_EXPECTED':
+            activity_vector, reserve_vector = self.compute_expected_work_share_mixes(month)
+        else:
+            activity_vector, reserve_vector = None, None
+            print("ISSUE: unknown type_work_share in Config:", self.config.type_work_share)
+            exit("error: bad type of work share")
+        # set the activity and reserve values of the nodes of the interval (vectors are indexed by node serial)
+        self.list_mix[month].activity_percent[:] = activity_vector
+        self.list_mix[month].reserve_percent[:] = reserve_vector
+        self.list_mix[month].mark_changed()
+        self.rng_states[month]['end'] = self.get_rng_state()
+
+    # returns the states of the global random generators (random and np.random) as bytes, that can be compared
+    @staticmethod
+    def get_rng_state():
+        return pickle.dumps((random.getstate(), np.random.get_state()), protocol=pickle.HIGHEST_PROTOCOL)
+
+    # sets the states of the global random generators to a state returned by get_rng_state
+    @staticmethod
+    def set_rng_state(state):
+
+        random_state, numpy_state = pickle.loads(state)
+        random.setstate(random_state)
+        np.random.set_state(numpy_state)
+
+    # returns the generator used by the stochastic stage name in the month: its own stream with 'RANDOM_COMMON_STREAMS'
+    # (see Random_Streams), otherwise the global NumPy generator (np.random)
+    def get_generator(self, name, month):
+
+        if self.random_streams is None:
+            return np.random
+        return self.random_streams.get(name, month)
+
+    # Creates all the nodes of the interval from scratch, setting their pledge (the delegated stake is allocated next)
+    def create_new_list_mixes(self, month, cost_node_month, stake_saturation, pledged_stake):
+
         # compute number of nodes with saturated, minimum and random pledge
         nr_nodes_sat_pledge = int(round(self.config.frac_whale_mix * self.k[month]))  # frac of k! (equilibrium parameter)
         nr_nodes_min_pledge = int(round(self.config.frac_min_pledge_mix * self.num_mixes[month]))  # frac of total !!
@@ -84,115 +174,299 @@ class Network:
             print("In Config: increase frac_token_pledged; decrease minimum_pledge_mix; or decrease frac_whale_mix.")
             exit("error: pledge budget insufficient for minimum coverage of all nodes")
 
-        # create nr_nodes_sat_pledge with saturated pledges
-        for index in range(nr_nodes_sat_pledge):
-            node_serial = index
-            pledge = stake_saturation
-            node = Node(node_serial, 'SAT', pledge, self.config.node_profit_margin,  self.config.node_performance,
-                        cost_node_month, stake_saturation)
-            self.list_mix[month].append(node)
-
         # maximum excess over the minimum pledge to reach saturation
         max_excess = stake_saturation - self.config.minimum_pledge_mix
         # excess_pledge[index] contains the excess (over the minimum) pledge of the nr_nodes_rand_pledge nodes
-        excess_pledge = self.compute_excess_pledge_pareto_ish(nr_nodes_rand_pledge, budget_pledge_remain, max_excess)
-        # create nr_nodes_rand_pledge nodes with random pledge
-        for index in range(nr_nodes_rand_pledge):  # create node and add it to list
-            node_serial = index + nr_nodes_sat_pledge
-            pledge = self.config.minimum_pledge_mix + excess_pledge[index]
-            node = Node(node_serial, 'RND', pledge, self.config.node_profit_margin, self.config.node_performance,
-                        cost_node_month, stake_saturation)
-            self.list_mix[month].append(node)
-
-        # create nr_nodes_min_pledge nodes with minimum pledge
-        for index in range(nr_nodes_min_pledge):  # create node and add it to list
-            node_serial = index + nr_nodes_sat_pledge + nr_nodes_rand_pledge
-            pledge = self.config.minimum_pledge_mix
-            node = Node(node_serial, 'MIN', pledge, self.config.node_profit_margin, self.config.node_performance,
-                        cost_node_month, stake_saturation)
-            self.list_mix[month].append(node)
-
-        # function randomizes the allocation of delegated stake to unsaturated nodes
-        self.allocate_delegated_stake_mixnet(month, stake_saturation, delegated_stake)
-
-        # set the lambda and sigma variables of all mix nodes
-        total_stake = stake_saturation * self.k[month]
-        self.set_lambda_sigma_mixnet(month, total_stake)
-
-        # Finally, update the activity level (share of workload) of the nodes
-        activity_vector, reserve_vector = self.sample_work_share_mixes(month)
-        # set the activity and reserve values in each of the nodes of the list for the interval
-        for mix in self.list_mix[month]:
-            mix.activity_percent = activity_vector[mix.serial]
-            mix.reserve_percent = reserve_vector[mix.serial]
+        excess_pledge = self.compute_excess_pledge_pareto_ish(nr_nodes_rand_pledge, budget_pledge_remain, max_excess,
+                                                              month)
+
+        # the nodes are stored in order: nr_nodes_sat_pledge nodes with saturated pledges, nr_nodes_rand_pledge nodes
+        # with random pledge and nr_nodes_min_pledge nodes with minimum pledge (the serial is the position in the table)
+        sat_codes = np.repeat([SAT_LEVELS.index('SAT'), SAT_LEVELS.index('RND'), SAT_LEVELS.index('MIN')],
+                              [nr_nodes_sat_pledge, nr_nodes_rand_pledge, nr_nodes_min_pledge])
+        pledges = np.concatenate([np.full(nr_nodes_sat_pledge, stake_saturation),
+                                  np.add(self.config.minimum_pledge_mix, np.asarray(excess_pledge, dtype=float)),
+                                  np.full(nr_nodes_min_pledge, self.config.minimum_pledge_mix, dtype=float)])
+        node_ids = np.arange(self.next_node_id, self.next_node_id + len(pledges))  # new nodes get new identifiers
+        self.next_node_id += len(pledges)
+        self.list_mix[month] = Node_Table(sat_codes, pledges, self.config.node_profit_margin,
+                                          self.config.node_performance, cost_node_month, stake_saturation, node_ids)
+
+    # Updates the registry of nodes of the previous interval with churn, and stores its nodes in self.list_mix[month]:
+    # a fraction config.churn_rate_unbond of the nodes unbond, the delegators of a fraction config.churn_rate_redelegate
+    # of the nodes withdraw their stake, and new nodes register to reach num_mixes[month] nodes.
+    # Nodes that stay keep their node_id and pledge, and the free delegated stake is allocated as in a new network
+    def update_list_mixes_churn(self, month, cost_node_month, stake_saturation, pledged_stake, delegated_stake):
+
+        generator = self.get_generator('churn', month)
+        self.registry.unbond(self.config.churn_rate_unbond, self.num_mixes[month], generator)
+        self.registry.withdraw_delegations(self.config.churn_rate_redelegate, generator)
+        self.registry.cap_delegations(stake_saturation)
+
+        # new nodes have the minimum pledge with probability frac_min_pledge_mix, and otherwise a random pledge
+        nr_new = self.num_mixes[month] - np.count_nonzero(self.registry.alive)
+        nr_new_min_pledge = generator.binomial(nr_new, self.config.frac_min_pledge_mix)
+        nr_new_rand_pledge = nr_new - nr_new_min_pledge
+
+        # pledge budget for the new random pledges: what is not already pledged to registered nodes, limited to what
+        # the new nodes can take without saturating (any remaining budget is not pledged this month, and Econ_Results
+        # reports the pledge actually allocated)
+        max_excess = stake_saturation - self.config.minimum_pledge_mix
+        budget_pledge_remain = pledged_stake - np.sum(self.registry.table.pledge[self.registry.alive]) - \
+                               nr_new * self.config.minimum_pledge_mix
+        budget_pledge_remain = min(budget_pledge_remain, 0.9 * nr_new_rand_pledge * max_excess)
+        if budget_pledge_remain > 0:
+            excess_pledge = self.compute_excess_pledge_pareto_ish(nr_new_rand_pledge, budget_pledge_remain,
+                                                                  max_excess, month)
+        else:
+            excess_pledge = [0] * nr_new_rand_pledge
+        sat_codes = np.repeat([SAT_LEVELS.index('RND'), SAT_LEVELS.index('MIN')],
+                              [nr_new_rand_pledge, nr_new_min_pledge])
+        pledges = np.concatenate([np.add(self.config.minimum_pledge_mix, np.asarray(excess_pledge, dtype=float)),
+                                  np.full(nr_new_min_pledge, self.config.minimum_pledge_mix, dtype=float)])
+        self.registry.register(sat_codes, pledges, self.config.node_profit_margin, self.config.node_performance)
+
+        # nodes of the month, and allocation of the delegated stake that is not yet delegated to registered nodes
+        self.list_mix[month] = self.registry.snapshot(cost_node_month, stake_saturation)
+        free_delegated_stake = delegated_stake - np.sum(self.list_mix[month].delegated)
+        if free_delegated_stake > 0:
+            self.allocate_delegated_stake_mixnet(month, stake_saturation, free_delegated_stake)
+        self.registry.update_delegations(self.list_mix[month])
+
+    # returns a vector with the value of the node variable par (a Node_Table column) for the node with identifier
+    # node_id in each month, with None in the months when the node was not registered
+    def get_node_trajectory(self, node_id, par):
+
+        trajectory = []
+        for month in range(self.config.num_intervals):
+            mixes = self.list_mix[month]
+            index = np.flatnonzero(mixes.node_id == node_id) if len(mixes) > 0 else []
+            trajectory.append(getattr(mixes, par)[index[0]].item() if len(index) > 0 else None)
+        return trajectory
 
     # returns a vector excess_pledge with nr_nodes_rand_pledge values distributed following a pareto distribution.
     # The values of excess_pledge add up to remaining_pledge and no value is higher than max_excess
-    def compute_excess_pledge_pareto_ish(self, nr_nodes_rand_pledge, remaining_pledge, max_excess):
+    # the capping algorithm is selected with config.type_pledge_capping; if month is given, the number of capping
+    # rounds needed is recorded in self.pledge_capping_rounds[month]
+    def compute_excess_pledge_pareto_ish(self, nr_nodes_rand_pledge, remaining_pledge, max_excess, month=None):
 
         if nr_nodes_rand_pledge == 0:
             return []
-        excess_pledge = [0] * nr_nodes_rand_pledge
         shape = 1.16  # value that fulfills 80-20 distribution rule
-        samples = np.random.pareto(shape, nr_nodes_rand_pledge)
+        samples = self.get_generator('pledges', month).pareto(shape, nr_nodes_rand_pledge)
         normalized_samples = np.divide(samples, sum(samples))
-        # if the maximum value is higher than max, cap and rescale the pledging to 95% of maximum value
-        while max(normalized_samples) * remaining_pledge > max_excess:
-            for ind in range(nr_nodes_rand_pledge):
-                if normalized_samples[ind] * remaining_pledge > max_excess:
-                    # cap the highest (over the max) values to 99% of maximum
-                    normalized_samples[ind] = 0.99 * max_excess / remaining_pledge
-            # renormalize the vector after capping max values to 99% of maximum
-            normalized_samples = np.divide(normalized_samples, sum(normalized_samples))
+
+        # if the maximum value is higher than max, cap the pledges and rescale the rest so that they add up to one
+        if self.config.type_pledge_capping == 'CAPPING_ITERATIVE':
+            normalized_samples, rounds = self.cap_normalized_samples_iterative(normalized_samples,
+                                                                               max_excess / remaining_pledge)
+        elif self.config.type_pledge_capping == 'CAPPING_VECTORIZED':
+            normalized_samples, rounds = self.cap_normalized_samples_vectorized(normalized_samples,
+                                                                                max_excess / remaining_pledge)
+        elif self.config.type_pledge_capping == 'CAPPING_WATER_FILLING':
+            normalized_samples, rounds = self.cap_normalized_samples_water_filling(normalized_samples,
+                                                                                   max_excess / remaining_pledge)
+        else:
+            rounds = None
+            print("ISSUE: unknown type_pledge_capping in Config:", self.config.type_pledge_capping)
+            exit("error: bad type of pledge capping")
+        if month is not None:
+            self.pledge_capping_rounds[month] = rounds
 
         # set excess_pledge for nr_nodes_rand_pledge and leave at zero for the remaining nr_nodes_min_pledge
-        for i in range(nr_nodes_rand_pledge):
-            excess_pledge[i] = normalized_samples[i] * remaining_pledge
+        excess_pledge = (normalized_samples * remaining_pledge).tolist()
 
         return excess_pledge
 
+    # original capping algorithm: caps the values above max_value to 99% of max_value and renormalizes the vector,
+    # repeating until no value is above max_value. Returns the capped vector and the number of rounds performed
+    @staticmethod
+    def cap_normalized_samples_iterative(normalized_samples, max_value):
+
+        rounds = 0
+        while max(normalized_samples) > max_value:
+            for ind in range(len(normalized_samples)):
+                if normalized_samples[ind] > max_value:
+                    # cap the highest (over the max) values to 99% of maximum
+                    normalized_samples[ind] = 0.99 * max_value
+            # renormalize the vector after capping max values to 99% of maximum
+            normalized_samples = np.divide(normalized_samples, sum(normalized_samples))
+            rounds += 1
+
+        return normalized_samples, rounds
+
+    # same capping as cap_normalized_samples_iterative, with each round done in a few NumPy passes: the values above
+    # max_value are set to 99% of max_value and the vector is renormalised, until no value is above max_value. The sums
+    # are sequential (as the loop's sum()), so the result and the number of rounds are identical to those of the loop
+    # The rounds end only if the values can add up to one without exceeding max_value (len * max_value >= 1)
+    @staticmethod
+    def cap_normalized_samples_vectorized(normalized_samples, max_value):
+
+        if len(normalized_samples) * max_value < 1:
+            print("ISSUE: the pledge budget can not be split among the random pledge nodes without saturating them")
+            print("In Config: decrease frac_token_pledged or increase the number of nodes with random pledge.")
+            exit("error: pledge budget too big for the nodes with random pledge")
+
+        normalized_samples = np.asarray(normalized_samples, dtype=float)
+        rounds = 0
+        while np.max(normalized_samples) > max_value:
+            normalized_samples = np.where(normalized_samples > max_value, 0.99 * max_value, normalized_samples)
+            normalized_samples = np.divide(normalized_samples, np.cumsum(normalized_samples)[-1])
+            rounds += 1
+
+        return normalized_samples, rounds
+
+    # water-filling: same rounds as cap_normalized_samples_iterative, replayed on the samples sorted in decreasing order
+    # in O(n log n + rounds^2): the values capped in a round are the largest ones, so the capped nodes are a
+    # prefix of the sorted samples and each round is a scalar update. The capped nodes form groups (nodes last capped in
+    # the same round, all at the same value) and the other values are the samples times a common scale. A round re-caps
+    # the groups above max_value with the next sorted samples above max_value into a new group, and divides the group
+    # values and the scale by the new sum. Gives the same capped nodes and rounds as the loop, and the same values up to
+    # rounding (the sums are done in another order). Needs len * max_value >= 1, as the loop, to end
+    @staticmethod
+    def cap_normalized_samples_water_filling(normalized_samples, max_value):
+
+        if len(normalized_samples) * max_value < 1:
+            print("ISSUE: the pledge budget can not be split among the random pledge nodes without saturating them")
+            print("In Config: decrease frac_token_pledged or increase the number of nodes with random pledge.")
+            exit("error: pledge budget too big for the nodes with random pledge")
+
+        normalized_samples = np.asarray(normalized_samples, dtype=float)
+        order = np.argsort(-normalized_samples, kind='stable')
+        sorted_samples = normalized_samples[order]
+        tail_sums = np.append(np.cumsum(sorted_samples[::-1])[::-1], 0.0)  # tail_sums[k]: sum of sorted_samples[k:]
+        groups = []  # capped nodes: [nr of nodes, value, ranges (first, end) of their sorted positions]
+        nr_capped = 0  # the first nr_capped sorted samples are capped
+        scale = 1.0  # the values of the other nodes are sorted_samples * scale
+        rounds = 0
+        while any(group[1] > max_value for group in groups) or \
+                (nr_capped < len(sorted_samples) and sorted_samples[nr_capped] * scale > max_value):
+            first = nr_capped
+            # binary search of the samples above max_value / scale, corrected with the loop's comparison
+            nr_capped = max(nr_capped, int(np.searchsorted(-sorted_samples, -max_value / scale, side='left')))
+            while nr_capped > first and sorted_samples[nr_capped - 1] * scale <= max_value:
+                nr_capped -= 1
+            while nr_capped < len(sorted_samples) and sorted_samples[nr_capped] * scale > max_value:
+                nr_capped += 1
+            recapped = [group for group in groups if group[1] > max_value]
+            groups = [group for group in groups if group[1] <= max_value]
+            groups.append([sum(group[0] for group in recapped) + nr_capped - first, 0.99 * max_value,
+                           [interval for group in recapped for interval in group[2]] + [(first, nr_capped)]])
+            # renormalize the vector after capping max values to 99% of maximum
+            total = sum(group[0] * group[1] for group in groups) + scale * tail_sums[nr_capped]
+            for group in groups:
+                group[1] /= total
+            scale /= total
+            rounds += 1
+
+        capped = sorted_samples * scale
+        for nr_nodes, value, intervals in groups:
+            for first, end in intervals:
+                capped[first:end] = value
+        result = np.empty(len(capped))
+        result[order] = capped
+        return result, rounds
+
     # Takes the budget of available stake to delegate and allocates random amounts it to nodes, capped by saturation
     # Allocation is iterative, in order of node index, until the available budget for delegation is exhausted
     # The result changes the node.delegated values for the interval (month)
-    # Alternative functions are possible for allocating delegated stake to nodes
+    # Alternative functions are possible for allocating delegated stake to nodes (see config.type_delegation_allocation)
     def allocate_delegated_stake_mixnet(self, month, stake_saturation, all_delegated_stake):
 
+        if self.config.type_delegation_allocation == 'DELEGATION_SEQUENTIAL':
+            self.allocate_delegated_stake_mixnet_sequential(month, stake_saturation, all_delegated_stake)
+        elif self.config.type_delegation_allocation == 'DELEGATION_VECTORIZED':
+            self.allocate_delegated_stake_mixnet_vectorized(month, stake_saturation, all_delegated_stake)
+        else:
+            print("ISSUE: unknown type_delegation_allocation in Config:", self.config.type_delegation_allocation)
+            exit("error: bad type of delegation allocation")
+
+    # original allocation: loops over the nodes, drawing one uniform sample per unsaturated node and pass
+    def allocate_delegated_stake_mixnet_sequential(self, month, stake_saturation, all_delegated_stake):
+
+        # the loop works on python lists (faster element access than the table columns), copied back at the end
+        pledge = self.list_mix[month].pledge.tolist()
+        delegated = self.list_mix[month].delegated.tolist()
+        generator = self.get_generator('delegation', month)
         remain_delegated_stake = all_delegated_stake
         while remain_delegated_stake > 0:
-            for mix in self.list_mix[month]:
-                if mix.pledge + mix.delegated < stake_saturation:  # only delegate to unsaturated nodes
+            for i in range(len(pledge)):
+                if pledge[i] + delegated[i] < stake_saturation:  # only delegate to unsaturated nodes
                     # uniform between zero and maxing out on stake
-                    sample = random_sample() * (stake_saturation - mix.pledge - mix.delegated)
+                    sample = generator.random() * (stake_saturation - pledge[i] - delegated[i])
                     if sample < remain_delegated_stake:
-                        mix.delegated += sample
+                        delegated[i] += sample
                         remain_delegated_stake -= sample
                     else:  # last one gets remains and following ones get zero delegated
-                        mix.delegated += remain_delegated_stake
+                        delegated[i] += remain_delegated_stake
                         remain_delegated_stake = 0
+        self.list_mix[month].delegated[:] = delegated
+
+    # same allocation as allocate_delegated_stake_mixnet_sequential, one pass over the nodes at a time: the uniform
+    # samples of all unsaturated nodes are drawn at once, and the cumulative sum of the sampled amounts gives the node
+    # where the budget runs out. Nodes before it get their sample, that node gets the remains and the next ones nothing
+    def allocate_delegated_stake_mixnet_vectorized(self, month, stake_saturation, all_delegated_stake):
+
+        mixes = self.list_mix[month]
+        generator = self.get_generator('delegation', month)
+        remain_delegated_stake = all_delegated_stake
+        while remain_delegated_stake > 0:
+            unsaturated = np.flatnonzero(mixes.pledge + mixes.delegated < stake_saturation)  # in order of node index
+            if len(unsaturated) == 0:
+                print("ISSUE: all mix nodes are saturated and there is still stake left to delegate")
+                break
+            # uniform between zero and maxing out on stake
+            samples = generator.random(len(unsaturated)) * (stake_saturation - mixes.pledge[unsaturated] -
+                                                            mixes.delegated[unsaturated])
+            cumulative = np.cumsum(samples)
+            last = np.searchsorted(cumulative, remain_delegated_stake)  # first node whose sample is not below remains
+            if last == len(unsaturated):  # budget not exhausted in this pass
+                mixes.delegated[unsaturated] += samples
+                remain_delegated_stake -= cumulative[-1]
+            else:  # last one gets remains and following ones get zero delegated
+                mixes.delegated[unsaturated[:last]] += samples[:last]
+                mixes.delegated[unsaturated[last]] += remain_delegated_stake - (cumulative[last - 1] if last > 0 else 0)
+                remain_delegated_stake = 0
 
     # for each node registered in the interval, compute lambda and sigma based on node staking and token supply
     def set_lambda_sigma_mixnet(self, month, total_stake):
 
-        for mix in self.list_mix[month]:
-            mix.lambda_node = min(mix.pledge / total_stake, 1 / self.k[month])
-            mix.sigma_node = min((mix.pledge + mix.delegated) / total_stake, 1 / self.k[month])
+        mixes = self.list_mix[month]
+        mixes.lambda_node[:] = np.minimum(mixes.pledge / total_stake, 1 / self.k[month])
+        mixes.sigma_node[:] = np.minimum((mixes.pledge + mixes.delegated) / total_stake, 1 / self.k[month])
 
     # given the list of mix nodes in an interval (month), perform per-epoch (per-hour) sampling to obtain
     # the percentage of epochs the node is selected to be active and in reserve
     # the function returns two vectors indexed by node id, with the % of epochs each node was active and in reserve
-    # this function is the most resource-consuming (bottleneck) and could be substituted by a more efficient one
+    # the sampling algorithm is selected with config.type_epoch_sampling (all options are statistically identical)
     def sample_work_share_mixes(self, month):
 
-        list_cumul = []  # cumulative stake ordered by node index
-        cumul = 0.0
-        for mix in self.list_mix[month]:
-            cumul += mix.sigma_node
-            list_cumul.append(cumul)
+        if self.config.type_epoch_sampling == 'SAMPLING_LINEAR_SCAN':
+            activity_vector, reserve_vector = self.sample_work_share_mixes_linear(month)
+        elif self.config.type_epoch_sampling == 'SAMPLING_FENWICK_TREE':
+            activity_vector, reserve_vector = self.sample_work_share_mixes_fenwick(month)
+        elif self.config.type_epoch_sampling == 'SAMPLING_BATCHED_KEYS':
+            activity_vector, reserve_vector = self.sample_work_share_mixes_batched(month)
+        elif self.config.type_epoch_sampling == 'SAMPLING_PARALLEL_KEYS':
+            activity_vector, reserve_vector = self.sample_work_share_mixes_parallel(month)
+        else:
+            print("ISSUE: unknown type_epoch_sampling in Config:", self.config.type_epoch_sampling)
+            exit("error: bad type of epoch sampling")
+
+        return activity_vector, reserve_vector
+
+    # original sampling algorithm: each pick is a linear scan over the cumulative stake of the nodes, and after each
+    # pick the cumulative list is rewritten to remove the picked node, so the cost per epoch is O(k*n)
+    def sample_work_share_mixes_linear(self, month):
+
+        list_cumul = np.cumsum(self.list_mix[month].sigma_node).tolist()  # cumulative stake ordered by node index
 
         # number of mixes actively routing packets in the mixnet
         mix_active = self.config.mixnet_layers * self.mixnet_width[month]
         mix_reserve = self.k[month] - mix_active
 
+        # uniform samples from the global generator of random, or from the stream of the stage (common random numbers)
+        uniform = random.uniform if self.random_streams is None else self.get_generator('sampling', month).uniform
         activity_samples = {}  # dictionary of mix nodes
         for mix_id in range(self.num_mixes[month]):
             activity_samples[mix_id] = []  # per mix node : vector to track active and reserve epochs
@@ -205,7 +479,7 @@ class Network:
 
             # select the mix_active active nodes for the epoch (hour)
             while len(current_active) < mix_active:
-                r = random.uniform(0, list_cumul_temp[-1])  # upper bound decreases as more nodes are picked
+                r = uniform(0, list_cumul_temp[-1])  # upper bound decreases as more nodes are picked
                 candidate = next(i for i, x in enumerate(list_cumul_temp) if x >= r)
                 if candidate not in current_active:
                     current_active.append(candidate)
@@ -218,7 +492,7 @@ class Network:
 
             # select the mix_reserve reserve nodes for the epoch (hour)
             while len(current_reserve) < mix_reserve:
-                r = random.uniform(0, list_cumul_temp[-1])
+                r = uniform(0, list_cumul_temp[-1])
                 candidate = next(i for i, x in enumerate(list_cumul_temp) if x >= r)
                 if (candidate not in current_reserve) and (candidate not in current_active):
                     current_reserve.append(candidate)
@@ -243,49 +517,261 @@ class Network:
 
         return activity_vector, reserve_vector
 
-    # DOES NOT WORK DUE TO WEIGHTS VECTOR NOT ADDING UP TO ONE (due to rounding errors)
-    def sample_work_share_mixes_new(self, month):
-
-        list_mix = []
-        list_weights = []
-        for mix in self.list_mix[month]:
-            list_mix.append(mix.serial)
-            list_weights.append(mix.sigma_node)
+    # same sampling as sample_work_share_mixes_linear, with the cumulative stake kept in a Fenwick tree
+    # each pick (search of the node for a random cumulative value) and each removal of a picked node cost O(log n)
+    # the tree is built once per month (or kept in the registry of nodes) and copied at the start of each epoch
+    def sample_work_share_mixes_fenwick(self, month):
 
-        norm_weights = list_weights / np.sum(list_weights)
-        norm_weights = norm_weights / np.sum(norm_weights)
-        print("sum norm=", sum(norm_weights))
+        # with a persistent registry of nodes, its tree is reused (only the weights of changed nodes are updated)
+        if self.registry is not None and self.config.type_network_evolution == 'NETWORK_PERSISTENT_CHURN':
+            self.registry.update_sampling_tree(self.list_mix[month].stake_saturation)
+            base_tree = self.registry.sampling_tree
+            slots = self.registry.get_alive_slots()  # position in the tree of each node of the month
+        else:
+            base_tree = Fenwick_Tree(self.list_mix[month].sigma_node.tolist())
+            slots = None
 
         # number of mixes actively routing packets in the mixnet
         mix_active = self.config.mixnet_layers * self.mixnet_width[month]
         mix_reserve = self.k[month] - mix_active
 
-        activity_samples = {}  # dictionary of mix nodes
-        for mix_id in range(self.num_mixes[month]):
-            activity_samples[mix_id] = []  # per mix node : vector to track active and reserve epochs
+        # uniform samples from the global generator of random, or from the stream of the stage (common random numbers)
+        uniform = random.uniform if self.random_streams is None else self.get_generator('sampling', month).uniform
+        active_epochs = [0] * base_tree.n  # per mix node (tree element): nr of epochs in which it was active
+        reserve_epochs = [0] * base_tree.n  # per mix node (tree element): nr of epochs in which it was in reserve
 
         iterations = 30 * 24  # epochs in a month
         for epoch in range(iterations):
-            weights_copy = norm_weights[:]  # temporary copy of list_weights
-            # vector of mix nodes in the active set
-            current_active = np.random.choice(list_mix, size=mix_active, replace=False, p=norm_weights)
-            for mix_id in current_active:
-                weights_copy[mix_id] = 0.0
-            norm_weights_copy = weights_copy / np.sum(weights_copy)
-
-            # vector of mix nodes in the reserve set
-            current_reserve = np.random.choice(list_mix, size=mix_reserve, replace=False, p=norm_weights_copy)
-            # add to the samples of the nodes whether they where active or in reserve in the epoch
-            for active_mix in current_active:
-                activity_samples[active_mix].append('A')
-            for reserve_mix in current_reserve:
-                activity_samples[reserve_mix].append('R')
+            tree = base_tree.copy()  # temporary copy of the tree, picked nodes are removed from it
+
+            # select first the mix_active active nodes and then the mix_reserve reserve nodes for the epoch (hour)
+            for epochs_count, nr_picks in [(active_epochs, mix_active), (reserve_epochs, mix_reserve)]:
+                picked = 0
+                while picked < nr_picks:
+                    r = uniform(0, tree.total_weight)  # upper bound decreases as more nodes are picked
+                    candidate = tree.find(r)
+                    # candidates out of range or with zero weight can only come from rounding errors: sample again
+                    if candidate < tree.n and tree.weights[candidate] > 0:
+                        epochs_count[candidate] += 1
+                        tree.set_weight(candidate, 0)  # eliminate picked node from the tree
+                        picked += 1
+
+        if slots is not None:
+            active_epochs = [active_epochs[slot] for slot in slots]
+            reserve_epochs = [reserve_epochs[slot] for slot in slots]
+        activity_vector = [count / iterations for count in active_epochs]  # % of epochs each node has been active
+        reserve_vector = [count / iterations for count in reserve_epochs]  # % of epochs each node has been reserve
 
-        activity_vector = [0] * self.num_mixes[month]  # list with % of epochs in which each node has been active
-        reserve_vector = [0] * self.num_mixes[month]  # list with % of epochs in which each node has been reserve
-        for i in range(self.num_mixes[month]):
-            activity_vector[i] = activity_samples[i].count('A') / iterations
-            reserve_vector[i] = activity_samples[i].count('R') / iterations
+        return activity_vector, reserve_vector
+
+    # samples all the epochs of the month in a few NumPy passes (Efraimidis-Spirakis weighted sampling without
+    # replacement): each node gets in each epoch a key E/sigma_node with E a standard exponential sample, and picking
+    # the nodes by increasing key is equivalent to picking them one by one proportionally to their stake.
+    # The mix_active smallest keys of an epoch (row) are the active nodes and the next mix_reserve keys the reserve.
+    # Epochs are processed in chunks so that the key matrix never exceeds config.sampling_max_batch_elements values
+    def sample_work_share_mixes_batched(self, month):
+
+        weights = self.list_mix[month].sigma_node
+
+        # number of mixes actively routing packets in the mixnet
+        mix_active = self.config.mixnet_layers * self.mixnet_width[month]
+        mix_reserve = self.k[month] - mix_active
+
+        active_epochs = np.zeros(self.num_mixes[month], dtype=np.int64)  # per mix node: nr of epochs active
+        reserve_epochs = np.zeros(self.num_mixes[month], dtype=np.int64)  # per mix node: nr of epochs in reserve
+
+        # nodes without stake get an infinite key and are never picked
+        inv_weights = np.full(len(weights), np.inf)
+        np.divide(1.0, weights, out=inv_weights, where=weights > 0)
+
+        generator = self.get_generator('sampling', month)
+        iterations = 30 * 24  # epochs in a month
+        epochs_per_batch = max(1, min(iterations, self.config.sampling_max_batch_elements // max(1, len(weights))))
+        for first_epoch in range(0, iterations, epochs_per_batch):
+            nr_epochs = min(epochs_per_batch, iterations - first_epoch)
+            keys = generator.standard_exponential((nr_epochs, len(weights))) * inv_weights
+            active, reserve = self.select_smallest_keys(keys, mix_active, mix_reserve)
+            active_epochs += np.bincount(active.ravel(), minlength=len(weights))
+            reserve_epochs += np.bincount(reserve.ravel(), minlength=len(weights))
+
+        activity_vector = (active_epochs / iterations).tolist()  # % of epochs each node has been active
+        reserve_vector = (reserve_epochs / iterations).tolist()  # % of epochs each node has been reserve
+
+        return activity_vector, reserve_vector
+
+    # same sampling as sample_work_share_mixes_batched, with the epochs spread over config.sampling_num_workers
+    # processes. Each epoch draws its keys from its own random substream, spawned with a NumPy SeedSequence from
+    # (self.sampling_entropy, month, epoch), so for a given seed the result does not depend on the number of workers
+    # The processes are started once per run (see get_sampling_pool) and each gets one contiguous chunk of epochs, so
+    # the weights of the month are sent once to each process
+    def sample_work_share_mixes_parallel(self, month):
+
+        weights = self.list_mix[month].sigma_node
+
+        # number of mixes actively routing packets in the mixnet
+        mix_active = self.config.mixnet_layers * self.mixnet_width[month]
+        mix_reserve = self.k[month] - mix_active
+
+        # nodes without stake get an infinite key and are never picked
+        inv_weights = np.full(len(weights), np.inf)
+        np.divide(1.0, weights, out=inv_weights, where=weights > 0)
+
+        # one random substream per epoch, independent of how epochs are later split among workers
+        iterations = 30 * 24  # epochs in a month
+        month_seed = np.random.SeedSequence(self.sampling_entropy, spawn_key=(month,))
+        epoch_seeds = month_seed.spawn(iterations)
+        max_rows = max(1, self.config.sampling_max_batch_elements // max(1, len(weights)))
+
+        num_workers = max(1, self.config.sampling_num_workers)
+        if num_workers == 1:
+            active_epochs, reserve_epochs = self.count_epochs_substreams(inv_weights, mix_active, mix_reserve,
+                                                                         epoch_seeds, max_rows)
+        else:
+            # one contiguous chunk of epochs per worker (all the epochs cost the same)
+            nr_chunks = min(iterations, num_workers)
+            bounds = np.linspace(0, iterations, nr_chunks + 1, dtype=int)
+            active_epochs = np.zeros(len(weights), dtype=np.int64)
+            reserve_epochs = np.zeros(len(weights), dtype=np.int64)
+            executor = self.get_sampling_pool()
+            futures = [executor.submit(Network.count_epochs_substreams, inv_weights, mix_active, mix_reserve,
+                                       epoch_seeds[bounds[i]:bounds[i + 1]], max_rows) for i in range(nr_chunks)]
+            for future in futures:
+                chunk_active, chunk_reserve = future.result()
+                active_epochs += chunk_active
+                reserve_epochs += chunk_reserve
+
+        activity_vector = (active_epochs / iterations).tolist()  # % of epochs each node has been active
+        reserve_vector = (reserve_epochs / iterations).tolist()  # % of epochs each node has been reserve
+
+        return activity_vector, reserve_vector
+
+    # returns the process pool of sample_work_share_mixes_parallel, started at its first use and kept for the next
+    # months, so that the processes are started once per run instead of once per month (see close_sampling_pool)
+    def get_sampling_pool(self):
+
+        if self.sampling_pool is None:
+            self.sampling_pool = ProcessPoolExecutor(max_workers=self.config.sampling_num_workers)
+        return self.sampling_pool
+
+    # shuts down the processes of the sampling, if started (called by Econ_Results at the end of each run)
+    def close_sampling_pool(self):
+
+        if self.sampling_pool is not None:
+            self.sampling_pool.shutdown()
+            self.sampling_pool = None
+
+    # worker function for sample_work_share_mixes_parallel: samples one epoch per seed sequence in epoch_seeds and
+    # returns the number of epochs each node was active and in reserve (processing at most max_rows epochs at once)
+    @staticmethod
+    def count_epochs_substreams(inv_weights, mix_active, mix_reserve, epoch_seeds, max_rows):
+
+        active_epochs = np.zeros(len(inv_weights), dtype=np.int64)
+        reserve_epochs = np.zeros(len(inv_weights), dtype=np.int64)
+        for first in range(0, len(epoch_seeds), max_rows):
+            batch_seeds = epoch_seeds[first:first + max_rows]
+            keys = np.empty((len(batch_seeds), len(inv_weights)))
+            for row, seed in enumerate(batch_seeds):
+                keys[row] = np.random.default_rng(seed).standard_exponential(len(inv_weights))
+            keys *= inv_weights
+            active, reserve = Network.select_smallest_keys(keys, mix_active, mix_reserve)
+            active_epochs += np.bincount(active.ravel(), minlength=len(inv_weights))
+            reserve_epochs += np.bincount(reserve.ravel(), minlength=len(inv_weights))
+
+        return active_epochs, reserve_epochs
+
+    # given a matrix of keys (one row per epoch, one column per node) returns two matrices with the node indexes of
+    # each row holding the nr_first smallest keys, and the next nr_next smallest keys (order within each set is arbitrary)
+    @staticmethod
+    def select_smallest_keys(keys, nr_first, nr_next):
+
+        nr_rows, nr_nodes = keys.shape
+        nr_selected = min(nr_first + nr_next, nr_nodes)
+        nr_first = min(nr_first, nr_selected)
+
+        # node indexes of the nr_selected smallest keys per row
+        if nr_selected < nr_nodes:
+            selected = np.argpartition(keys, nr_selected - 1, axis=1)[:, :nr_selected]
+        else:
+            selected = np.broadcast_to(np.arange(nr_nodes), (nr_rows, nr_nodes))
+        if nr_first == 0 or nr_first == nr_selected:
+            return selected[:, :nr_first], selected[:, nr_first:]
+
+        # split the selected nodes of each row into the nr_first smallest keys and the rest
+        selected_keys = np.take_along_axis(keys, selected, axis=1)
+        order = np.argpartition(selected_keys, nr_first - 1, axis=1)
+        ordered = np.take_along_axis(selected, order, axis=1)
+        return ordered[:, :nr_first], ordered[:, nr_first:]
+
+    # computes (without sampling) the expected % of epochs each node is active and in reserve
+    # uses the approximation for the inclusion probabilities of successive weighted sampling without replacement:
+    # the probability that node i is among the first m picks is pi_i(m) = 1 - exp(-sigma_i * t), with t such that the
+    # probabilities add up to m. Active nodes are the first mix_active picks and reserve nodes the next mix_reserve
+    # the function returns two vectors indexed by node id, like sample_work_share_mixes
+    def compute_expected_work_share_mixes(self, month):
+
+        weights = self.list_mix[month].sigma_node
+
+        # number of mixes actively routing packets in the mixnet
+        mix_active = self.config.mixnet_layers * self.mixnet_width[month]
+        mix_reserve = self.k[month] - mix_active
+
+        prob_active = self.compute_inclusion_probabilities(weights, mix_active)
+        prob_selected = self.compute_inclusion_probabilities(weights, mix_active + mix_reserve)
+        activity_vector = prob_active.tolist()
+        reserve_vector = np.maximum(prob_selected - prob_active, 0).tolist()
 
         return activity_vector, reserve_vector
 
+    # returns the (approximated) probabilities that each element is among the first nr_picks elements drawn, one by
+    # one and without replacement, proportionally to weights. Solves sum(1 - exp(-w * t)) = nr_picks for t with
+    # Newton iterations (the left side is increasing and concave in t, so the iteration converges from below)
+    # if counts is given, weights[i] is the weight of counts[i] identical elements (groups of nodes in Macro_Model)
+    @staticmethod
+    def compute_inclusion_probabilities(weights, nr_picks, tolerance=10**-12, max_iterations=100, counts=None):
+
+        if counts is None:
+            counts = np.ones(len(weights))
+        positive = weights > 0
+        if nr_picks <= 0:
+            return np.zeros(len(weights))
+        if nr_picks >= np.sum(counts[positive]):  # all the nodes with stake are always picked
+            return positive.astype(float)
+
+        t = 0.0
+        for iteration in range(max_iterations):
+            exp_terms = np.exp(-weights * t)
+            excess = np.sum(counts * (1 - exp_terms)) - nr_picks  # negative until t reaches the solution
+            if abs(excess) <= tolerance * nr_picks:
+                break
+            t -= excess / np.sum(counts * weights * exp_terms)
+
+        return 1 - np.exp(-weights * t)
+
+    # compares the expected work shares with the result of nr_samples runs of the configured sampling algorithm
+    # returns a dictionary with the error of the expected values of activity_percent and reserve_percent with respect
+    # to the average sampled values, and the standard deviation of a single sampled value (reference noise level)
+    def get_expected_work_share_error(self, month, nr_samples=1):
+
+        expected_active, expected_reserve = self.compute_expected_work_share_mixes(month)
+        sampled_active = np.zeros(self.num_mixes[month])
+        sampled_reserve = np.zeros(self.num_mixes[month])
+        for sample in range(nr_samples):
+            activity_vector, reserve_vector = self.sample_work_share_mixes(month)
+            sampled_active += np.divide(activity_vector, nr_samples)
+            sampled_reserve += np.divide(reserve_vector, nr_samples)
+
+        error_active = np.subtract(expected_active, sampled_active)
+        error_reserve = np.subtract(expected_reserve, sampled_reserve)
+        iterations = 30 * 24  # epochs in a month
+        report = {
+            'max_abs_error_active': np.max(np.abs(error_active)),
+            'mean_abs_error_active': np.mean(np.abs(error_active)),
+            'bias_active': np.mean(error_active),
+            'max_abs_error_reserve': np.max(np.abs(error_reserve)),
+            'mean_abs_error_reserve': np.mean(np.abs(error_reserve)),
+            'bias_reserve': np.mean(error_reserve),
+            'sampling_std_active': np.mean(np.sqrt(np.multiply(expected_active, np.subtract(1, expected_active)) /
+                                                   (iterations * nr_samples))),
+        }
+        self.close_sampling_pool()
+        return report
@@ -0,0 +1,76 @@
+import weakref
+import numpy as np
+from Node_Table_econ import Node_Table
+
+
+# class contains the registry of node metrics (parameters) that can be obtained for the nodes of a Node_Table, such as
+# 'pledge', 'saturation_percent' or 'ROS_delegator'. Each metric is computed for all the nodes of a table at once (one
+# array per table and metric, with NaN for the nodes where the metric is not defined, eg 'ROS_delegator' of nodes
+# without delegates). Derived metrics are memoised per table until the table changes (see Node_Table.mark_changed)
+# Additional metrics can be added with register(), eg: metrics.register('ROS_total', lambda metrics, mixes:
+# (mixes.operator_profit + mixes.delegate_profit) / metrics.get_values(mixes, 'total_stake'))
+class Node_Metrics:
+    def __init__(self):
+
+        self.functions = {}  # name of the metric -> function(metrics, mixes) returning the array of values
+        self.cache = weakref.WeakKeyDictionary()  # table -> (table version, dictionary name -> cached array)
+
+        # metrics read directly from the columns of the table (not cached, the column is returned)
+        self.column_metrics = {column: column for column in Node_Table.columns if column != 'delegate_profit'}
+        self.column_metrics['lambda'] = 'lambda_node'
+        self.column_metrics['sigma'] = 'sigma_node'
+
+        self.register('sat_level', lambda metrics, mixes: np.asarray(mixes.get_sat_levels()))
+        self.register('total_stake', lambda metrics, mixes: mixes.delegated + mixes.pledge)
+        self.register('delegate_profit',
+                      lambda metrics, mixes: np.where(mixes.delegated > 0, mixes.delegate_profit, np.nan))
+        self.register('saturation_percent',
+                      lambda metrics, mixes: metrics.get_values(mixes, 'total_stake') / mixes.stake_saturation)
+        self.register('pledge_saturation_percent', lambda metrics, mixes: mixes.pledge / mixes.stake_saturation)
+        # ROS of the operator takes operational costs into account
+        self.register('ROS_operator', lambda metrics, mixes: mixes.operator_profit / (mixes.pledge + mixes.node_cost))
+        self.register('ROS_delegator', lambda metrics, mixes: np.where(
+            mixes.delegated > 0, mixes.delegate_profit / np.where(mixes.delegated > 0, mixes.delegated, 1), np.nan))
+        self.register('APY_delegator', lambda metrics, mixes: 12 * metrics.get_values(mixes, 'ROS_delegator'))
+
+    # adds (or replaces) a metric computed by function(metrics, mixes), which must return one value per node of mixes
+    def register(self, name, function):
+
+        if name in self.column_metrics:
+            print("ISSUE: metric", name, "is a column of Node_Table and cannot be redefined")
+            exit("error: bad metric name")
+        self.functions[name] = function
+        self.cache.clear()  # metrics computed with the previous definition may depend on it
+
+    # returns the names of all the metrics available
+    def get_names(self):
+        return list(self.column_metrics) + list(self.functions)
+
+    # returns a vector with the values of metric par for all the nodes of the table mixes (NaN where not defined)
+    # derived metrics are read-only arrays shared by all callers until the table changes
+    def get_values(self, mixes, par):
+
+        if par in self.column_metrics:
+            return getattr(mixes, self.column_metrics[par])
+        if par not in self.functions:
+            print("ISSUE: bad parameter type passed to get_values in Node_Metrics:", par)
+            exit("ERROR: bad parameter type !")
+
+        version, values = self.cache.get(mixes, (None, None))
+        if version != mixes.version:  # first request for this table, or the table changed since the last one
+            values = {}
+            self.cache[mixes] = (mixes.version, values)
+        if par not in values:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result = np.asarray(self.functions[par](self, mixes))
+            result.flags.writeable = False
+            values[par] = result
+        return values[par]
+
+    # returns the value of metric par for one node (Node_View), with None instead of NaN where it is not defined
+    def get_value(self, node, par):
+
+        value = self.get_values(node.table, par)[node.index].item()
+        if isinstance(value, float) and np.isnan(value):
+            return None
+        return value
@@ -0,0 +1,110 @@
+import numpy as np
+from Node_Table_econ import Node_Table
+from Fenwick_Tree_econ import Fenwick_Tree
+
+
+# class keeps the mix nodes that are registered in the network across intervals (months), so that each node keeps its
+# identity (node_id), pledge and delegations from one month to the next. Nodes are stored in the slots of a Node_Table:
+# nodes that unbond free their slot, and nodes that register take a free slot (the table grows only if none is free).
+# The registry also keeps a Fenwick tree with the sampling weight (stake capped at saturation) of each slot, which is
+# updated only for the slots whose stake changed. Network uses it to create the Node_Table of each month.
+class Node_Registry:
+    def __init__(self, table):
+
+        self.table = table.copy()  # slots with the variables of the registered nodes
+        self.alive = np.ones(len(table), dtype=bool)  # slots currently holding a registered node
+        self.next_node_id = int(np.max(table.node_id)) + 1 if len(table) > 0 else 0  # id of the next new node
+        self.sampling_weights = np.zeros(len(table))  # sampling weight of each slot as currently set in the tree
+        self.sampling_tree = Fenwick_Tree(self.sampling_weights)  # tree over sampling_weights (zero for free slots)
+
+    # returns the slots currently holding a registered node, in increasing order
+    def get_alive_slots(self):
+        return np.flatnonzero(self.alive)
+
+    # a fraction rate of the registered nodes unbond (each node leaves with probability rate), and additional random
+    # nodes leave if more than max_nodes would remain. The delegations of leaving nodes are freed.
+    # Returns the number of nodes that left (generator: NumPy Generator or the global np.random)
+    def unbond(self, rate, max_nodes, generator=np.random):
+
+        alive_slots = self.get_alive_slots()
+        nr_leaving = max(generator.binomial(len(alive_slots), rate), len(alive_slots) - max_nodes)
+        leaving = generator.choice(alive_slots, size=nr_leaving, replace=False)
+        self.alive[leaving] = False
+        for column in ['pledge', 'delegated']:
+            getattr(self.table, column)[leaving] = 0
+        return nr_leaving
+
+    # the delegators of a fraction rate of the registered nodes (each node with probability rate) withdraw their
+    # delegated stake, to be re-delegated. Returns the total amount of stake withdrawn
+    def withdraw_delegations(self, rate, generator=np.random):
+
+        withdrawing = self.alive & (generator.random(len(self.alive)) < rate)
+        withdrawn = np.sum(self.table.delegated[withdrawing])
+        self.table.delegated[withdrawing] = 0
+        return withdrawn
+
+    # reduces the delegated stake of nodes over the saturation point (if it decreased). Returns the amount freed
+    def cap_delegations(self, stake_saturation):
+
+        excess = np.minimum(np.maximum(self.table.pledge + self.table.delegated - stake_saturation, 0),
+                            self.table.delegated)
+        self.table.delegated -= excess
+        return np.sum(excess)
+
+    # registers new nodes with the given sat_level codes and pledges, in free slots first
+    def register(self, sat_codes, pledges, profit_margin, performance):
+
+        nr_new = len(pledges)
+        free_slots = np.flatnonzero(~self.alive)
+        if len(free_slots) < nr_new:  # grow the table (and the tree) with enough free slots
+            nr_extra = nr_new - len(free_slots)
+            extra = Node_Table(np.zeros(nr_extra), np.zeros(nr_extra), profit_margin, performance, 0,
+                               self.table.stake_saturation)
+            self.table.sat_code = np.concatenate([self.table.sat_code, extra.sat_code])
+            for column in Node_Table.columns:
+                setattr(self.table, column, np.concatenate([getattr(self.table, column), getattr(extra, column)]))
+            self.alive = np.concatenate([self.alive, np.zeros(nr_extra, dtype=bool)])
+            self.sampling_weights = np.concatenate([self.sampling_weights, np.zeros(nr_extra)])
+            self.sampling_tree = Fenwick_Tree(self.sampling_weights)
+            free_slots = np.flatnonzero(~self.alive)
+
+        slots = free_slots[:nr_new]
+        self.alive[slots] = True
+        self.table.node_id[slots] = np.arange(self.next_node_id, self.next_node_id + nr_new)
+        self.next_node_id += nr_new
+        self.table.sat_code[slots] = sat_codes
+        self.table.pledge[slots] = pledges
+        self.table.delegated[slots] = 0
+        self.table.profit_margin[slots] = profit_margin
+        self.table.performance[slots] = performance
+
+    # returns a Node_Table with the registered nodes (in slot order), with the variables of the month reset
+    def snapshot(self, node_cost, stake_saturation):
+
+        mixes = self.table.subset(self.get_alive_slots())
+        mixes.serial = np.arange(len(mixes))
+        mixes.stake_saturation = stake_saturation
+        mixes.node_cost[:] = node_cost
+        for column in ['lambda_node', 'sigma_node', 'activity_percent', 'reserve_percent', 'received_rewards',
+                       'operator_profit', 'delegate_profit']:
+            getattr(mixes, column)[:] = 0
+        return mixes
+
+    # copies the delegated stake of a snapshot (after delegations have been allocated) back to the registry
+    def update_delegations(self, mixes):
+
+        self.table.delegated[self.get_alive_slots()] = mixes.delegated
+
+    # updates the tree of sampling weights (stake capped at saturation, zero for free slots), only for changed slots
+    # Returns the number of slots that were updated
+    def update_sampling_tree(self, stake_saturation):
+
+        weights = np.where(self.alive, np.minimum(self.table.pledge + self.table.delegated, stake_saturation), 0.0)
+        changed = np.flatnonzero(weights != self.sampling_weights)
+        if 2 * len(changed) > len(weights):  # most weights changed: an O(n) rebuild is cheaper (and has no rounding drift)
+            self.sampling_tree = Fenwick_Tree(weights)
+        else:
+            for slot in changed:
+                self.sampling_tree.set_weight(int(slot), float(weights[slot]))
+        self.sampling_weights = weights
+        return len(changed)
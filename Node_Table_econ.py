@@ -0,0 +1,135 @@
+import itertools
+import numpy as np
+
+# sat_level of the nodes ('SAT', 'RND', 'MIN') is stored in the table as a small integer code: its index in this list
+SAT_LEVELS = ['SAT', 'RND', 'MIN']
+
+
+# class contains the variables of all the mix nodes that live during one interval, stored as one NumPy array (column)
+# per variable instead of one object per mix node ("struct of arrays"). Column names are the node variable names, so
+# per-node loops can be written as vector operations on the columns (eg: table.pledge + table.delegated)
+# Iterating the table (or indexing it) returns Node_View objects, one per mix node, for per-node code
+class Node_Table:
+
+    # numeric per-node columns of the table (in addition to sat_code and the interval-wide stake_saturation)
+    columns = ['serial', 'node_id', 'pledge', 'profit_margin', 'performance', 'node_cost', 'delegated', 'lambda_node',
+               'sigma_node', 'activity_percent', 'reserve_percent', 'received_rewards', 'operator_profit',
+               'delegate_profit']
+
+    version_counter = itertools.count()  # source of the version numbers of all tables
+
+    def __init__(self, sat_codes, pledges, profit_margin, performance, node_cost, stake_saturation, node_ids=None):
+
+        nr_nodes = len(pledges)
+        self.stake_saturation = stake_saturation  # saturation point per node (global value per interval)
+        self.serial = np.arange(nr_nodes)  # serial nr of the node (position in the table)
+        # identifier of the node across intervals (by default equal to the serial)
+        self.node_id = np.arange(nr_nodes) if node_ids is None else np.asarray(node_ids, dtype=np.int64)
+        self.sat_code = np.asarray(sat_codes, dtype=np.int8)  # index in SAT_LEVELS of the node's sat_level
+        self.pledge = np.asarray(pledges, dtype=float)  # amount token pledged by the node operator
+        self.profit_margin = np.full(nr_nodes, profit_margin, dtype=float)  # profit margin set by the node operator
+        self.performance = np.full(nr_nodes, performance, dtype=float)  # measured performance of the node
+        self.node_cost = np.full(nr_nodes, node_cost, dtype=float)  # monthly operational cost of the node
+        self.delegated = np.zeros(nr_nodes)  # amount of delegated stake. Updated after the table is created.
+        self.lambda_node = np.zeros(nr_nodes)  # ratio of pledge to total stake
+        self.sigma_node = np.zeros(nr_nodes)  # ratio of pledge plus delegated stake to total stake
+        self.activity_percent = np.zeros(nr_nodes)  # fraction of epochs in the interval where the node is active
+        self.reserve_percent = np.zeros(nr_nodes)  # fraction of epochs in the interval where the node is in reserve
+        self.received_rewards = np.zeros(nr_nodes)  # rewards received by the node (to be split among participants)
+        self.operator_profit = np.zeros(nr_nodes)  # profit given to the operator (who is also refunded node costs)
+        self.delegate_profit = np.zeros(nr_nodes)  # aggregate profits given to the delegates of the node
+        # changes each time the values change, so that metrics computed from them are refreshed. Versions are unique
+        # across all tables, so a version identifies the values of one table at one point in time
+        self.version = next(Node_Table.version_counter)
+
+    def __len__(self):
+        return len(self.pledge)
+
+    def __iter__(self):
+        for index in range(len(self.pledge)):
+            yield Node_View(self, index)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.pledge)
+        if not 0 <= index < len(self.pledge):
+            raise IndexError("node index out of range")
+        return Node_View(self, index)
+
+    # returns a vector with the sat_level strings of all nodes
+    def get_sat_levels(self):
+        return [SAT_LEVELS[code] for code in self.sat_code]
+
+    # must be called after writing into the columns of the table (writes through Node_View objects call it already)
+    def mark_changed(self):
+        self.version = next(Node_Table.version_counter)
+
+    # returns a new table with the rows in indexes (copied, so that the result does not share memory with this table)
+    def subset(self, indexes):
+
+        new_table = Node_Table.__new__(Node_Table)
+        new_table.stake_saturation = self.stake_saturation
+        new_table.version = next(Node_Table.version_counter)
+        new_table.sat_code = self.sat_code[indexes]
+        for column in Node_Table.columns:
+            setattr(new_table, column, getattr(self, column)[indexes])
+        return new_table
+
+    # returns a full copy of the table
+    def copy(self):
+        return self.subset(np.arange(len(self.pledge)))
+
+    # returns the number of bytes used by the columns of the table
+    def nbytes(self):
+        return self.sat_code.nbytes + sum(getattr(self, column).nbytes for column in Node_Table.columns)
+
+
+# returns a property that reads and writes the element of a column of the table for the node of the view
+def column_property(column):
+
+    def get_value(view):
+        return getattr(view.table, column)[view.index].item()
+
+    def set_value(view, value):
+        getattr(view.table, column)[view.index] = value
+        view.table.mark_changed()
+
+    return property(get_value, set_value)
+
+
+# class gives access to one mix node (row) of a Node_Table through its attributes (mix.pledge, mix.sat_level...)
+# reading an attribute reads the table column, and setting an attribute writes the value back into the table
+class Node_View:
+    __slots__ = ['table', 'index']
+
+    def __init__(self, table, index):
+        self.table = table  # table containing the node
+        self.index = index  # position of the node in the table
+
+    serial = column_property('serial')
+    node_id = column_property('node_id')
+    pledge = column_property('pledge')
+    profit_margin = column_property('profit_margin')
+    performance = column_property('performance')
+    node_cost = column_property('node_cost')
+    delegated = column_property('delegated')
+    lambda_node = column_property('lambda_node')
+    sigma_node = column_property('sigma_node')
+    activity_percent = column_property('activity_percent')
+    reserve_percent = column_property('reserve_percent')
+    received_rewards = column_property('received_rewards')
+    operator_profit = column_property('operator_profit')
+    delegate_profit = column_property('delegate_profit')
+
+    @property
+    def sat_level(self):
+        return SAT_LEVELS[self.table.sat_code[self.index]]
+
+    @sat_level.setter
+    def sat_level(self, value):
+        self.table.sat_code[self.index] = SAT_LEVELS.index(value)
+        self.table.mark_changed()
+
+    @property
+    def stake_saturation(self):
+        return self.table.stake_saturation
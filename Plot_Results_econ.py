@@ -77,13 +77,12 @@ class Plot_Results:
         sequence_containing_x_vals = []
         sequence_containing_y_vals = []
         for month in range(quarter*3, (quarter+1)*3):
-            for node in self.results.network.list_mix[month]:
-                val_y = self.results.get_node_value(node, par_y)
-                if par_y in ['received_rewards', 'operator_profit', 'ROS_delegator'] and val_y is not None:
-                    val_y = 12 * val_y  # annualize the profits / ROS
-                val_x = self.results.get_node_value(node, par_x)
-                sequence_containing_x_vals.append(val_x)
-                sequence_containing_y_vals.append(val_y)
+            val_y = self.results.get_month_values(month, par_y)
+            if par_y in ['received_rewards', 'operator_profit', 'ROS_delegator']:
+                val_y = 12 * val_y  # annualize the profits / ROS
+            val_x = self.results.get_month_values(month, par_x)
+            sequence_containing_x_vals.extend(val_x.tolist())  # NaN values are not drawn
+            sequence_containing_y_vals.extend(val_y.tolist())
 
         fig = plt.figure(figsize=(10, 8), dpi=90, facecolor='w', edgecolor='k')
         ax = fig.add_subplot()
@@ -102,10 +101,9 @@ class Plot_Results:
     # plots annualized ROS for operators / delegators of nodes of type_node owned by owner
     def plot_yearly_ROS_distributions(self, file_name, par):
 
-        if par == 'ROS_delegator_year':  # clean up the None
-            dict_par = self.results.get_dictionary_distribution('ROS_delegator')
-            for month in range(self.config.num_intervals):
-                dict_par[month] = [i for i in dict_par[month] if i is not None]
+        if par == 'ROS_delegator_year':  # without the NaN
+            dict_par = {month: self.results.get_month_values(month, 'ROS_delegator', finite=True)
+                        for month in range(self.config.num_intervals)}
         elif par == 'ROS_operator_year':
             dict_par = self.results.get_dictionary_distribution('ROS_operator')
         else:
@@ -145,16 +143,21 @@ class Plot_Results:
     # if file_name = '' (empty) the function plots on screen, if file_name provided, fig is saved to file_name
     # par is the parameter of interest that we want to display. Possible values are: 'pledge' 'delegated' 'total_stake'
     # 'node_cost' 'received_rewards' 'operator_profit' 'delegate_profit' 'sigma' 'lambda' 'ROS_operator' 'ROS_delegator'
+    # in streaming mode (config.type_node_storage 'NODES_STREAM_SUMMARIES') the boxplots are drawn from the stored
+    # monthly summaries, without outliers
     def plot_node_parameter_distributions(self, file_name, par):
 
-        dict_par = self.results.get_dictionary_distribution(par)
-        if par == 'ROS_delegator' or par == 'delegate_profit' or par == 'APY_delegator':  # clean up the None
-            for month in range(self.config.num_intervals):
-                dict_par[month] = [i for i in dict_par[month] if i is not None]
-
         fig = plt.figure(figsize=(10, 8), dpi=90, facecolor='w', edgecolor='k')
         ax = fig.add_subplot()
-        ax.boxplot([dict_par[i] for i in range(len(dict_par))], showfliers=True)
+        if self.config.type_node_storage == 'NODES_STREAM_SUMMARIES':
+            stats = [self.results.node_summaries[month][par] for month in range(self.config.num_intervals)]
+            positions = [month + 1 for month in range(self.config.num_intervals) if stats[month] is not None]
+            ax.bxp([summary for summary in stats if summary is not None], positions=positions, showfliers=False)
+            ax.set_xlim(0.5, self.config.num_intervals + 0.5)
+        else:
+            dict_par = {month: self.results.get_month_values(month, par, finite=True)  # without the NaN
+                        for month in range(self.config.num_intervals)}
+            ax.boxplot([dict_par[i] for i in range(len(dict_par))], showfliers=True)
         ax.axhline(y=0, color='r', linewidth=1, linestyle='-')
 
         years = int(round(self.config.num_intervals / 12))
@@ -351,6 +354,57 @@ class Plot_Results:
             plt.savefig(file_name)
         plt.close()
 
+    # plots a global series (eg 'mixmining_pool' or 'rewards_unclaimed') for each leaf of a Scenario_Tree, with a
+    # vertical line at each month where the tree forks
+    def plot_scenario_tree_series(self, file_name, tree, series):
+
+        fig = plt.figure(figsize=(10, 8), dpi=90, facecolor='w', edgecolor='k')
+        ax = fig.add_subplot()
+        for name, results in tree.get_leaves().items():
+            ax.plot(getattr(results, series), '-', linewidth=1, label=name)
+        for month in tree.get_fork_months():
+            ax.axvline(x=month, color='grey', linewidth=1, linestyle=':')
+        ax.set_ylabel(series, fontsize=14)
+        ax.set_xlabel('interval (months)', fontsize=14)
+        plt.setp(ax.get_xticklabels(), fontsize=14)
+        plt.setp(ax.get_yticklabels(), fontsize=14)
+        ax.legend()
+        ax.grid(True)
+        if len(file_name) < 2:
+            plt.show()
+        else:
+            plt.savefig(file_name)
+        plt.close()
+
+    # plots the mean over the replications (Replications) of a series (eg 'median_ROS' or 'rewards_unclaimed'), with the
+    # confidence band of the mean at the given level and the band between the lowest and highest estimated quantiles
+    def plot_replication_bands(self, file_name, replications, series, level=0.95):
+
+        months = np.arange(replications.config.num_intervals)
+        lower, upper = replications.get_confidence_band(series, level)
+        quantiles = replications.get_quantiles(series)
+        q_low, q_high = min(quantiles), max(quantiles)
+
+        fig = plt.figure(figsize=(10, 8), dpi=90, facecolor='w', edgecolor='k')
+        ax = fig.add_subplot()
+        ax.fill_between(months, quantiles[q_low], quantiles[q_high], color='tab:blue', alpha=0.15,
+                        label='quantiles ' + str(q_low) + ' - ' + str(q_high))
+        ax.fill_between(months, lower, upper, color='tab:blue', alpha=0.4,
+                        label=str(int(level * 100)) + '% confidence interval of the mean')
+        ax.plot(months, replications.get_mean(series), '-', color='tab:blue', linewidth=2,
+                label='mean of ' + str(replications.nr_replications) + ' replications')
+        ax.set_ylabel(series, fontsize=14)
+        ax.set_xlabel('interval (months)', fontsize=14)
+        plt.setp(ax.get_xticklabels(), fontsize=14)
+        plt.setp(ax.get_yticklabels(), fontsize=14)
+        ax.legend()
+        ax.grid(True)
+        if len(file_name) < 2:
+            plt.show()
+        else:
+            plt.savefig(file_name)
+        plt.close()
+
     # produces two figures corresponding to the specified month
     # the first figure shows the distribution of reputation (decreasing order) and its corresponding pledge per node
     # the second figure shows the distribution of pledges (in decreasing size) for the node set
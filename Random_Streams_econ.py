@@ -0,0 +1,31 @@
+import numpy as np
+
+
+# class gives each stochastic stage of Network its own NumPy Generator per month (common random numbers, see
+# config.type_random_numbers 'RANDOM_COMMON_STREAMS'). The stream of a stage in a month is spawned with a SeedSequence
+# from (random_seed, stage, month), so it does not depend on how many values the other stages or the previous months
+# drew: two configurations run with the same random_seed use the same random variates in each stage and month, and
+# their differences come from the parameters rather than from sampling noise. With random_seed None the streams come
+# from fresh entropy (stored in self.entropy)
+# Stages: 'pledges' (pareto pledges), 'delegation' (allocation of the delegated stake), 'sampling' (active and reserve
+# nodes of the epochs) and 'churn' (unbonding, re-delegation and pledges of new nodes with 'NETWORK_PERSISTENT_CHURN')
+class Random_Streams:
+
+    stream_names = ['pledges', 'delegation', 'sampling', 'churn']
+
+    def __init__(self, random_seed):
+
+        self.entropy = np.random.SeedSequence(random_seed).entropy  # root of all the streams
+        self.generators = {}  # per stage: (month, Generator of the stage in the month)
+
+    # returns the Generator of the stage in the month (the values drawn continue the stream within the month, and the
+    # stream of the next month starts from its own seed)
+    def get(self, name, month):
+
+        if name not in Random_Streams.stream_names:
+            print("ISSUE: unknown random stream:", name)
+            exit("error: bad random stream")
+        if name not in self.generators or self.generators[name][0] != month:
+            seed = np.random.SeedSequence(self.entropy, spawn_key=(Random_Streams.stream_names.index(name), month))
+            self.generators[name] = (month, np.random.default_rng(seed))
+        return self.generators[name][1]
@@ -0,0 +1,123 @@
+import contextlib
+import copy
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from Econ_Results_econ import Econ_Results
+from Streaming_Stats_econ import Running_Moments, P2_Quantile
+
+
+# class runs nr_replications runs (Econ_Results) of the same Config with different random seeds, and aggregates their
+# per-month series, since a single run is only one realisation of the random pledges, delegations and epoch samples
+# The seeds are spawned with a NumPy SeedSequence from config.random_seed (with random_seed None, from fresh entropy,
+# stored in self.entropy to reproduce the replications). Runs are spread over num_workers processes, with a bounded
+# number of runs in flight, and the series of each run are merged as it finishes (in the order of the seeds) into
+# running means and variances (Running_Moments) and quantile estimators (P2_Quantile), so the replications are never
+# kept in memory together
+# Aggregated series: the median ROS of high reputation nodes (not available in macro mode) and the token supply series
+class Replications:
+
+    series = ['median_ROS', 'mixmining_pool', 'circulating_tokens', 'unvested_tokens', 'stake_saturation_mix',
+              'rewards_distributed_mix', 'rewards_unclaimed']
+
+    def __init__(self, config, nr_replications, num_workers=1, quantiles=(0.05, 0.5, 0.95)):
+
+        self.config = config  # configuration of all the replications (except random_seed)
+        self.nr_replications = nr_replications  # nr of runs
+        self.quantiles = list(quantiles)  # quantiles estimated for each series and month
+        seed_sequence = np.random.SeedSequence(config.random_seed)
+        self.entropy = seed_sequence.entropy  # root of the seeds of the replications
+        self.seeds = [int(child.generate_state(1)[0]) for child in seed_sequence.spawn(nr_replications)]
+
+        self.moments = {}  # per series: running mean and variance of each month
+        self.quantile_estimators = {}  # per series and month: one P2_Quantile per quantile
+        for name in Replications.series:
+            self.moments[name] = Running_Moments(config.num_intervals)
+            self.quantile_estimators[name] = [[P2_Quantile(q) for q in self.quantiles]
+                                              for month in range(config.num_intervals)]
+
+        if num_workers <= 1:
+            for index, seed in enumerate(self.seeds):
+                self.add_replication(index, self.run_replication(config, seed))
+        else:
+            # at most 2 * num_workers runs are submitted and not merged yet, so only these are kept in memory. Runs are
+            # merged in the order of the seeds (the quantile estimates depend on the order), as soon as all the
+            # previous runs are merged, so the results do not depend on the number of workers
+            window = 2 * num_workers
+            pending = {}  # submitted future -> index of its replication
+            finished = {}  # index -> series of the replications finished before a previous one
+            next_submitted, next_merged = 0, 0
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                while next_merged < nr_replications:
+                    while next_submitted < nr_replications and next_submitted - next_merged < window:
+                        future = executor.submit(Replications.run_replication, config, self.seeds[next_submitted])
+                        pending[future] = next_submitted
+                        next_submitted += 1
+                    future = next(as_completed(pending))
+                    finished[pending.pop(future)] = future.result()
+                    while next_merged in finished:
+                        self.add_replication(next_merged, finished.pop(next_merged))
+                        next_merged += 1
+
+    # worker function: runs config with the given seed (without printing the progress, and without checkpoints) and
+    # returns a dictionary with a vector of values per month for each aggregated series (NaN where not defined)
+    @staticmethod
+    def run_replication(config, seed):
+
+        config = copy.copy(config)
+        config.random_seed = seed
+        config.checkpoint_interval = 0
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            results = Econ_Results(config)
+
+        values = {}
+        if config.type_model == 'MODEL_FULL':
+            values['median_ROS'] = Replications.get_median_ROS_values(results)
+        else:
+            values['median_ROS'] = np.full(config.num_intervals, np.nan)
+        for name in Replications.series[1:]:
+            values[name] = np.array(getattr(results, name), dtype=float)
+        return values
+
+    # returns the median ROS of high reputation nodes per month, with NaN in the months without such nodes (over all the
+    # nodes of the month, also in streaming mode where the run keeps the value of each month)
+    @staticmethod
+    def get_median_ROS_values(results):
+        return np.array([results.get_month_median_ROS(month) for month in range(results.config.num_intervals)],
+                        dtype=float)
+
+    # merges the series of one replication into the running statistics
+    def add_replication(self, index, values):
+
+        print("replication", index + 1, "/", self.nr_replications, "- seed", self.seeds[index])
+        for name in Replications.series:
+            self.moments[name].update(values[name])
+            for month, value in enumerate(values[name]):
+                for estimator in self.quantile_estimators[name][month]:
+                    estimator.update(value)
+
+    # returns the mean of the series over the replications, per month
+    def get_mean(self, name):
+        return self.moments[name].get_mean()
+
+    # returns the standard deviation of the series over the replications, per month
+    def get_std(self, name):
+        return np.sqrt(self.moments[name].get_variance())
+
+    # returns the lower and upper bounds per month of the confidence interval of the mean of the series, at the given
+    # confidence level (normal approximation: mean +- z * standard error)
+    def get_confidence_band(self, name, level=0.95):
+
+        z = statistics.NormalDist().inv_cdf(0.5 + level / 2)
+        mean = self.get_mean(name)
+        error = z * self.moments[name].get_standard_error()
+        return mean - error, mean + error
+
+    # returns a dictionary with the estimated value per month of each quantile of the series (quantile -> vector)
+    def get_quantiles(self, name):
+
+        quantiles = {}
+        for index, q in enumerate(self.quantiles):
+            quantiles[q] = np.array([estimators[index].get_value() for estimators in self.quantile_estimators[name]])
+        return quantiles
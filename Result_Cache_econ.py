@@ -0,0 +1,118 @@
+import glob
+import hashlib
+import os
+import pickle
+from Econ_Results_econ import Econ_Results
+from Stage_Graph_econ import Stage_Graph
+
+
+# class keeps the results of complete runs on disk, so that a configuration that was already simulated (by anyone
+# sharing the cache directory) is loaded instead of computed again. Each run is stored as a checkpoint file (see
+# Econ_Results.save_checkpoint) named by its key: the sha256 of all the Config values (including random_seed) and of
+# the source code of the simulation (*_econ.py files), so that results computed with another version of the code are
+# never reused. Only runs with a random_seed are cached (without a seed each run is a different realisation)
+# The cache is bounded to max_bytes: the least recently used files (by modification time, updated when a file is
+# loaded) are removed when a new run is stored
+class Result_Cache:
+
+    # Config fields that do not change the results of a run, and are not part of the key (see Stage_Graph)
+    ignored_fields = Stage_Graph.neutral_fields
+
+    code_version = None  # sha256 of the source code of the simulation, computed once
+
+    def __init__(self, cache_dir, max_bytes):
+
+        self.cache_dir = cache_dir  # directory with one file per cached run
+        self.max_bytes = max_bytes  # maximum total size of the files of the cache (0 disables the cache)
+        self.hits = 0  # nr of runs loaded from the cache
+        self.misses = 0  # nr of runs computed (and stored in the cache)
+
+    # returns the results of a run with config: loaded from the cache if they are in it, and otherwise computed (and
+    # stored in the cache if config has a random_seed)
+    def get_results(self, config):
+
+        if config.random_seed is None or self.max_bytes <= 0:
+            return Econ_Results(config)
+        key = self.get_key(config)
+        results = self.load(key)
+        if results is None:
+            self.misses += 1
+            results = Econ_Results(config)
+            self.store(key, results)
+        else:
+            self.hits += 1
+        return results
+
+    # returns the key of the results of a run with config (hexadecimal sha256)
+    @staticmethod
+    def get_key(config):
+
+        fields = sorted(field for field in vars(config) if field not in Result_Cache.ignored_fields)
+        description = repr([(field, getattr(config, field)) for field in fields]) + Result_Cache.get_code_version()
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    # returns the sha256 of the source files of the simulation (the *_econ.py files next to this one)
+    @staticmethod
+    def get_code_version():
+
+        if Result_Cache.code_version is None:
+            code = hashlib.sha256()
+            for file_name in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*_econ.py'))):
+                with open(file_name, 'rb') as f:
+                    code.update(os.path.basename(file_name).encode())
+                    code.update(f.read())
+            Result_Cache.code_version = code.hexdigest()
+        return Result_Cache.code_version
+
+    # returns the path of the file of a key
+    def get_file_name(self, key):
+        return os.path.join(self.cache_dir, key + '.pkl')
+
+    # returns the run stored with key, or None if it is not in the cache (or its file can not be read)
+    def load(self, key):
+
+        file_name = self.get_file_name(key)
+        try:
+            results = Econ_Results.load_checkpoint(file_name)
+            os.utime(file_name)  # most recently used
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return results
+
+    # stores a complete run with key, and removes the least recently used files if the cache is too big. The file is
+    # written under a temporary name and then renamed, so that other processes never read a partial file
+    def store(self, key, results):
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        file_name = self.get_file_name(key)
+        temporary_file_name = file_name + '.' + str(os.getpid()) + '.tmp'
+        results.save_checkpoint(temporary_file_name)
+        os.replace(temporary_file_name, file_name)
+        self.evict(file_name)
+
+    # removes the least recently used files until the cache is not bigger than max_bytes (keep_file is removed last)
+    def evict(self, keep_file=None):
+
+        entries = []
+        for file_name in glob.glob(os.path.join(self.cache_dir, '*.pkl')):
+            try:
+                entries.append((file_name == keep_file, os.path.getmtime(file_name), os.path.getsize(file_name),
+                                file_name))
+            except OSError:  # removed by another process
+                pass
+        total_bytes = sum(entry[2] for entry in entries)
+        for _, _, size, file_name in sorted(entries):  # oldest first, keep_file last
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+            total_bytes -= size
+
+    # returns a dictionary with the counters of the cache and its size on disk
+    def get_stats(self):
+
+        files = glob.glob(os.path.join(self.cache_dir, '*.pkl'))
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(files),
+                'bytes': sum(os.path.getsize(file_name) for file_name in files)}
@@ -0,0 +1,77 @@
+import copy
+import random
+import numpy as np
+
+
+# class stores a tree of runs that share their first months: each node of the tree holds a run (Econ_Results) and
+# its children are branches forked from it at a given month, each one continuing with its own Config overrides
+# The months before the fork are computed once (in the parent) and shared by all the branches (see Econ_Results.fork)
+# Each node keeps the state of the global random generators at the month its run has reached, so that every branch
+# starts from the same random state as its parent at the fork (with a random_seed, branches are reproducible)
+# Example: compare emission rates from month 24 onwards
+#   tree = Scenario_Tree(Econ_Results(config, stop_month=0))
+#   tree.fork(24, {'emission 1%': {'emission_rate': 0.01}, 'emission 3%': {'emission_rate': 0.03}})
+#   tree.run()  # completes the runs of all the leaves
+#   tree.get_leaves()['emission 1%'].rewards_unclaimed  # nested branches are named 'emission 1%/<name>'
+class Scenario_Tree:
+    def __init__(self, results, name='root', fork_month=0):
+
+        self.results = results  # run of this node (up to results.next_month)
+        self.name = name  # name of the node: 'root', or the path of branch names from the root (separated by '/')
+        self.fork_month = fork_month  # month at which this node was forked from its parent
+        self.children = {}  # name of the branch -> Scenario_Tree
+        self.rng_state = (random.getstate(), np.random.get_state())  # global generators at results.next_month
+
+    # computes the run of this node until stop_month (by default until the end), continuing from the random state
+    # it had reached
+    def run_until(self, stop_month=None):
+
+        random.setstate(self.rng_state[0])
+        np.random.set_state(self.rng_state[1])
+        self.results.run(stop_month)
+        self.rng_state = (random.getstate(), np.random.get_state())
+
+    # runs this node until month and creates one branch per entry of branches (name -> dictionary with the Config
+    # parameters to change and their new values). Returns the dictionary of children
+    def fork(self, month, branches):
+
+        self.run_until(month)
+        for name, overrides in branches.items():
+            config = copy.copy(self.results.config)
+            for parameter, value in overrides.items():
+                if not hasattr(config, parameter):
+                    print("ISSUE: unknown Config parameter in the overrides of branch", name, ":", parameter)
+                    exit("error: bad branch overrides")
+                setattr(config, parameter, value)
+            path = name if self.name == 'root' else self.name + '/' + name
+            child = Scenario_Tree(self.results.fork(config), path, month)
+            child.rng_state = self.rng_state
+            self.children[name] = child
+        return self.children
+
+    # completes the runs of all the leaves of the tree
+    def run(self):
+
+        if len(self.children) == 0:
+            self.run_until()
+        for child in self.children.values():
+            child.run()
+
+    # returns a dictionary with the run of each leaf of the tree (key: name of the leaf node)
+    def get_leaves(self):
+
+        if len(self.children) == 0:
+            return {self.name: self.results}
+        leaves = {}
+        for child in self.children.values():
+            leaves.update(child.get_leaves())
+        return leaves
+
+    # returns the months at which the tree forks (for plots)
+    def get_fork_months(self):
+
+        months = set()
+        for child in self.children.values():
+            months.add(child.fork_month)
+            months.update(child.get_fork_months())
+        return sorted(months)
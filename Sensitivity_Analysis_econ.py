@@ -0,0 +1,182 @@
+import copy
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Macro_Batch_econ import Macro_Batch
+from Sweep_Engine_econ import Sweep_Engine
+
+
+# class measures how much each of a set of Config fields moves the outputs of the simulation with variance-based (Sobol)
+# sensitivity indices. ranges gives the interval (low, high) of each field, sampled uniformly (integer fields are
+# rounded); the other fields are those of config. The design is:
+# - 'DESIGN_SALTELLI': two Latin hypercube matrices A and B of nr_samples points, and for each field i the matrix AB_i
+#   (A with column i taken from B), so nr_samples * (nr_fields + 2) runs. First-order indices with Saltelli's estimator
+#   (2010) and total indices with Jansen's estimator
+# - 'DESIGN_LHS': one Latin hypercube of nr_samples points. First-order indices only, estimated from the variance of the
+#   mean output over equal-width bins of each field (total indices are NaN)
+# With config.type_model 'MODEL_MACRO' the runs are computed by Macro_Batch in batches (one batch per worker), otherwise
+# by a Sweep_Engine of Econ_Results runs with num_workers processes (all the runs use config.random_seed)
+# extend(nr_samples) adds samples to the design and evaluates only them, keeping the earlier runs
+# Example: Sensitivity_Analysis(config, {'alpha': (0.1, 0.5), 'emission_rate': (0.01, 0.03)}, 256).get_indices(name)
+class Sensitivity_Analysis:
+
+    # output series (one value per month) of the runs ; the medians of the nodes are not available in macro mode
+    series = ['median_ROS', 'median_APY_delegator', 'mixmining_pool', 'circulating_tokens', 'rewards_distributed_mix',
+              'rewards_unclaimed']
+
+    def __init__(self, config, ranges, nr_samples, type_design='DESIGN_SALTELLI', num_workers=1):
+
+        self.config = config  # configuration of the fields that are not sampled
+        self.fields = list(ranges)  # sampled Config fields
+        for field in self.fields:
+            if not hasattr(config, field) or not ranges[field][0] < ranges[field][1]:
+                print("ISSUE: sensitivity analysis needs an existing Config parameter and a range low < high:", field,
+                      ranges[field])
+                exit("error: bad sensitivity analysis range")
+        if type_design not in ['DESIGN_SALTELLI', 'DESIGN_LHS']:
+            print("ISSUE: unknown type_design for the sensitivity analysis:", type_design)
+            exit("error: bad sensitivity analysis design")
+        self.low = np.array([ranges[field][0] for field in self.fields], dtype=float)
+        self.high = np.array([ranges[field][1] for field in self.fields], dtype=float)
+        self.type_design = type_design
+        self.num_workers = num_workers
+        self.rng = np.random.default_rng(config.random_seed)  # generator of the design (extensions continue it)
+
+        nr_fields = len(self.fields)
+        self.nr_samples = 0  # nr of rows of the design (of A and of B)
+        self.samples_a = np.empty((0, nr_fields))  # design in the unit hypercube (rows of A)
+        self.samples_b = np.empty((0, nr_fields))  # rows of B ('DESIGN_SALTELLI' only)
+        self.outputs_a = {name: np.empty((0, config.num_intervals)) for name in Sensitivity_Analysis.series}
+        self.outputs_b = {name: np.empty((0, config.num_intervals)) for name in Sensitivity_Analysis.series}
+        self.outputs_ab = {name: np.empty((0, nr_fields, config.num_intervals)) for name in Sensitivity_Analysis.series}
+        self.extend(nr_samples)
+
+    # adds nr_samples rows to the design (a new Latin hypercube block for A and for B) and runs only the new points
+    def extend(self, nr_samples):
+
+        nr_fields = len(self.fields)
+        samples_a = self.get_latin_hypercube(self.rng, nr_samples, nr_fields)
+        samples = [samples_a]
+        if self.type_design == 'DESIGN_SALTELLI':
+            samples_b = self.get_latin_hypercube(self.rng, nr_samples, nr_fields)
+            samples.append(samples_b)
+            for i in range(nr_fields):
+                samples_ab = samples_a.copy()
+                samples_ab[:, i] = samples_b[:, i]
+                samples.append(samples_ab)
+        outputs = self.evaluate(np.concatenate(samples))
+
+        self.samples_a = np.concatenate([self.samples_a, samples_a])
+        for name in Sensitivity_Analysis.series:
+            self.outputs_a[name] = np.concatenate([self.outputs_a[name], outputs[name][:nr_samples]])
+        if self.type_design == 'DESIGN_SALTELLI':
+            self.samples_b = np.concatenate([self.samples_b, samples_b])
+            for name in Sensitivity_Analysis.series:
+                self.outputs_b[name] = np.concatenate([self.outputs_b[name], outputs[name][nr_samples:2 * nr_samples]])
+                outputs_ab = outputs[name][2 * nr_samples:].reshape(nr_fields, nr_samples, -1).transpose(1, 0, 2)
+                self.outputs_ab[name] = np.concatenate([self.outputs_ab[name], outputs_ab])
+        self.nr_samples += nr_samples
+
+    # returns a Latin hypercube of nr_samples points in [0, 1)^nr_fields: each field has one point in each of the
+    # nr_samples equal intervals, at a random position, and the intervals are matched at random between the fields
+    @staticmethod
+    def get_latin_hypercube(rng, nr_samples, nr_fields):
+
+        strata = rng.permuted(np.tile(np.arange(nr_samples), (nr_fields, 1)), axis=1).T
+        return (strata + rng.random((nr_samples, nr_fields))) / nr_samples
+
+    # returns the dictionary of Config fields -> value of a point of the unit hypercube
+    def get_point(self, sample):
+
+        point = {}
+        for field, value in zip(self.fields, self.low + sample * (self.high - self.low)):
+            default = getattr(self.config, field)
+            if isinstance(default, int) and not isinstance(default, bool):
+                point[field] = int(round(value))
+            else:
+                point[field] = float(value)
+        return point
+
+    # runs the points of the unit hypercube and returns a dictionary with an array (nr of points, num_intervals) for
+    # each output series
+    def evaluate(self, samples):
+
+        points = [self.get_point(sample) for sample in samples]
+        if self.config.type_model == 'MODEL_MACRO':
+            configs = []
+            for point in points:
+                point_config = copy.copy(self.config)
+                for field, value in point.items():
+                    setattr(point_config, field, value)
+                configs.append(point_config)
+            batches = np.array_split(np.arange(len(configs)), max(1, min(self.num_workers, len(configs))))
+            batches = [[configs[i] for i in batch] for batch in batches]
+            if self.num_workers <= 1:
+                outputs = [self.run_macro_batch(batch) for batch in batches]
+            else:
+                with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+                    outputs = list(executor.map(Sensitivity_Analysis.run_macro_batch, batches))
+            return {name: np.concatenate([output[name] for output in outputs]) for name in Sensitivity_Analysis.series}
+
+        sweep = Sweep_Engine(self.config, points, self.num_workers, summary_function=Sensitivity_Analysis.get_series)
+        return {name: np.array([row[name] for row in sweep.rows]) for name in Sensitivity_Analysis.series}
+
+    # worker function: runs a batch of configurations in macro mode and returns their output series
+    @staticmethod
+    def run_macro_batch(configs):
+
+        batch = Macro_Batch(configs)
+        outputs = {name: getattr(batch, name) for name in Sensitivity_Analysis.series[2:]}
+        for name in Sensitivity_Analysis.series[:2]:
+            outputs[name] = np.full((len(configs), batch.num_intervals), np.nan)
+        return outputs
+
+    # returns the output series of a run (Econ_Results in 'MODEL_FULL'): the median ROS of high reputation nodes, the
+    # median APY of the delegators and the token series, one value per month (NaN where not defined). The medians are
+    # over all the nodes of the month, also in streaming mode (values stored by the run)
+    @staticmethod
+    def get_series(results):
+
+        num_intervals = results.config.num_intervals
+        outputs = {name: np.array(getattr(results, name), dtype=float) for name in Sensitivity_Analysis.series[2:]}
+        if results.config.type_model == 'MODEL_FULL':
+            outputs['median_ROS'] = np.array([results.get_month_median_ROS(month) for month in range(num_intervals)])
+            outputs['median_APY_delegator'] = np.array([results.get_month_median(month, 'APY_delegator')
+                                                        for month in range(num_intervals)])
+        else:
+            outputs['median_ROS'] = np.full(num_intervals, np.nan)
+            outputs['median_APY_delegator'] = np.full(num_intervals, np.nan)
+        return outputs
+
+    # returns the first-order and total Sobol indices of the output series, as two arrays (nr_fields, num_intervals)
+    # with the index of each field in each month (NaN where the output does not vary or is not defined)
+    def get_indices(self, name):
+
+        outputs_a = self.outputs_a[name]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.type_design == 'DESIGN_SALTELLI':
+                outputs_b, outputs_ab = self.outputs_b[name], self.outputs_ab[name]
+                variance = np.var(np.concatenate([outputs_a, outputs_b]), axis=0)
+                first = np.mean(outputs_b[:, None, :] * (outputs_ab - outputs_a[:, None, :]), axis=0) / variance
+                total = np.mean((outputs_a[:, None, :] - outputs_ab) ** 2, axis=0) / (2 * variance)
+            else:
+                variance = np.var(outputs_a, axis=0)
+                first = np.array([self.get_first_order_lhs(self.samples_a[:, i], outputs_a) / variance
+                                  for i in range(len(self.fields))])
+                total = np.full(first.shape, np.nan)
+        return np.where(variance > 0, first, np.nan), np.where(variance > 0, total, np.nan)
+
+    # returns the variance per month explained by a field, from the points of a Latin hypercube: variance of the mean
+    # output over about sqrt(nr_samples) equal-width bins of the field (divided by the variance of the output, it gives
+    # the first-order index)
+    @staticmethod
+    def get_first_order_lhs(samples, outputs):
+
+        nr_bins = max(1, int(np.sqrt(len(samples))))
+        bins = np.minimum((samples * nr_bins).astype(int), nr_bins - 1)
+        mean = np.mean(outputs, axis=0)
+        explained = np.zeros(outputs.shape[1])
+        for b in range(nr_bins):
+            in_bin = bins == b
+            if np.any(in_bin):
+                explained += np.sum(in_bin) * (np.mean(outputs[in_bin], axis=0) - mean) ** 2
+        return explained / len(samples)
@@ -0,0 +1,124 @@
+# class describes the pipeline of stages that compute each month of a run (Econ_Results.compute_next_state), the Config
+# fields each stage reads and the stages whose outputs it uses. Econ_Results.rerun uses it to recompute a run with a
+# modified Config while reusing, month by month, the outputs of the stages whose inputs did not change
+# The stages 'inputs', 'network_sizing' and 'supply' compute vectors and a few scalars per month, and are always
+# recomputed. The stages of the nodes ('node_creation' to 'profit_split') are reused in a month if they do not read a
+# changed Config field, the stages of the nodes they depend on were reused, and the values they read in the month
+# (stage_inputs) are the same as in the previous run
+# Note that the supply of a month depends on the rewards of the previous month: a change that affects the rewards
+# (eg alpha) changes the supply, and then the nodes, of the following months
+class Stage_Graph:
+
+    # stages in the order in which they are computed in a month
+    stages = ['inputs', 'network_sizing', 'supply', 'node_creation', 'delegation', 'sampling', 'costs', 'rewards',
+              'profit_split']
+
+    # Config fields read directly by each stage
+    stage_fields = {
+        'inputs': ['num_intervals', 'type_bw_growth', 'initial_bandwidth', 'type_token_growth', 'token_launch_price',
+                   'type_pp_growth', 'price_packet_initial_dollar', 'cost_packet_bw_initial_dollar',
+                   'monthly_cost_cpu_initial_dollar', 'cpus_per_mix_initial', 'cpu_capacity_initial',
+                   'type_cpu_cost_growth', 'type_packet_bw_cost_growth', 'type_cpu_growth', 'type_capacity_growth'],
+        'network_sizing': ['mixnet_layers', 'type_mixnet_growth', 'nr_min_mixes', 'min_mixnet_width', 'mix_active_rate',
+                           'peak_factor', 'excess_candidate_factor'],
+        'supply': ['total_token', 'mixmining_pool_initial', 'emission_rate', 'liquid_tokens_initial',
+                   'unvested_tokens_initial', 'number_vesting_accounts', 'cap_staking_unvested',
+                   'frac_staking_unvested', 'vesting_period', 'vesting_interval', 'beta', 'frac_token_pledged',
+                   'frac_token_delegated', 'bw_to_mix', 'bw_to_gw'],
+        'node_creation': ['frac_whale_mix', 'frac_min_pledge_mix', 'minimum_pledge_mix', 'type_pledge_capping',
+                          'type_network_evolution', 'churn_rate_unbond', 'churn_rate_redelegate', 'random_seed',
+                          'type_random_numbers'],
+        'delegation': ['type_delegation_allocation', 'random_seed', 'type_random_numbers'],
+        'sampling': ['mixnet_layers', 'type_work_share', 'type_epoch_sampling', 'random_seed', 'type_random_numbers'],
+        'costs': ['cost_mix_dummy'],
+        'rewards': ['alpha', 'factor_work_active', 'mixnet_layers', 'node_performance'],
+        'profit_split': ['node_profit_margin'],
+    }
+
+    # Config fields that never change the results of a run, only how they are computed or saved (the epoch sampling
+    # gives the same values for any number of workers and batch size). They are not part of the key of Result_Cache
+    neutral_fields = ['sampling_num_workers', 'sampling_max_batch_elements', 'checkpoint_interval', 'checkpoint_dir',
+                      'result_cache_dir', 'result_cache_max_bytes']
+
+    # Config fields that do not change the results of a run in 'MODEL_FULL' with 'NODES_KEEP_ALL' (any other changed
+    # field that is not in stage_fields is considered to affect all the stages)
+    engine_fields = ['type_model', 'type_node_storage', 'stream_reservoir_size', 'stream_quantiles'] + neutral_fields
+
+    # stages whose outputs are used by each stage in the same month ('supply' also uses the rewards of the previous
+    # month)
+    stage_dependencies = {
+        'inputs': [],
+        'network_sizing': ['inputs'],
+        'supply': ['inputs', 'network_sizing', 'rewards'],
+        'node_creation': ['network_sizing', 'supply'],
+        'delegation': ['node_creation', 'supply'],
+        'sampling': ['network_sizing', 'delegation'],
+        'costs': ['inputs', 'sampling'],
+        'rewards': ['network_sizing', 'supply', 'sampling'],
+        'profit_split': ['costs', 'rewards'],
+    }
+
+    # values of the month read by each stage of the nodes: series of Econ_Results (state) or of its Network
+    stage_inputs = {
+        'node_creation': ['k', 'num_mixes', 'stake_saturation_mix', 'pledged_stake'],
+        'delegation': ['stake_saturation_mix', 'delegated_stake'],
+        'sampling': ['k', 'mixnet_width'],
+        'costs': ['cost_mix_flat_month_token', 'cost_active_mix_bw_month_token'],
+        'rewards': ['k', 'mixnet_width', 'income_global_mix'],
+        'profit_split': [],
+    }
+
+    # Node_Table columns written by each stage of the nodes (lambda_node and sigma_node follow from the delegation)
+    stage_columns = {
+        'node_creation': ['node_id', 'pledge'],
+        'delegation': ['delegated'],
+        'sampling': ['activity_percent', 'reserve_percent'],
+        'costs': ['node_cost'],
+        'rewards': ['received_rewards'],
+        'profit_split': ['operator_profit', 'delegate_profit'],
+    }
+
+    # returns the names of the Config fields with different values in config and new_config
+    @staticmethod
+    def get_changed_fields(config, new_config):
+
+        fields = sorted(set(vars(config)) | set(vars(new_config)))
+        return [field for field in fields if getattr(config, field, None) != getattr(new_config, field, None)]
+
+    # returns the set of stages that read directly a Config field changed from config to new_config
+    @staticmethod
+    def get_changed_stages(config, new_config):
+
+        changed_stages = set()
+        for field in Stage_Graph.get_changed_fields(config, new_config):
+            stages = [stage for stage in Stage_Graph.stages if field in Stage_Graph.stage_fields[stage]]
+            if len(stages) == 0 and field not in Stage_Graph.engine_fields:
+                stages = Stage_Graph.stages  # unknown field: it may affect any stage
+            changed_stages.update(stages)
+        return changed_stages
+
+    # returns the list of values of the month read by the stage in the results of a run (see stage_inputs)
+    @staticmethod
+    def get_input_values(results, stage, month):
+
+        values = []
+        for name in Stage_Graph.stage_inputs[stage]:
+            if name in results.state.series:
+                values.append(results.state.data[name][month])
+            else:
+                values.append(getattr(results.network, name)[month])
+        return values
+
+    # returns True if the outputs of the stage in the month of the previous run can be reused in results: the stage
+    # does not read a Config field in changed_stages, the stages of the nodes it depends on were reused (reused: stage
+    # -> True/False, for the stages already decided in the month) and it reads the same values as in previous
+    @staticmethod
+    def is_reusable(stage, month, results, previous, changed_stages, reused):
+
+        if stage in changed_stages:
+            return False
+        for upstream in Stage_Graph.stage_dependencies[stage]:
+            if not reused.get(upstream, True):
+                return False
+        return Stage_Graph.get_input_values(results, stage, month) == \
+            Stage_Graph.get_input_values(previous, stage, month)
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+# class keeps the running mean and variance of a vector of values (eg one value per month) over many observations,
+# with Welford's online algorithm, so that the observations do not need to be kept. NaN values are skipped: each
+# element has its own count of observations
+class Running_Moments:
+    def __init__(self, size):
+
+        self.count = np.zeros(size, dtype=np.int64)  # nr of (non NaN) observations of each element
+        self.mean = np.zeros(size)  # running mean of each element
+        self.m2 = np.zeros(size)  # running sum of squared differences from the mean of each element
+
+    # adds an observation (a vector of values, with NaN where the value is missing)
+    def update(self, values):
+
+        values = np.asarray(values, dtype=float)
+        observed = ~np.isnan(values)
+        self.count[observed] += 1
+        delta = values[observed] - self.mean[observed]
+        self.mean[observed] += delta / self.count[observed]
+        self.m2[observed] += delta * (values[observed] - self.mean[observed])
+
+    # returns the mean of each element (NaN where there are no observations)
+    def get_mean(self):
+        return np.where(self.count > 0, self.mean, np.nan)
+
+    # returns the sample variance of each element (NaN where there are less than two observations)
+    def get_variance(self):
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+
+    # returns the standard error of the mean of each element
+    def get_standard_error(self):
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sqrt(self.get_variance() / self.count)
+
+
+# class estimates a quantile of a stream of values with the P-square algorithm (Jain and Chlamtac, 1985): five markers
+# track the minimum, the quantile, the maximum and two intermediate quantiles, and their heights are adjusted with a
+# piecewise-parabolic interpolation after each value, so memory is constant. The first five values are kept exactly
+class P2_Quantile:
+    def __init__(self, quantile):
+
+        self.quantile = quantile  # quantile to estimate (between 0 and 1)
+        self.count = 0  # nr of values of the stream
+        self.heights = []  # heights of the markers (the first values, sorted, until there are five)
+        self.positions = np.arange(1.0, 6.0)  # actual positions of the markers
+        self.desired = np.array([1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5])  # desired positions
+        self.increments = np.array([0, quantile / 2, quantile, (1 + quantile) / 2, 1])  # of the desired positions
+
+    # adds a value to the stream (NaN values are skipped)
+    def update(self, value):
+
+        if np.isnan(value):
+            return
+        self.count += 1
+        if self.count <= 5:
+            self.heights = sorted(self.heights + [value])
+            if len(self.heights) == 5:
+                self.heights = np.array(self.heights, dtype=float)
+            return
+
+        q, n = self.heights, self.positions
+        if value < q[0]:
+            q[0] = value
+            cell = 0
+        elif value >= q[4]:
+            q[4] = value
+            cell = 3
+        else:
+            cell = int(np.searchsorted(q, value, side='right')) - 1
+        n[cell + 1:] += 1
+        self.desired += self.increments
+
+        # adjust the heights of the three middle markers if they are off their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                        (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                        (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:  # parabolic prediction out of bounds: linear interpolation
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    # returns the estimate of the quantile (exact while there are at most five values, NaN if there are none)
+    def get_value(self):
+
+        if self.count == 0:
+            return np.nan
+        if self.count <= 5:
+            return float(np.quantile(self.heights, self.quantile))
+        return float(self.heights[2])
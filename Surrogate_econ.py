@@ -0,0 +1,265 @@
+import argparse
+import csv
+import os
+import numpy as np
+from Configuration_econ import Config
+from Sensitivity_Analysis_econ import Sensitivity_Analysis
+from Stage_Graph_econ import Stage_Graph
+from Sweep_Engine_econ import Sweep_Engine
+
+
+# class emulates the summary outputs of a run (eg the yearly median APY of the delegators and mixmining pool of
+# Sweep_Engine.get_summary) as a function of a few Config fields, with one Gaussian process per output fitted on the
+# results of a parameter sweep, so that what-if questions are answered in microseconds instead of a full run
+# The fields are scaled to [0, 1] over the range of the sweep and each output is standardised. The kernel is a squared
+# exponential with one length scale per field plus a noise term (the runs are random), and the length scales and the
+# noise are chosen by maximising the log marginal likelihood with a pattern search
+# predict(point) returns the mean and standard deviation of each output, and refine() runs new points (with a
+# Sweep_Engine) where the emulator is the most uncertain and refits it with them. The new points use the configuration
+# of the sweep for the fields that are not swept (self.config, saved by Sweep_Engine next to the CSV file), so that
+# their outputs are comparable with those of the sweep
+# Example: Surrogate.load_csv('sweep.csv').predict({'alpha': 0.25, 'emission_rate': 0.02})
+# Command line: python Surrogate_econ.py predict sweep.csv alpha=0.25 emission_rate=0.02
+#               python Surrogate_econ.py refine sweep.csv --points 8 --workers 4
+class Surrogate:
+    def __init__(self, fields, inputs, outputs, config=None):
+
+        self.config = config  # configuration of the sweep for the fields that are not swept (None if unknown)
+        self.fields = list(fields)  # Config fields of the inputs
+        self.inputs = np.array(inputs, dtype=float).reshape(-1, len(self.fields))  # one row per run
+        self.outputs = {name: np.array(values, dtype=float) for name, values in outputs.items()}  # one value per run
+        self.models = {}  # per output: fitted Gaussian process (see fit_output)
+        self.fit()
+
+    # returns a Surrogate fitted on the rows of a CSV file written by Sweep_Engine: the columns that are Config fields
+    # are the inputs, and the other numerical columns (except 'point') the outputs. The configuration of the sweep is
+    # loaded from the file saved next to the CSV file, if any
+    @staticmethod
+    def load_csv(file_name):
+
+        with open(file_name, newline='') as file:
+            rows = list(csv.DictReader(file))
+        if len(rows) == 0:
+            print("ISSUE: no sweep results in", file_name)
+            exit("error: empty sweep results")
+        config = Config()
+        fields = [name for name in rows[0] if name != 'point' and hasattr(config, name)]
+        names = [name for name in rows[0] if name != 'point' and name not in fields]
+        unsupported = [field for field in fields if not all(Surrogate.is_number(row[field]) for row in rows)]
+        unsupported += [name for name in names
+                        if not all(row[name] == '' or Surrogate.is_number(row[name]) for row in rows)]
+        if len(unsupported) > 0:
+            print("ISSUE: the surrogate only emulates numerical fields and outputs, columns not supported in",
+                  file_name, ":", unsupported)
+            exit("error: non numerical sweep results")
+        inputs = [[float(row[field]) for field in fields] for row in rows]
+        outputs = {name: [float(row[name]) if row[name] != '' else np.nan for row in rows] for name in names}
+        config_file = Sweep_Engine.get_config_file(file_name)
+        config = Sweep_Engine.load_config(config_file) if os.path.exists(config_file) else None
+        return Surrogate(fields, inputs, outputs, config)
+
+    # returns True if the CSV value is a number (outputs that are not defined are empty)
+    @staticmethod
+    def is_number(value):
+
+        try:
+            float(value)
+        except ValueError:
+            return False
+        return True
+
+    # fits one Gaussian process per output, on the runs where the output is defined (not NaN)
+    def fit(self):
+
+        self.low = np.min(self.inputs, axis=0)  # range of each field in the runs, scaled to [0, 1]
+        self.high = np.max(self.inputs, axis=0)
+        self.models = {}
+        for name, values in self.outputs.items():
+            defined = np.isfinite(values)
+            if np.count_nonzero(defined) >= 2:
+                self.models[name] = self.fit_output(self.scale(self.inputs[defined]), values[defined])
+
+    # returns the inputs (one row per point) scaled to [0, 1] over the range of the runs (fields with a single value
+    # are set to zero)
+    def scale(self, inputs):
+
+        span = np.where(self.high > self.low, self.high - self.low, 1.0)
+        return (np.asarray(inputs, dtype=float) - self.low) / span
+
+    # returns the Gaussian process of an output: standardisation of the values, length scales and noise that maximise
+    # the log marginal likelihood, and the matrices used by the predictions
+    @staticmethod
+    def fit_output(inputs, values, nr_sweeps=20):
+
+        mean, std = np.mean(values), np.std(values)
+        std = std if std > 0 else 1.0
+        targets = (values - mean) / std
+
+        # pattern search on the logarithms of the length scales and of the noise variance, within bounds
+        parameters = np.append(np.full(inputs.shape[1], np.log(0.5)), np.log(10**-4))
+        lower = np.append(np.full(inputs.shape[1], np.log(0.01)), np.log(10**-8))
+        upper = np.append(np.full(inputs.shape[1], np.log(100)), np.log(1))
+        best = Surrogate.get_log_likelihood(inputs, targets, parameters)
+        step = np.log(4)
+        for sweep in range(nr_sweeps):
+            improved = False
+            for i in range(len(parameters)):
+                for direction in [1, -1]:
+                    candidate = parameters.copy()
+                    candidate[i] = np.clip(candidate[i] + direction * step, lower[i], upper[i])
+                    likelihood = Surrogate.get_log_likelihood(inputs, targets, candidate)
+                    if likelihood > best:
+                        parameters, best, improved = candidate, likelihood, True
+                        break
+            if not improved:
+                step /= 2
+
+        length_scales, noise = np.exp(parameters[:-1]), np.exp(parameters[-1])
+        inverse = np.linalg.inv(Surrogate.get_kernel(inputs, inputs, length_scales) + noise * np.eye(len(inputs)))
+        return {'inputs': inputs, 'mean': mean, 'std': std, 'length_scales': length_scales, 'noise': noise,
+                'inverse': inverse, 'weights': inverse @ targets, 'log_likelihood': best}
+
+    # returns the squared exponential kernel (unit variance) between two sets of scaled inputs
+    @staticmethod
+    def get_kernel(inputs_a, inputs_b, length_scales):
+
+        differences = (inputs_a[:, None, :] - inputs_b[None, :, :]) / length_scales
+        return np.exp(-0.5 * np.sum(differences ** 2, axis=2))
+
+    # returns the log marginal likelihood of standardised targets for the parameters (log length scales and log noise),
+    # or -inf if the kernel matrix is not positive definite
+    @staticmethod
+    def get_log_likelihood(inputs, targets, parameters):
+
+        kernel = Surrogate.get_kernel(inputs, inputs, np.exp(parameters[:-1])) + np.exp(parameters[-1]) * \
+            np.eye(len(inputs))
+        try:
+            cholesky = np.linalg.cholesky(kernel)
+        except np.linalg.LinAlgError:
+            return -np.inf
+        solved = np.linalg.solve(cholesky, targets)
+        return -0.5 * solved @ solved - np.sum(np.log(np.diag(cholesky))) - 0.5 * len(inputs) * np.log(2 * np.pi)
+
+    # returns a dictionary output -> (mean, standard deviation) predicted at a point (dictionary of the Config fields)
+    def predict(self, point):
+
+        missing = [field for field in self.fields if field not in point]
+        if len(missing) > 0:
+            print("ISSUE: the point to predict has no value for the fields", missing)
+            exit("error: bad surrogate point")
+        inputs = self.scale([[point[field] for field in self.fields]])
+        return {name: (mean[0], std[0]) for name, (mean, std) in self.predict_inputs(inputs).items()}
+
+    # returns a dictionary output -> (vector of means, vector of standard deviations) at the scaled inputs (one row per
+    # point). The standard deviation is the uncertainty of the emulator on the expected output (noise excluded)
+    def predict_inputs(self, inputs):
+
+        predictions = {}
+        for name, model in self.models.items():
+            kernel = self.get_kernel(inputs, model['inputs'], model['length_scales'])
+            variance = np.maximum(1 - np.sum((kernel @ model['inverse']) * kernel, axis=1), 0)
+            predictions[name] = (model['mean'] + model['std'] * (kernel @ model['weights']),
+                                 model['std'] * np.sqrt(variance))
+        return predictions
+
+    # returns nr_points points (dictionaries of the Config fields) in the range of the runs where the emulator is the
+    # most uncertain: among the points of a Latin hypercube, the point with the highest standardised variance (the
+    # maximum over the outputs) is picked, added to the runs (the variance does not depend on the output values) and
+    # the next point is picked, so that the points are spread
+    def get_refinement_points(self, nr_points, nr_candidates=2000, rng=None):
+
+        rng = np.random.default_rng() if rng is None else rng
+        candidates = Sensitivity_Analysis.get_latin_hypercube(rng, nr_candidates, len(self.fields))
+        picked = []
+        for i in range(nr_points):
+            variance = np.zeros(nr_candidates)
+            for model in self.models.values():
+                inputs = np.concatenate([model['inputs'], candidates[picked]])
+                kernel = self.get_kernel(inputs, inputs, model['length_scales']) + model['noise'] * np.eye(len(inputs))
+                cross = self.get_kernel(candidates, inputs, model['length_scales'])
+                variance = np.maximum(variance, 1 - np.sum((cross @ np.linalg.inv(kernel)) * cross, axis=1))
+            variance[picked] = -1
+            picked.append(int(np.argmax(variance)))
+
+        config = Config()
+        points = []
+        for sample in candidates[picked]:
+            point = {}
+            for field, value in zip(self.fields, self.low + sample * (self.high - self.low)):
+                default = getattr(config, field)
+                point[field] = int(round(value)) if isinstance(default, int) and not isinstance(default, bool) \
+                    else float(value)
+            points.append(point)
+        return points
+
+    # runs nr_points new points where the emulator is the most uncertain, adds them to the runs (and to the CSV file
+    # file_name, if given) and refits the emulator. Returns the new rows. The other fields take the values of the
+    # configuration of the sweep; config is only needed if it is unknown, and must otherwise have the same values for
+    # all the fields that change the results and are not swept
+    def refine(self, nr_points, num_workers=1, file_name=None, rng=None, config=None):
+
+        if config is None:
+            config = self.config
+        if config is None:
+            print("ISSUE: the configuration of the sweep is unknown, give the configuration of the fields that are not "
+                  "swept")
+            exit("error: no sweep configuration")
+        if self.config is not None:
+            different = [field for field in sorted(set(vars(config)) | set(vars(self.config)))
+                         if field not in self.fields and field not in Stage_Graph.neutral_fields and
+                         getattr(config, field, None) != getattr(self.config, field, None)]
+            if len(different) > 0:
+                print("ISSUE: the configuration of the new points differs from the configuration of the sweep in",
+                      different)
+                exit("error: refinement configuration does not match the sweep")
+
+        sweep = Sweep_Engine(config, self.get_refinement_points(nr_points, rng=rng), num_workers)
+        rows = sweep.rows
+        self.inputs = np.concatenate([self.inputs, [[row[field] for field in self.fields] for row in rows]])
+        for name in self.outputs:
+            self.outputs[name] = np.append(self.outputs[name], [row.get(name, np.nan) for row in rows])
+        if file_name is not None:
+            with open(file_name, newline='') as file:
+                reader = csv.DictReader(file)
+                names = reader.fieldnames
+                nr_rows = sum(1 for row in reader)
+            with open(file_name, 'a', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=names, restval='', extrasaction='ignore')
+                writer.writerows([dict(row, point=nr_rows + index) for index, row in enumerate(rows)])
+        self.fit()
+        return rows
+
+
+# command line: predict the outputs at a point, or refine the emulator of a CSV file of sweep results (the fields that
+# are not swept take the values of the configuration saved with the sweep)
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Surrogate of the simulation fitted on sweep results (CSV)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    parser_predict = subparsers.add_parser('predict', help='predict the outputs at a point')
+    parser_predict.add_argument('file_name')
+    parser_predict.add_argument('values', nargs='+', help='value of each field, as field=value')
+    parser_refine = subparsers.add_parser('refine', help='run new points where the surrogate is the most uncertain')
+    parser_refine.add_argument('file_name')
+    parser_refine.add_argument('--points', type=int, default=8, help='nr of new runs')
+    parser_refine.add_argument('--workers', type=int, default=1, help='nr of worker processes')
+    parser_refine.add_argument('--defaults', action='store_true',
+                               help='run the fields that are not swept with the values of Configuration_econ.py '
+                                    '(only for sweeps without a saved configuration)')
+    arguments = parser.parse_args()
+
+    surrogate = Surrogate.load_csv(arguments.file_name)
+    if arguments.command == 'predict':
+        values = dict(value.split('=', 1) for value in arguments.values)
+        for output, (mean, std) in surrogate.predict({field: float(values[field]) for field in values}).items():
+            print(output, mean, "+-", std)
+    elif surrogate.config is None and not arguments.defaults:
+        print("ISSUE: no configuration saved with the sweep", arguments.file_name, "in",
+              Sweep_Engine.get_config_file(arguments.file_name) + ": run the sweep again or use --defaults")
+        exit("error: no sweep configuration")
+    else:
+        if surrogate.config is None:
+            print("WARNING: the fields that are not swept take the values of Configuration_econ.py")
+        surrogate.refine(arguments.points, arguments.workers, arguments.file_name,
+                         config=surrogate.config if surrogate.config is not None else Config())
+        print("surrogate refitted on", len(surrogate.inputs), "runs")
@@ -0,0 +1,185 @@
+import contextlib
+import copy
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from Configuration_econ import Config
+from Econ_Results_econ import Econ_Results
+from Stage_Graph_econ import Stage_Graph
+
+
+# class runs a parameter sweep: one run (Econ_Results) per point, where a point is a dictionary of Config fields to
+# change and their values (the other fields are those of config). The points can be given as a list, or as a grid with
+# get_grid({'alpha': [0.2, 0.3], 'emission_rate': [0.01, 0.02]}) (all the combinations of the values)
+# The points are split into chunks that are run by num_workers processes, and the summary metrics of each run (see
+# get_summary, or summary_function(results) if given) are added to self.rows, and written to the CSV file output_file
+# (if given), as each chunk finishes. The configuration of the fields that are not swept is saved next to the CSV file
+# (see get_config_file), so that the sweep can be extended later with the same configuration (eg by Surrogate.refine)
+# If no swept field is read by the Stage_Graph stages 'inputs' and 'network_sizing', the input vectors (user demand,
+# token price, costs, network sizes) are computed once and shared read-only with the workers instead of recomputed
+# Example: Sweep_Engine(config, Sweep_Engine.get_grid({'alpha': [0.2, 0.3]}), 4, output_file='sweep.csv').rows
+class Sweep_Engine:
+
+    shared_inputs = None  # input vectors shared by all the runs of the process (set by set_shared_inputs)
+
+    def __init__(self, config, points, num_workers=1, chunk_size=None, output_file=None, summary_function=None):
+
+        self.config = config  # configuration of the fields that are not swept
+        self.points = [dict(point) for point in points]  # one dictionary of Config fields -> value per run
+        self.fields = []  # swept fields, in order of appearance
+        for point in self.points:
+            for field in point:
+                if not hasattr(config, field):
+                    print("ISSUE: unknown Config parameter in sweep point", point, ":", field)
+                    exit("error: bad sweep point")
+                if field not in self.fields:
+                    self.fields.append(field)
+        self.rows = []  # one dictionary per finished run: index of the point, swept fields and summary metrics
+        if summary_function is None:
+            summary_function = Sweep_Engine.get_summary
+
+        # the input vectors only depend on the fields of the stages 'inputs' and 'network_sizing'
+        input_fields = Stage_Graph.stage_fields['inputs'] + Stage_Graph.stage_fields['network_sizing']
+        inputs = None
+        if all(self.is_stage_field(field) and field not in input_fields for field in self.fields):
+            inputs = self.compute_inputs(config)
+
+        if chunk_size is None:  # a few chunks per worker to balance the load
+            chunk_size = max(1, len(self.points) // (4 * max(1, num_workers)))
+        chunks = [list(range(first, min(first + chunk_size, len(self.points))))
+                  for first in range(0, len(self.points), chunk_size)]
+
+        writer = None
+        output = None
+        if output_file is not None:
+            self.save_config(config, self.get_config_file(output_file))
+            output = open(output_file, 'w', newline='')
+        if num_workers <= 1:
+            Sweep_Engine.set_shared_inputs(inputs)
+            for chunk in chunks:
+                points = [self.points[i] for i in chunk]
+                writer = self.add_rows(self.run_chunk(config, chunk, points, summary_function), output, writer)
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=Sweep_Engine.set_shared_inputs,
+                                     initargs=(inputs,)) as executor:
+                futures = [executor.submit(Sweep_Engine.run_chunk, config, chunk, [self.points[i] for i in chunk],
+                                           summary_function) for chunk in chunks]
+                for future in as_completed(futures):
+                    writer = self.add_rows(future.result(), output, writer)
+        if output is not None:
+            output.close()
+        self.rows.sort(key=lambda row: row['point'])
+
+    # returns the name of the file where the configuration of a sweep written to the CSV file output_file is saved
+    @staticmethod
+    def get_config_file(output_file):
+        return str(output_file) + '.config.json'
+
+    # saves all the fields of config in a JSON file
+    @staticmethod
+    def save_config(config, file_name):
+
+        with open(file_name, 'w') as file:
+            json.dump(vars(config), file, indent=1, sort_keys=True)
+
+    # returns the Config saved in a JSON file by save_config (fields missing in the file keep the values of
+    # Configuration_econ.py)
+    @staticmethod
+    def load_config(file_name):
+
+        with open(file_name) as file:
+            values = json.load(file)
+        config = Config()
+        unknown = [field for field in values if not hasattr(config, field)]
+        if len(unknown) > 0:
+            print("ISSUE: unknown Config parameters in", file_name, ":", unknown)
+            exit("error: bad sweep configuration")
+        for field, value in values.items():
+            setattr(config, field, value)
+        return config
+
+    # returns the list of points of the grid with all the combinations of the values of each field (field -> list)
+    @staticmethod
+    def get_grid(values):
+
+        fields = list(values)
+        return [dict(zip(fields, combination)) for combination in itertools.product(*[values[f] for f in fields])]
+
+    # returns True if the field is read by a stage of Stage_Graph (other fields may affect any part of the run)
+    @staticmethod
+    def is_stage_field(field):
+
+        if field in Stage_Graph.engine_fields:
+            return True
+        return any(field in fields for fields in Stage_Graph.stage_fields.values())
+
+    # returns the input vectors of config (see Econ_Results.get_inputs), as read-only arrays
+    @staticmethod
+    def compute_inputs(config):
+
+        results = Econ_Results(config, stop_month=0)
+        inputs = results.get_inputs()
+        for name in Econ_Results.input_series:
+            inputs[name].flags.writeable = False
+        return inputs
+
+    # initializer of the worker processes: sets the input vectors shared by the runs of the process (or None)
+    @staticmethod
+    def set_shared_inputs(inputs):
+        Sweep_Engine.shared_inputs = inputs
+
+    # worker function: runs the points of a chunk (indexes and dictionaries of changed fields) without printing the
+    # progress and without checkpoints, and returns their rows (summary metrics given by summary_function)
+    @staticmethod
+    def run_chunk(config, indexes, points, summary_function):
+
+        rows = []
+        for index, point in zip(indexes, points):
+            point_config = copy.copy(config)
+            for field, value in point.items():
+                setattr(point_config, field, value)
+            point_config.checkpoint_interval = 0
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                results = Econ_Results(point_config, inputs=Sweep_Engine.shared_inputs)
+            row = {'point': index}
+            row.update(point)
+            row.update(summary_function(results))
+            rows.append(row)
+        return rows
+
+    # returns a dictionary with the summary metrics of a run: for each year, the median APY of the delegators (over the
+    # nodes of the last month of the year, not available in macro mode) and the mixmining pool at the end of the year,
+    # and the final circulating supply and total unclaimed rewards
+    @staticmethod
+    def get_summary(results):
+
+        summary = {}
+        for year, month in enumerate(range(11, results.config.num_intervals, 12), 1):
+            if results.config.type_model == 'MODEL_FULL':
+                summary['median_APY_delegator_year_' + str(year)] = results.get_month_median(month, 'APY_delegator')
+            else:
+                summary['median_APY_delegator_year_' + str(year)] = np.nan
+            summary['mixmining_pool_year_' + str(year)] = results.mixmining_pool[month]
+        summary['circulating_tokens_end'] = results.circulating_tokens[-1]
+        summary['rewards_unclaimed_total'] = np.sum(results.rewards_unclaimed)
+        return summary
+
+    # adds the rows of a finished chunk to self.rows and writes them to the CSV output (the header is written with the
+    # first rows). Returns the CSV writer
+    def add_rows(self, rows, output, writer):
+
+        for row in rows:
+            print("sweep point", row['point'] + 1, "/", len(self.points), ":", self.points[row['point']])
+        self.rows.extend(rows)
+        if output is not None:
+            if writer is None:
+                writer = csv.DictWriter(output, fieldnames=['point'] + self.fields +
+                                        [name for name in rows[0] if name != 'point' and name not in self.fields],
+                                        restval='')
+                writer.writeheader()
+            writer.writerows(rows)
+            output.flush()
+        return writer
@@ -3,7 +3,7 @@ import os
 import string
 import random
 from Configuration_econ import Config
-from Econ_Results_econ import Econ_Results
+from Result_Cache_econ import Result_Cache
 from Plot_Results_econ import Plot_Results
 from Stakeholder_econ import Stakeholder
 
@@ -133,10 +133,8 @@ def display_preset_functions(plot_res, save_to_file, path):
     plot_res.plot_preset_bw_growth_functions(path + file_name)
 
 
-# This function contains the calls to plot figures with results of interest. If 'save_to_file' is True then files
-# are saved in the directory specified in 'path'; otherwise plots are shown on screen.
-# comment out  plot_res.plot_ functions that are not of interest in an evaluation
-def display_save_plots(plot_res, save_to_file, path, config):
+# This function contains the calls to plot figures with per-node results (FIGS TYPE 1 and 2 of display_save_plots)
+def display_save_node_plots(plot_res, save_to_file, path, config):
 
     file_name = ''  # if value of path and filename is '' then shows graphs in screen.
     max_years = config.num_intervals // 12
@@ -172,6 +170,8 @@ def display_save_plots(plot_res, save_to_file, path, config):
         plot_res.plot_distribution_pledges_stake(path + file_name, sample_month)
 
     # plot rewards from pledging vs delegating a certain amount of stake to a node
+    # (the samples of all the amounts are computed in one pass, and then reused by the plots of each quarter)
+    plot_res.results.sample_quarterly_rewards_no_compound_vs_saturation([10 ** 4, 10 ** 3, 100])
     for stake in [10 ** 4, 10 ** 3, 100]:
         for quarter in range(1, max_quarters+1):  #for year in range(1, max_years + 1):
             if save_to_file:
@@ -200,6 +200,16 @@ def display_save_plots(plot_res, save_to_file, path, config):
             file_name = 'nodes_distribution_' + str(par) + '.png'
         plot_res.plot_node_parameter_distributions(path + file_name, par)
 
+
+# This function contains the calls to plot figures with results of interest. If 'save_to_file' is True then files
+# are saved in the directory specified in 'path'; otherwise plots are shown on screen.
+# comment out  plot_res.plot_ functions that are not of interest in an evaluation
+def display_save_plots(plot_res, save_to_file, path, config):
+
+    file_name = ''  # if value of path and filename is '' then shows graphs in screen.
+    if config.type_model == 'MODEL_FULL':  # the macro model has no per-node results
+        display_save_node_plots(plot_res, save_to_file, path, config)
+
     ####################
     # FIGS TYPE 3: Plot distributions of global system variables and averages (instead of per-node values/distributions)
     # List of available functions below.
@@ -237,6 +247,9 @@ def display_save_plots(plot_res, save_to_file, path, config):
     if config.type_bw_growth != 'BW_ZERO':
         plot_res.plot_nr_operators(path + file_name)
 
+    # node distributions are computed once and shared by all the plots above
+    print("distribution cache:", plot_res.results.distribution_cache.get_stats())
+
 
 def stakeholder_plots(plot_res, save_to_file, path, config):
 
@@ -270,8 +283,11 @@ def run_model(save_to_file):
     # FIRST create configuration object with all the input variables
     config = Config()
 
-    # SECOND create and run the model with the chosen configuration, perform basic sanity check on results
-    results = Econ_Results(config)
+    # SECOND create and run the model with the chosen configuration (or load its results if the same configuration
+    # was already run with a random_seed), perform basic sanity check on results
+    result_cache = Result_Cache(config.result_cache_dir, config.result_cache_max_bytes)
+    results = result_cache.get_results(config)
+    print("result cache:", result_cache.get_stats())
     sanity_check_results(results)
 
     # THIRD create the plotting object to plot results (that can be displayed or saved to file)
@@ -280,12 +296,13 @@ def run_model(save_to_file):
     # FOURTH call the desired plotting functions to look into system variables and results of interest
     display_save_plots(plot_res, save_to_file, path, config)
 
-    # FIFTH print the list of nodes for a month to see if all node variables look ok
-    for sample_month in [0]:#[0, 11]:
-        if save_to_file:  # save info in a file
-            save_info_list_nodes(sample_month, path, results)
-        else:  # print the info to screen
-            print_info_list_nodes(sample_month, results)
+    # FIFTH print the list of nodes for a month to see if all node variables look ok (no nodes in the macro model)
+    if config.type_model == 'MODEL_FULL':
+        for sample_month in [0]:#[0, 11]:
+            if save_to_file:  # save info in a file
+                save_info_list_nodes(sample_month, path, results)
+            else:  # print the info to screen
+                print_info_list_nodes(sample_month, results)
 
     # SIXTH compute results for specific stakeholders
     #stakeholder_plots(plot_res, save_to_file, path, config)
@@ -0,0 +1,45 @@
+import contextlib
+import io
+import os
+import sys
+import pytest
+
+# the modules of the simulator are at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Configuration_econ import Config  # noqa: E402
+from Econ_Results_econ import Econ_Results  # noqa: E402
+
+
+# returns a function that creates a Config with the given fields changed (a short run with a fixed seed by default)
+@pytest.fixture
+def make_config():
+
+    def make(**fields):
+        config = Config()
+        config.num_intervals = 6
+        config.random_seed = 5
+        for field, value in fields.items():
+            if not hasattr(config, field):
+                raise AttributeError("unknown Config parameter: " + field)
+            setattr(config, field, value)
+        return config
+
+    return make
+
+
+# returns a function that runs Econ_Results on a Config (see make_config) without printing the progress
+@pytest.fixture
+def run(make_config):
+
+    def run_config(config=None, **fields):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return Econ_Results(config if config is not None else make_config(**fields))
+
+    return run_config
+
+
+# context manager that hides the progress printed by the runs
+@pytest.fixture
+def quiet():
+    return lambda: contextlib.redirect_stdout(io.StringIO())
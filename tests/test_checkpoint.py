@@ -0,0 +1,55 @@
+import copy
+import numpy as np
+import pytest
+from Econ_Results_econ import Econ_Results
+
+fields = {'num_intervals': 12, 'random_seed': 3, 'type_epoch_sampling': 'SAMPLING_BATCHED_KEYS'}
+
+
+# a run resumed from a checkpoint is identical to the straight run, and a fork of a checkpoint with a modified Config
+# is identical to the same change applied in the middle of a run
+@pytest.mark.parametrize('type_network_evolution', ['NETWORK_REGENERATE', 'NETWORK_PERSISTENT_CHURN'])
+def test_resume_and_fork_are_exact(tmp_path, make_config, run, quiet, type_network_evolution):
+
+    checkpoint_dir = str(tmp_path) + '/'
+    straight = run(**fields, type_network_evolution=type_network_evolution)
+    run(**fields, type_network_evolution=type_network_evolution, checkpoint_interval=6, checkpoint_dir=checkpoint_dir)
+    forked_config = make_config(**dict(fields, num_intervals=15), type_network_evolution=type_network_evolution,
+                                emission_rate=0.03)
+    with quiet():
+        resumed = Econ_Results.load_checkpoint(checkpoint_dir + 'checkpoint_month_6.pkl')
+        resumed.run()
+        forked = Econ_Results.load_checkpoint(checkpoint_dir + 'checkpoint_month_6.pkl', forked_config)
+        forked.run()
+        in_process = Econ_Results(make_config(**fields, type_network_evolution=type_network_evolution), stop_month=6)
+        in_process.apply_config(copy.copy(forked_config))
+        in_process.run()
+
+    assert np.array_equal(resumed.state.data, straight.state.data)
+    for month in range(12):
+        assert np.array_equal(resumed.network.list_mix[month].received_rewards,
+                              straight.network.list_mix[month].received_rewards)
+    assert np.array_equal(forked.state.data, in_process.state.data)
+    assert np.array_equal(forked.state.data[:6], straight.state.data[:6])
+    assert not np.array_equal(forked.mixmining_pool[6:12], straight.mixmining_pool[6:12])
+
+
+# without random_seed, a resumed run and a fork keep the roots of the random streams of their parent (common random
+# numbers and the epoch substreams of the parallel sampling), so they continue the parent run
+def test_resume_and_fork_keep_random_streams_without_seed(tmp_path, make_config, run, quiet):
+
+    checkpoint_dir = str(tmp_path) + '/'
+    config = make_config(random_seed=None, nr_min_mixes=90, min_mixnet_width=10,
+                         type_random_numbers='RANDOM_COMMON_STREAMS', type_epoch_sampling='SAMPLING_PARALLEL_KEYS',
+                         sampling_num_workers=1, checkpoint_interval=3, checkpoint_dir=checkpoint_dir)
+    straight = run(config)
+    with quiet():
+        resumed = Econ_Results.load_checkpoint(checkpoint_dir + 'checkpoint_month_3.pkl')
+        resumed.run()
+        forked = Econ_Results.load_checkpoint(checkpoint_dir + 'checkpoint_month_3.pkl', copy.copy(config))
+        forked.run()
+    assert np.array_equal(resumed.state.data, straight.state.data)
+    assert np.array_equal(forked.state.data, straight.state.data)
+    for month in range(6):
+        assert np.array_equal(forked.network.list_mix[month].activity_percent,
+                              straight.network.list_mix[month].activity_percent)
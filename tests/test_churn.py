@@ -0,0 +1,16 @@
+import numpy as np
+
+fields = {'num_intervals': 8, 'random_seed': 1, 'type_network_evolution': 'NETWORK_PERSISTENT_CHURN',
+          'type_work_share': 'WORK_SHARE_EXPECTED'}
+
+
+# the reported pledged stake is the pledge held by the registered nodes, also in the months where the new nodes can not
+# take all the pledge budget
+def test_churn_pledged_stake_equals_registry_pledge(run):
+
+    results = run(**fields)
+    for month in range(8):
+        assert np.isclose(np.sum(results.network.list_mix[month].pledge), results.pledged_stake[month], rtol=1e-12)
+    registry = results.network.registry
+    assert np.isclose(np.sum(registry.table.pledge[registry.alive]), results.pledged_stake[7], rtol=1e-12)
+    assert np.min(results.pledged_stake / (results.config.frac_token_pledged * results.max_effective_stake)) < 0.99
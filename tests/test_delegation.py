@@ -0,0 +1,15 @@
+import numpy as np
+
+fields = {'num_intervals': 3, 'random_seed': 2, 'type_work_share': 'WORK_SHARE_EXPECTED'}
+
+
+# the vectorized allocation draws the same samples as the node-by-node loop and gives the same delegations (up to the
+# rounding of the cumulative sums)
+def test_vectorized_delegation_equals_sequential(run):
+
+    sequential = run(**fields, type_delegation_allocation='DELEGATION_SEQUENTIAL')
+    vectorized = run(**fields, type_delegation_allocation='DELEGATION_VECTORIZED')
+    for month in range(3):
+        expected = sequential.network.list_mix[month].delegated
+        assert np.allclose(vectorized.network.list_mix[month].delegated, expected, rtol=1e-12, atol=1e-6)
+        assert np.isclose(np.sum(vectorized.network.list_mix[month].delegated), np.sum(expected), rtol=1e-12)
@@ -0,0 +1,13 @@
+import numpy as np
+
+# small network (90 nodes, 30 active) so that the original linear scan runs quickly
+fields = {'num_intervals': 1, 'random_seed': 2, 'nr_min_mixes': 90, 'min_mixnet_width': 10}
+
+
+# the Fenwick tree picks the same nodes as the linear scan for the same random values
+def test_fenwick_tree_equals_linear_scan(run):
+
+    linear = run(**fields, type_epoch_sampling='SAMPLING_LINEAR_SCAN').network.list_mix[0]
+    fenwick = run(**fields, type_epoch_sampling='SAMPLING_FENWICK_TREE').network.list_mix[0]
+    assert np.array_equal(linear.activity_percent, fenwick.activity_percent)
+    assert np.array_equal(linear.reserve_percent, fenwick.reserve_percent)
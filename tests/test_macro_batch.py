@@ -0,0 +1,16 @@
+import numpy as np
+from Macro_Batch_econ import Macro_Batch
+
+
+# each row of the batch is the run of its configuration in macro mode
+def test_macro_batch_rows_equal_single_runs(make_config, run):
+
+    configs = [make_config(num_intervals=24, type_model='MODEL_MACRO', alpha=alpha, emission_rate=emission_rate,
+                           price_packet_initial_dollar=price)
+               for alpha, emission_rate, price in [(0.3, 0.02, 10**-6), (0.1, 0.01, 10**-6), (0.5, 0.03, 2 * 10**-6)]]
+    batch = Macro_Batch(configs)
+    for row, config in enumerate(configs):
+        results = run(config)
+        for name in ['mixmining_pool', 'circulating_tokens', 'stake_saturation_mix', 'rewards_distributed_mix',
+                     'rewards_unclaimed']:
+            assert np.allclose(getattr(batch, name)[row], getattr(results, name), rtol=1e-12, atol=0)
@@ -0,0 +1,32 @@
+import numpy as np
+import Network_econ
+
+fields = {'num_intervals': 2, 'random_seed': 4, 'type_epoch_sampling': 'SAMPLING_PARALLEL_KEYS'}
+
+
+# each epoch has its own substream, so the sampled work shares do not depend on the number of workers
+def test_parallel_sampling_independent_of_workers(run):
+
+    serial, parallel = run(**fields, sampling_num_workers=1), run(**fields, sampling_num_workers=3)
+    for month in range(2):
+        assert np.array_equal(serial.network.list_mix[month].activity_percent,
+                              parallel.network.list_mix[month].activity_percent)
+        assert np.array_equal(serial.network.list_mix[month].reserve_percent,
+                              parallel.network.list_mix[month].reserve_percent)
+    assert np.array_equal(serial.state.data, parallel.state.data)
+
+
+# the worker processes are started once per run (not once per month) and shut down at its end
+def test_parallel_sampling_pool_started_once_per_run(run, monkeypatch):
+
+    pools = []
+
+    class Counted_Pool(Network_econ.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(Network_econ, 'ProcessPoolExecutor', Counted_Pool)
+    results = run(**dict(fields, num_intervals=3), sampling_num_workers=2)
+    assert len(pools) == 1
+    assert results.network.sampling_pool is None
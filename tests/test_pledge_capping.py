@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from Network_econ import Network
+
+
+# the vectorized capping must give the same values and number of rounds as the original loop
+def test_vectorized_capping_equals_iterative():
+
+    rng = np.random.default_rng(0)
+    for trial in range(300):
+        nr_nodes = int(rng.integers(1, 1000))
+        samples = rng.pareto(1.16, nr_nodes)
+        samples = samples / sum(samples)
+        max_value = float(rng.uniform(1 / nr_nodes, 5 / nr_nodes))
+        expected, expected_rounds = Network.cap_normalized_samples_iterative(samples.copy(), max_value)
+        capped, rounds = Network.cap_normalized_samples_vectorized(samples.copy(), max_value)
+        assert np.array_equal(capped, expected)
+        assert rounds == expected_rounds
+
+
+# between the bounds 0.99 * max_value * n < 1 <= max_value * n all the values end up at 1 / n, as with the loop
+def test_vectorized_capping_near_feasibility_bound():
+
+    samples = np.random.default_rng(1).pareto(1.16, 100)
+    samples = samples / sum(samples)
+    expected, expected_rounds = Network.cap_normalized_samples_iterative(samples.copy(), 0.0101)
+    capped, rounds = Network.cap_normalized_samples_vectorized(samples.copy(), 0.0101)
+    assert np.array_equal(capped, expected) and rounds == expected_rounds
+    assert np.max(capped) <= 0.0101
+
+
+# a budget that can not be split without saturating the nodes stops the run
+def test_vectorized_capping_infeasible():
+
+    with pytest.raises(SystemExit):
+        Network.cap_normalized_samples_vectorized(np.full(100, 0.01), 0.0099)
+
+
+# water-filling replays the rounds of the loop on the sorted samples: same rounds, same values up to rounding
+def test_water_filling_capping_equals_iterative():
+
+    rng = np.random.default_rng(2)
+    for trial in range(300):
+        nr_nodes = int(rng.integers(1, 1000))
+        samples = rng.pareto(1.16, nr_nodes)
+        samples = samples / sum(samples)
+        max_value = float(rng.uniform(1 / nr_nodes, 5 / nr_nodes))
+        expected, expected_rounds = Network.cap_normalized_samples_iterative(samples.copy(), max_value)
+        capped, rounds = Network.cap_normalized_samples_water_filling(samples.copy(), max_value)
+        assert np.allclose(capped, expected, rtol=1e-12, atol=0)
+        assert rounds == expected_rounds
+        assert np.max(capped) <= max_value
@@ -0,0 +1,33 @@
+import numpy as np
+
+fields = {'num_intervals': 3, 'random_seed': 4, 'nr_min_mixes': 90, 'min_mixnet_width': 10,
+          'type_random_numbers': 'RANDOM_COMMON_STREAMS'}
+
+
+# with common random numbers a run is reproducible, also with churn
+def test_common_streams_are_reproducible(run):
+
+    for type_network_evolution in ['NETWORK_REGENERATE', 'NETWORK_PERSISTENT_CHURN']:
+        first = run(**fields, type_network_evolution=type_network_evolution,
+                    type_epoch_sampling='SAMPLING_BATCHED_KEYS')
+        second = run(**fields, type_network_evolution=type_network_evolution,
+                     type_epoch_sampling='SAMPLING_BATCHED_KEYS')
+        assert np.array_equal(first.state.data, second.state.data)
+
+
+# each stage draws from its own stream: the sampling algorithm does not change the random pledges (only slightly
+# through the supply of the next months), and the linear scan and the Fenwick tree (same uniform draws) pick the same
+# nodes
+def test_common_streams_are_independent_between_stages(run):
+
+    linear = run(**fields, type_epoch_sampling='SAMPLING_LINEAR_SCAN')
+    fenwick = run(**fields, type_epoch_sampling='SAMPLING_FENWICK_TREE')
+    batched = run(**fields, type_epoch_sampling='SAMPLING_BATCHED_KEYS')
+    assert np.array_equal(linear.state.data, fenwick.state.data)
+    for month in range(3):
+        assert np.array_equal(linear.network.list_mix[month].activity_percent,
+                              fenwick.network.list_mix[month].activity_percent)
+    assert np.array_equal(linear.network.list_mix[0].pledge, batched.network.list_mix[0].pledge)
+    assert np.array_equal(linear.network.list_mix[0].delegated, batched.network.list_mix[0].delegated)
+    for month in [1, 2]:
+        assert np.allclose(linear.network.list_mix[month].pledge, batched.network.list_mix[month].pledge, rtol=10**-3)
@@ -0,0 +1,32 @@
+import numpy as np
+from Replications_econ import Replications
+
+fields = {'num_intervals': 6, 'random_seed': 11, 'type_work_share': 'WORK_SHARE_EXPECTED'}
+
+
+# the statistics of the replications do not depend on the number of workers, and match the runs done one by one
+def test_replications_independent_of_workers(make_config, run, quiet):
+
+    with quiet():
+        serial = Replications(make_config(**fields), 5, num_workers=1)
+        parallel = Replications(make_config(**fields), 5, num_workers=3)
+    for name in Replications.series:
+        assert np.array_equal(serial.get_mean(name), parallel.get_mean(name), equal_nan=True)
+        assert np.array_equal(serial.get_quantiles(name)[0.5], parallel.get_quantiles(name)[0.5], equal_nan=True)
+
+    values = [run(**dict(fields, random_seed=seed)).rewards_unclaimed for seed in serial.seeds]
+    assert np.allclose(serial.get_mean('rewards_unclaimed'), np.mean(values, axis=0), rtol=1e-12)
+    assert np.allclose(serial.get_std('rewards_unclaimed'), np.std(values, axis=0, ddof=1), rtol=1e-9)
+
+
+# in streaming mode the median ROS of each replication is the one of all the nodes of the month, not of the sample of
+# nodes kept by the run
+def test_replications_median_ROS_in_streaming_mode(make_config, quiet):
+
+    with quiet():
+        full = Replications(make_config(**fields, type_node_storage='NODES_KEEP_ALL'), 3)
+        stream = Replications(make_config(**fields, type_node_storage='NODES_STREAM_SUMMARIES',
+                                          stream_reservoir_size=20), 3)
+    assert not np.any(np.isnan(full.get_mean('median_ROS')))
+    assert np.array_equal(stream.get_mean('median_ROS'), full.get_mean('median_ROS'))
+    assert np.array_equal(stream.get_quantiles('median_ROS')[0.5], full.get_quantiles('median_ROS')[0.5])
@@ -0,0 +1,29 @@
+import copy
+import numpy as np
+import pytest
+
+fields = {'num_intervals': 8, 'random_seed': 5, 'type_epoch_sampling': 'SAMPLING_BATCHED_KEYS'}
+columns = ['node_id', 'pledge', 'delegated', 'sigma_node', 'activity_percent', 'node_cost', 'received_rewards',
+           'operator_profit', 'delegate_profit']
+
+
+# a rerun with a modified Config is identical to a new run of the modified Config
+@pytest.mark.parametrize('type_random_numbers', ['RANDOM_GLOBAL', 'RANDOM_COMMON_STREAMS'])
+@pytest.mark.parametrize('changes', [{'node_profit_margin': 0.2}, {'cost_mix_dummy': 50}, {'alpha': 0.2},
+                                     {'emission_rate': 0.03}, {'num_intervals': 10}, {}])
+def test_rerun_equals_new_run(make_config, run, quiet, changes, type_random_numbers):
+
+    config = make_config(**fields, type_random_numbers=type_random_numbers)
+    modified = copy.copy(config)
+    for field, value in changes.items():
+        setattr(modified, field, value)
+    results = run(config)
+    with quiet():
+        results.rerun(modified)
+    reference = run(modified)
+
+    assert np.array_equal(results.state.data, reference.state.data)
+    for month in range(modified.num_intervals):
+        for column in columns:
+            assert np.array_equal(getattr(results.network.list_mix[month], column),
+                                  getattr(reference.network.list_mix[month], column))
@@ -0,0 +1,30 @@
+import numpy as np
+from Result_Cache_econ import Result_Cache
+
+fields = {'num_intervals': 6, 'type_work_share': 'WORK_SHARE_EXPECTED'}
+
+
+# a run loaded from the cache is identical to the computed run, and runs without a seed are never cached
+def test_cached_run_equals_computed_run(tmp_path, make_config, quiet):
+
+    cache = Result_Cache(str(tmp_path) + '/', 10**9)
+    with quiet():
+        computed = cache.get_results(make_config(**fields, random_seed=5))
+        loaded = cache.get_results(make_config(**fields, random_seed=5))
+        cache.get_results(make_config(**fields, random_seed=None))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert np.array_equal(computed.state.data, loaded.state.data)
+    for month in range(6):
+        assert np.array_equal(computed.network.list_mix[month].operator_profit,
+                              loaded.network.list_mix[month].operator_profit)
+
+
+# the fields that never change the results (Stage_Graph.neutral_fields) do not change the key, the other fields do
+def test_cache_key_ignores_neutral_fields(make_config):
+
+    key = Result_Cache.get_key(make_config(**fields))
+    for field, value in [('sampling_num_workers', 7), ('sampling_max_batch_elements', 1000),
+                         ('checkpoint_interval', 2), ('result_cache_dir', 'other/')]:
+        assert Result_Cache.get_key(make_config(**fields, **{field: value})) == key
+    for field, value in [('alpha', 0.2), ('type_node_storage', 'NODES_STREAM_SUMMARIES'), ('random_seed', 6)]:
+        assert Result_Cache.get_key(make_config(**fields, **{field: value})) != key
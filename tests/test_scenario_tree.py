@@ -0,0 +1,26 @@
+import copy
+import numpy as np
+from Econ_Results_econ import Econ_Results
+from Scenario_Tree_econ import Scenario_Tree
+
+
+# a branch without overrides is the straight run, and a branch with overrides is the run modified at the fork month;
+# the months before the fork are shared
+def test_scenario_tree_branches_are_exact(make_config, run, quiet):
+
+    config = make_config(num_intervals=12, type_epoch_sampling='SAMPLING_BATCHED_KEYS')
+    modified = copy.copy(config)
+    modified.emission_rate = 0.03
+    straight = run(config)
+    with quiet():
+        tree = Scenario_Tree(Econ_Results(config, stop_month=0))
+        tree.fork(6, {'same': {}, 'emission': {'emission_rate': 0.03}})
+        tree.run()
+        reference = Econ_Results(config, stop_month=6)
+        reference.apply_config(modified)
+        reference.run()
+
+    leaves = tree.get_leaves()
+    assert np.array_equal(leaves['same'].state.data, straight.state.data)
+    assert np.array_equal(leaves['emission'].state.data, reference.state.data)
+    assert leaves['emission'].network.list_mix[3] is leaves['same'].network.list_mix[3]
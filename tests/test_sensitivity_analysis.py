@@ -0,0 +1,22 @@
+import numpy as np
+from Sensitivity_Analysis_econ import Sensitivity_Analysis
+
+fields = {'num_intervals': 6, 'type_work_share': 'WORK_SHARE_EXPECTED'}
+ranges = {'node_profit_margin': (0.05, 0.3), 'alpha': (0.1, 0.5)}
+
+
+# the output series (and so the indices) are the same in streaming mode, where the medians of the nodes come from the
+# values stored by the runs instead of the sample of nodes they keep
+def test_sensitivity_outputs_in_streaming_mode(make_config, quiet):
+
+    with quiet():
+        full = Sensitivity_Analysis(make_config(**fields, type_node_storage='NODES_KEEP_ALL'), ranges, 4)
+        stream = Sensitivity_Analysis(make_config(**fields, type_node_storage='NODES_STREAM_SUMMARIES',
+                                                  stream_reservoir_size=20), ranges, 4)
+    assert not np.any(np.isnan(full.outputs_a['median_ROS']))
+    for name in Sensitivity_Analysis.series:
+        assert np.array_equal(stream.outputs_a[name], full.outputs_a[name])
+        assert np.array_equal(stream.outputs_ab[name], full.outputs_ab[name])
+    first, total = full.get_indices('median_ROS')
+    assert np.array_equal(stream.get_indices('median_ROS')[0], first, equal_nan=True)
+    assert np.array_equal(stream.get_indices('median_ROS')[1], total, equal_nan=True)
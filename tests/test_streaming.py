@@ -0,0 +1,17 @@
+import numpy as np
+
+fields = {'num_intervals': 3, 'random_seed': 7, 'type_work_share': 'WORK_SHARE_EXPECTED'}
+
+
+# dropping the nodes does not change the run, and the summaries hold the statistics of all the nodes of the month
+def test_streaming_summaries_equal_full_run(run):
+
+    full = run(**fields, type_node_storage='NODES_KEEP_ALL')
+    stream = run(**fields, type_node_storage='NODES_STREAM_SUMMARIES')
+    assert np.array_equal(full.state.data, stream.state.data)
+    for month in range(3):
+        assert len(stream.network.list_mix[month]) == stream.config.stream_reservoir_size
+        for par in ['pledge', 'received_rewards', 'APY_delegator']:
+            values = full.get_month_values(month, par, finite=True)
+            assert stream.get_month_median(month, par) == full.get_month_median(month, par) == np.median(values)
+            assert np.isclose(stream.node_summaries[month][par]['mean'], np.mean(values), rtol=1e-12)
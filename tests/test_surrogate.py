@@ -0,0 +1,60 @@
+import csv
+import numpy as np
+import pytest
+from Surrogate_econ import Surrogate
+from Sweep_Engine_econ import Sweep_Engine
+
+
+def write_sweep(file_name, rows):
+
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# the surrogate interpolates a smooth output of the swept fields, with a small uncertainty at the runs
+def test_surrogate_predicts_smooth_output(tmp_path):
+
+    grid = [(alpha, rate) for alpha in np.linspace(0.1, 0.5, 5) for rate in np.linspace(0.01, 0.03, 5)]
+    rows = [{'point': i, 'alpha': alpha, 'emission_rate': rate, 'pool': 1000 * alpha + 5000 * rate ** 2}
+            for i, (alpha, rate) in enumerate(grid)]
+    write_sweep(tmp_path / 'sweep.csv', rows)
+    surrogate = Surrogate.load_csv(tmp_path / 'sweep.csv')
+    assert surrogate.fields == ['alpha', 'emission_rate']
+    mean, std = surrogate.predict({'alpha': 0.23, 'emission_rate': 0.017})['pool']
+    assert abs(mean - (230 + 5000 * 0.017 ** 2)) < 0.01 * 230
+    assert std < 0.01 * 230
+
+
+# a sweep over a field that is not numerical stops with an ISSUE instead of a ValueError
+def test_surrogate_rejects_string_fields(tmp_path, capsys):
+
+    write_sweep(tmp_path / 'sweep.csv', [{'point': 0, 'type_work_share': 'WORK_SHARE_SAMPLED', 'pool': 1.0},
+                                         {'point': 1, 'type_work_share': 'WORK_SHARE_EXPECTED', 'pool': 2.0}])
+    with pytest.raises(SystemExit):
+        Surrogate.load_csv(tmp_path / 'sweep.csv')
+    assert 'type_work_share' in capsys.readouterr().out
+
+
+# the new points of refine run with the configuration of the sweep (saved next to the CSV file), so a sweep over a
+# non-default horizon gets rows with the same columns and comparable outputs; another configuration is rejected
+def test_surrogate_refine_uses_sweep_configuration(tmp_path, make_config, quiet):
+
+    config = make_config(num_intervals=24, type_work_share='WORK_SHARE_EXPECTED')
+    file_name = str(tmp_path / 'sweep.csv')
+    with quiet():
+        Sweep_Engine(config, Sweep_Engine.get_grid({'alpha': [0.1, 0.3, 0.5]}), output_file=file_name)
+        surrogate = Surrogate.load_csv(file_name)
+        surrogate.refine(2, file_name=file_name, rng=np.random.default_rng(0))
+    assert surrogate.config.num_intervals == 24
+    with open(file_name, newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 5
+    for row in rows[3:]:
+        assert all(row[name] != '' for name in rows[0] if rows[0][name] != '')
+        old = [float(old_row['circulating_tokens_end']) for old_row in rows[:3]]
+        assert min(old) * 0.9 < float(row['circulating_tokens_end']) < max(old) * 1.1
+
+    with pytest.raises(SystemExit), quiet():
+        surrogate.refine(1, config=make_config(type_work_share='WORK_SHARE_EXPECTED'))
@@ -0,0 +1,32 @@
+import copy
+import numpy as np
+from Econ_Results_econ import Econ_Results
+from Sweep_Engine_econ import Sweep_Engine
+
+fields = {'num_intervals': 12, 'type_work_share': 'WORK_SHARE_EXPECTED'}
+
+
+# the rows do not depend on the number of workers and equal the summaries of runs done one by one (the swept fields
+# do not change the inputs, so the runs of the sweep use the shared input vectors)
+def test_sweep_rows_equal_direct_runs(tmp_path, make_config, run, quiet):
+
+    grid = Sweep_Engine.get_grid({'alpha': [0.2, 0.3], 'node_profit_margin': [0.1, 0.2]})
+    with quiet():
+        serial = Sweep_Engine(make_config(**fields), grid, 1)
+        parallel = Sweep_Engine(make_config(**fields), grid, 2, chunk_size=1, output_file=str(tmp_path / 'sweep.csv'))
+    assert serial.rows == parallel.rows
+    assert len(open(tmp_path / 'sweep.csv').readlines()) == len(grid) + 1
+
+    for row, point in zip(serial.rows, grid):
+        summary = Sweep_Engine.get_summary(run(**fields, **point))
+        assert {name: row[name] for name in summary} == summary
+
+
+# runs with the shared input vectors equal runs that compute them
+def test_shared_inputs_equal_computed_inputs(make_config, run, quiet):
+
+    config = make_config(**fields)
+    computed = run(config)
+    with quiet():
+        shared = Econ_Results(copy.copy(config), inputs=Sweep_Engine.compute_inputs(config))
+    assert np.array_equal(computed.state.data, shared.state.data)